@@ -0,0 +1,17 @@
+#
+"""
+Prediction archival
+This script moves finished predictions older than the retention window to
+compressed Parquet files (one directory per month) and leaves a stub in
+Postgres, so they can still be read by UUID. Needs pyarrow.
+Usage: python archive_predictions.py [--retention-days N] [--batch-size N]
+"""
+
+if __name__ == "__main__":
+    import logging
+    logging.basicConfig(level=logging.INFO)
+    import sys, os
+    sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+    from infra.db.prediction_archive import main
+    main()
@@ -0,0 +1,35 @@
+# config/settings.py
+import os
+
+# System prompt sent with every user prompt (part of the response cache key)
+SYSTEM_PROMPT = os.getenv("LLM_SYSTEM_PROMPT", "You are a helpful assistant")
+
+# Redis used for shared metrics / caches; empty means in-process only
+REDIS_URL = os.getenv("REDIS_URL", os.getenv("REDIS_BROKER_URL", ""))
+
+# Output length assumed when estimating (and holding) a prediction's cost
+ESTIMATED_OUTPUT_TOKENS = int(os.getenv("ESTIMATED_OUTPUT_TOKENS", "256"))
+
+# Hard cap of generated tokens per prediction, it also bounds the funds a
+# running prediction holds (default: 8 times the estimated output)
+LLM_MAX_OUTPUT_TOKENS = int(os.getenv(
+    "LLM_MAX_OUTPUT_TOKENS", str(8 * ESTIMATED_OUTPUT_TOKENS)
+))
+
+# How long an Idempotency-Key of POST /predictions/ is remembered
+IDEMPOTENCY_KEY_TTL_SECONDS = int(
+    os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", "86400")
+)
+
+# A worker holds a running prediction for this long (renewed while it runs);
+# a prediction whose holder stopped renewing may be claimed again
+PREDICTION_LEASE_SECONDS = int(os.getenv(
+    "PREDICTION_LEASE_SECONDS", os.getenv("PG_QUEUE_LEASE_SECONDS", "600")
+))
+
+# Default max queue time of a prediction in seconds (empty: no deadline);
+# jobs still waiting after it are dropped before inference
+PREDICTION_MAX_QUEUE_SECONDS = (
+    float(os.getenv("PREDICTION_MAX_QUEUE_SECONDS"))
+    if os.getenv("PREDICTION_MAX_QUEUE_SECONDS") else None
+)
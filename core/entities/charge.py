@@ -0,0 +1,11 @@
+# core/entities/charge.py
+from dataclasses import dataclass
+
+@dataclass
+class Charge:
+    """A finished prediction's cost waiting to be settled in a batch."""
+    seq: int | None = None # Position in the charge buffer (increasing)
+    user_id: int | None = None # Foreign key to User
+    prediction_id: int | None = None # Foreign key to Prediction (charged once)
+    amount: float = 0.0 # Cost to charge (capped at the hold and the balance when settled)
+    reserved: float = 0.0 # Funds held for the prediction, released when settled
@@ -0,0 +1,14 @@
+# core/entities/job_context.py
+from dataclasses import dataclass
+
+from core.entities.model import Model
+from core.entities.prediction import Prediction
+from core.entities.user import User
+
+@dataclass
+class JobContext:
+    """Everything a worker needs to run a prediction, loaded in one query."""
+    prediction: Prediction # Prediction after the claim (status already moved)
+    user: User | None = None # Owner of the prediction
+    model: Model | None = None # Model chosen at submission, or the active one if it was deactivated
+    claimed: bool = False # False if the prediction was already finished (nothing to do)
@@ -0,0 +1,11 @@
+# core/entities/ledger_discrepancy.py
+from dataclasses import dataclass
+
+@dataclass
+class LedgerDiscrepancy:
+    """A mismatch between balances, predictions and the transactions ledger."""
+    kind: str # balance, missing_transaction, duplicate_transaction, amount, unexpected_transaction, reserved
+    user_id: int | None = None # Foreign key to User
+    prediction_id: int | None = None # Foreign key to Prediction (None for balance)
+    expected: float = 0.0 # Ledger balance (balance), -total_cost (amount), sum of open holds (reserved) or transaction count
+    actual: float = 0.0 # Stored balance (balance), ledger amount (amount), reserved_balance (reserved) or transaction count
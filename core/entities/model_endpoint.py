@@ -0,0 +1,14 @@
+# core/entities/model_endpoint.py
+from dataclasses import dataclass
+
+@dataclass
+class ModelEndpoint:
+    """An inference endpoint (or local engine) serving a Model."""
+    id: int | None = None # Database ID
+    model_id: int | None = None # Foreign key to Model
+    kind: str = 'openai' # 'openai' (OpenAI-compatible HTTP), 'llama_cpp', 'vllm' or 'dummy'
+    base_url: str | None = None # Endpoint URL, None for the default / local engines
+    api_key: str | None = None # API key of the endpoint
+    model_name: str | None = None # Model name sent to the endpoint (or model path)
+    is_active: bool = True # Whether the endpoint receives traffic
+    timeout_seconds: float | None = None # Per-call timeout, None for LLM_TIMEOUT_SECONDS
@@ -0,0 +1,15 @@
+# core/entities/model_switchover.py
+from dataclasses import dataclass
+from datetime import datetime
+
+@dataclass
+class ModelSwitchover:
+    """Represents a change of the active model rolled out to the workers."""
+    id: int | None = None # Database ID
+    from_model_id: int | None = None # Model active before the switch (None: none)
+    to_model_id: int | None = None # Model that becomes active
+    status: str = 'warming' # warming, draining, completed, failed
+    created_at: datetime | None = None # Timestamp when the switch was requested
+    cutover_at: datetime | None = None # Timestamp when traffic moved to to_model_id
+    completed_at: datetime | None = None # Timestamp when the old model was unloaded (or the switch failed)
+    warm_until: datetime | None = None # Workers stop warming to_model_id after this (abandoned switch)
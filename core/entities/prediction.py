@@ -1,7 +1,7 @@
 # core/entities/prediction.py
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Set
 import uuid
 
 class Prediction(BaseModel):
@@ -16,12 +16,33 @@ class Prediction(BaseModel):
     input_tokens: Optional[int] = None
     output_tokens: Optional[int] = None
     total_cost: Optional[float] = None
-    status: str = 'pending'  # e.g., pending, processing, completed, failed
+    reserved_cost: Optional[float] = None  # Estimated cost held at submission
+    status: str = 'pending'  # e.g., pending, processing, completed, failed,
+    # cancelling, cancelled, expired
     # Automatically set on creation
     created_at: Optional[datetime] = Field(default_factory=datetime.now)
     completed_at: Optional[datetime] = None
     queue_time: Optional[int] = None  # Time spent in queue (ms)
     process_time: Optional[int] = None  # Time spent processing (ms)
+    # Skipped (status 'expired') if no worker picked it up before this
+    deadline_at: Optional[datetime] = None
+    # Held by the worker with this token until lease_expires_at
+    claim_token: Optional[str] = None
+    # Fields assigned since the record was loaded or last saved
+    _dirty: Set[str] = PrivateAttr(default_factory=set)
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in self.__fields__:
+            self._dirty.add(name)
+
+    def dirty_fields(self) -> Set[str]:
+        """Fields changed since the last mark_clean()."""
+        return set(self._dirty)
+
+    def mark_clean(self) -> None:
+        """Forgets the changes, called once they are saved."""
+        self._dirty.clear()
 
     # class Config:
     #     orm_mode = True
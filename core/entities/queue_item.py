@@ -9,5 +9,6 @@ class QueueItem:
     prediction_id: int | None = None # Foreign key to Prediction (should be unique in this table)
     user_id: int | None = None # Foreign key to User (for fairness logic)
     priority: int = 0 # Priority level (higher value means higher priority, though we might not use it initially)
-    status: str = 'waiting' # e.g., waiting, processing, completed, canceled
+    status: str = 'waiting' # e.g., waiting, processing, completed, failed, cancelled
     queued_at: datetime | None = None # Timestamp when the item was added to the queue
+    dispatched_at: datetime | None = None # Timestamp when the item was sent to the workers
@@ -10,6 +10,7 @@ class User(BaseModel):
     name: Optional[str] = None # Name from Telegram
     telegram_id: Optional[str] = None # Unique Telegram User ID
     balance: float = 0.0 # User's current balance
+    reserved_balance: float = 0.0 # Funds held for queued predictions
     created_at: Optional[datetime] = None # Timestamp of user creation
     updated_at: Optional[datetime] = None  # Timestamp of last update
     password_hash: Optional[str] = None  # Hashed password for HTTP API login
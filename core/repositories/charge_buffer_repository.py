@@ -0,0 +1,42 @@
+# core/repositories/charge_buffer_repository.py
+from abc import ABC, abstractmethod
+from typing import List
+
+from core.entities.charge import Charge
+
+class ChargeBufferRepository(ABC):
+    """Abstract base class for the fast store of charges awaiting settlement."""
+
+    @abstractmethod
+    def append(self, charge: Charge) -> bool:
+        """Appends a charge and assigns its seq.
+
+        Returns:
+            bool: False if a charge of the same prediction was already
+            appended (nothing is added).
+
+        Raises:
+            ConnectionRefusedError: If the buffer could not be reached, so
+                nothing was appended. Any other error leaves it unknown.
+        """
+        pass
+
+    @abstractmethod
+    def claim(self, prediction_id: int) -> bool:
+        """Marks a prediction as charged outside the buffer, so a charge of
+        it can no longer be appended.
+
+        Returns:
+            bool: False if a charge of the prediction was already appended.
+        """
+        pass
+
+    @abstractmethod
+    def read_after(self, seq: int, limit: int) -> List[Charge]:
+        """Retrieves up to `limit` charges with a seq above `seq`, in order."""
+        pass
+
+    @abstractmethod
+    def delete_through(self, seq: int) -> None:
+        """Deletes the charges up to and including `seq` (once settled)."""
+        pass
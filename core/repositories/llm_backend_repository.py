@@ -0,0 +1,24 @@
+# core/repositories/llm_backend_repository.py
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from core.entities.model import Model
+
+class LLMBackendRepository(ABC):
+    """Abstract base class for running generations of a model."""
+
+    @abstractmethod
+    async def predict(
+        self,
+        model: Model,
+        text: str,
+        max_tokens: Optional[int] = None,
+        cancel_event: Optional[asyncio.Event] = None,
+    ) -> dict:
+        """Generates an answer with one of the backends serving `model`.
+
+        Returns:
+            dict: output_text, input_tokens, output_tokens and finish_reason.
+        """
+        pass
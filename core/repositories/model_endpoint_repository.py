@@ -0,0 +1,18 @@
+# core/repositories/model_endpoint_repository.py
+from abc import ABC, abstractmethod
+from typing import List
+
+from core.entities.model_endpoint import ModelEndpoint
+
+class ModelEndpointRepository(ABC):
+    """Abstract base class defining the interface for model endpoint persistence."""
+
+    @abstractmethod
+    def add(self, endpoint: ModelEndpoint) -> ModelEndpoint:
+        """Adds a new endpoint of a model."""
+        pass
+
+    @abstractmethod
+    def list_by_model(self, model_id: int) -> List[ModelEndpoint]:
+        """Retrieves the active endpoints serving a model."""
+        pass
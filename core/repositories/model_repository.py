@@ -28,6 +28,20 @@ class ModelRepository(ABC):
         # In a real scenario, you might list all active or allow selection
         pass
 
+    @abstractmethod
+    def list_active(self) -> List[Model]:
+        """Retrieves the models a prediction may choose from."""
+        pass
+
+    @abstractmethod
+    def switch_active_model(self, from_model_id: Optional[int], to_model_id: int) -> bool:
+        """Atomically activates to_model_id and deactivates from_model_id.
+
+        Returns False (and changes nothing) if from_model_id is no longer
+        active.
+        """
+        pass
+
     @abstractmethod
     def list_all(self) -> List[Model]:
         """Retrieves a list of all models."""
@@ -0,0 +1,46 @@
+# core/repositories/model_switchover_repository.py
+from abc import ABC, abstractmethod
+from typing import Dict, List
+
+from core.entities.model_switchover import ModelSwitchover
+
+class ModelSwitchoverRepository(ABC):
+    """Abstract base class for active-model switchovers and the models
+    loaded by each worker."""
+
+    @abstractmethod
+    def add(self, switchover: ModelSwitchover) -> ModelSwitchover:
+        """Adds a new switchover."""
+        pass
+
+    @abstractmethod
+    def update(self, switchover: ModelSwitchover) -> None:
+        """Updates the status and timestamps of a switchover."""
+        pass
+
+    @abstractmethod
+    def list_warming_model_ids(self) -> List[int]:
+        """Retrieves the models that workers should load ahead of a cutover
+        (of switchovers warming and not past their warm_until)."""
+        pass
+
+    @abstractmethod
+    def report_residency(self, worker_id: str, warm_by_model: Dict[int, bool]) -> None:
+        """Replaces the models reported by a worker (also its heartbeat).
+
+        Args:
+            worker_id (str): Identifies the worker process.
+            warm_by_model (Dict[int, bool]): Model IDs the worker serves or
+                still has loaded, and whether each is loaded and warm.
+        """
+        pass
+
+    @abstractmethod
+    def count_unready_workers(self, model_id: int, heartbeat_seconds: float) -> int:
+        """Counts live workers that do not have the model loaded and warm."""
+        pass
+
+    @abstractmethod
+    def count_hosting_workers(self, model_id: int, heartbeat_seconds: float) -> int:
+        """Counts live workers that still report the model."""
+        pass
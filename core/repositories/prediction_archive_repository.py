@@ -0,0 +1,22 @@
+# core/repositories/prediction_archive_repository.py
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from core.entities.prediction import Prediction
+
+class PredictionArchiveRepository(ABC):
+    """Abstract base class for cold storage of old predictions."""
+
+    @abstractmethod
+    def write(self, predictions: List[Prediction]) -> Dict[str, str]:
+        """Stores predictions durably (grouped by created_at month).
+
+        Returns:
+            Dict[str, str]: The location of each prediction by UUID.
+        """
+        pass
+
+    @abstractmethod
+    def read(self, location: str, uuid: str) -> Optional[Prediction]:
+        """Retrieves an archived prediction from its location."""
+        pass
@@ -1,7 +1,9 @@
 # core/repositories/prediction_repository.py
 from abc import ABC, abstractmethod
-from typing import Optional, List
+from datetime import datetime
+from typing import Dict, Optional, List, Tuple
 
+from core.entities.job_context import JobContext
 from core.entities.prediction import Prediction
 
 class PredictionRepository(ABC):
@@ -19,7 +21,7 @@ class PredictionRepository(ABC):
 
     @abstractmethod
     def get_by_uuid(self, uuid: str) -> Optional[Prediction]:
-        """Retrieves a prediction by its unique UUID."""
+        """Retrieves a prediction by its unique UUID (archived ones included)."""
         pass
 
     @abstractmethod
@@ -28,6 +30,140 @@ class PredictionRepository(ABC):
         pass
 
     @abstractmethod
-    def list_by_user(self, user_id: int) -> List[Prediction]:
-        """Retrieves all predictions for a specific user."""
+    def update_changed(self, prediction: Prediction) -> bool:
+        """Writes only the fields changed since the prediction was loaded
+        (see Prediction.dirty_fields); no query if nothing changed."""
+        pass
+
+    @abstractmethod
+    def list_by_user(
+        self,
+        user_id: int,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> List[Prediction]:
+        """Retrieves all predictions for a specific user, optionally only
+        those created in [since, until)."""
+        pass
+
+    @abstractmethod
+    def start_processing(
+        self,
+        prediction_id: int,
+        claim_token: Optional[str] = None,
+        lease_seconds: float = 600,
+    ) -> Optional[JobContext]:
+        """Claims a prediction for a worker and loads its user and model.
+
+        In one atomic step, a 'pending' prediction becomes 'processing' with
+        its queue_time, a new claim token and a lease, a 'cancelling' one
+        'cancelled' and one past its deadline 'expired'. A 'processing' or
+        'cancelling' one is only claimed with its claim_token or once its
+        lease expired. Finished ones are left alone (claimed=False).
+
+        Returns:
+            Optional[JobContext]: None if the prediction does not exist or
+            another worker holds it.
+        """
+        pass
+
+    @abstractmethod
+    def claim_pending(self, limit: int, lease_seconds: int) -> List[Prediction]:
+        """Claims up to `limit` pending predictions for processing.
+
+        Predictions stuck in 'processing' or 'cancelling' with an expired
+        lease are claimed again (keeping their status), so jobs of a crashed
+        worker are recovered and the holds of cancelled ones released.
+        """
+        pass
+
+    @abstractmethod
+    def renew_lease(
+        self, prediction_id: int, claim_token: str, lease_seconds: float
+    ) -> Optional[str]:
+        """Extends the lease of a running prediction held with claim_token.
+
+        Returns:
+            Optional[str]: The current status, or None if the lease was lost
+            (another worker took the prediction over) or it finished.
+        """
+        pass
+
+    @abstractmethod
+    def release_lost_holds(
+        self,
+        lease_grace_seconds: float,
+        max_pending_seconds: Optional[float],
+        limit: int,
+    ) -> int:
+        """Ends predictions whose job was lost and releases their holds.
+
+        In one transaction, pending ones past their deadline (or waiting
+        longer than max_pending_seconds) become 'expired', running ones
+        whose lease expired more than lease_grace_seconds ago become
+        'failed' ('cancelled' if cancelling), and their reserved_cost is
+        released from the balances.
+
+        Returns:
+            int: The number of predictions ended (less than limit once none
+            are left).
+        """
+        pass
+
+    @abstractmethod
+    def request_cancel(self, prediction_id: int) -> Optional[str]:
+        """Requests cancellation of a pending or processing prediction.
+
+        Pending predictions become 'cancelled' at once, processing ones
+        become 'cancelling' until the worker stops the generation.
+
+        Returns:
+            Optional[str]: The new status, or None if the prediction was
+            already finished.
+        """
+        pass
+
+    @abstractmethod
+    def get_status(self, prediction_id: int) -> Optional[str]:
+        """Retrieves only the status of a prediction (cheap polling)."""
+        pass
+
+    @abstractmethod
+    def add_idempotent(
+        self, prediction: Prediction, key: str, ttl_seconds: int
+    ) -> Tuple[Prediction, bool]:
+        """Adds a prediction under an idempotency key, atomically.
+
+        If the user already used the (unexpired) key, nothing is inserted
+        and its prediction is returned, also if archived meanwhile. A key
+        whose prediction no longer exists at all is reused.
+
+        Returns:
+            Tuple[Prediction, bool]: The new or the original prediction, and
+            whether it was created by this call.
+        """
+        pass
+
+    @abstractmethod
+    def get_by_idempotency_key(
+        self, user_id: int, key: str
+    ) -> Optional[Prediction]:
+        """Retrieves the prediction of an unexpired idempotency key."""
+        pass
+
+    @abstractmethod
+    def count_pending_by_model(self) -> Dict[int, int]:
+        """Counts queued (pending) predictions per model ID."""
+        pass
+
+    @abstractmethod
+    def archive_finished(self, older_than: datetime, limit: int) -> int:
+        """Moves finished predictions (completed, failed, cancelled or
+        expired) finished before older_than to the archive, leaving a stub
+        so get_by_uuid still finds them.
+
+        Returns:
+            int: The number of predictions archived (less than limit once
+            none are left).
+        """
         pass
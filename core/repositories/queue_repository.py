@@ -0,0 +1,61 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List
+
+from core.entities.queue_item import QueueItem
+
+class QueueRepository(ABC):
+    """Abstract base class defining the interface for the prediction queue persistence."""
+
+    @abstractmethod
+    def add(self, item: QueueItem) -> QueueItem:
+        """Adds a new waiting item to the queue."""
+        pass
+
+    @abstractmethod
+    def list_waiting(self, limit_per_user: int) -> List[QueueItem]:
+        """Retrieves the oldest waiting items, at most `limit_per_user` per user."""
+        pass
+
+    @abstractmethod
+    def count_processing_by_user(self) -> Dict[int, int]:
+        """Retrieves the number of dispatched (processing) items per user."""
+        pass
+
+    @abstractmethod
+    def mark_processing(
+        self, item_ids: List[int], max_in_flight: int
+    ) -> List[int]:
+        """Moves waiting items to 'processing', in the given order, while
+        fewer than `max_in_flight` items are processing.
+
+        Concurrent dispatchers are serialized, so together they never move
+        more items than there are free slots.
+
+        Returns:
+            List[int]: IDs of the items that were actually moved (items already
+            taken by a concurrent dispatcher are skipped).
+        """
+        pass
+
+    @abstractmethod
+    def requeue_stale(self, stale_seconds: float) -> int:
+        """Frees the slots of items dispatched more than `stale_seconds` ago
+        whose job was lost (worker crash, lost message).
+
+        Items of predictions still pending or whose lease expired go back to
+        'waiting'; items of finished predictions get their final status.
+
+        Returns:
+            int: Number of items freed.
+        """
+        pass
+
+    @abstractmethod
+    def update_status(self, prediction_id: int, status: str) -> bool:
+        """Updates the queue status of the item for a prediction."""
+        pass
+
+    @abstractmethod
+    def cancel_waiting(self, prediction_id: int) -> bool:
+        """Cancels the queue item of a prediction if it is still waiting."""
+        pass
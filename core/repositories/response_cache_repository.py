@@ -0,0 +1,15 @@
+from abc import ABC, abstractmethod
+from typing import Optional
+
+class ResponseCacheRepository(ABC):
+    """Abstract base class defining the interface for the LLM response cache."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[dict]:
+        """Retrieves a cached LLM result (output_text, input_tokens, output_tokens)."""
+        pass
+
+    @abstractmethod
+    def set(self, key: str, result: dict) -> None:
+        """Stores an LLM result, evicting the least recently used entries if full."""
+        pass
@@ -0,0 +1,29 @@
+# core/repositories/settlement_repository.py
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+from core.entities.charge import Charge
+
+class SettlementRepository(ABC):
+    """Abstract base class applying batches of charges to the balances."""
+
+    @abstractmethod
+    def get_offset(self, name: str) -> int:
+        """Retrieves the seq of the last settled charge of a buffer (0: none)."""
+        pass
+
+    @abstractmethod
+    def apply(self, name: str, charges: List[Charge]) -> Optional[int]:
+        """Settles a batch of charges in one transaction.
+
+        Charges at or below the stored offset are skipped (already settled
+        before a crash), so a batch can be replayed safely. Each charge is
+        capped at its hold, each user gets one balance update for all of its
+        charges, each charge a ledger row, and the offset moves to the last
+        charge.
+
+        Returns:
+            Optional[int]: The number of charges settled, or None if another
+            flusher is settling the same buffer.
+        """
+        pass
@@ -0,0 +1,24 @@
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Optional, Tuple
+
+class SingleFlightRepository(ABC):
+    """Abstract base class for in-flight deduplication of identical LLM calls."""
+
+    @abstractmethod
+    async def run(
+        self, key: str, generate: Callable[[], Awaitable[dict]],
+        cancel_event: Optional[asyncio.Event] = None,
+    ) -> Tuple[Optional[dict], bool]:
+        """Runs `generate` once per key among concurrent callers.
+
+        Args:
+            cancel_event: Stops waiting for another caller's generation
+                once set (that generation goes on for the others).
+
+        Returns:
+            Tuple[Optional[dict], bool]: The LLM result and True if it was
+            produced by another caller (this one only waited for it). The
+            result is None if this caller was cancelled while waiting.
+        """
+        pass
@@ -1,7 +1,9 @@
 # core/repositories/transaction_repository.py
 from abc import ABC, abstractmethod
-from typing import Optional, List
+from datetime import datetime
+from typing import Iterator, Optional, List, Tuple
 
+from core.entities.ledger_discrepancy import LedgerDiscrepancy
 from core.entities.transaction import Transaction
 
 class TransactionRepository(ABC):
@@ -18,6 +20,65 @@ class TransactionRepository(ABC):
         pass
 
     @abstractmethod
-    def list_by_user(self, user_id: int) -> List[Transaction]:
-        """Retrieves all transactions for a specific user."""
+    def list_by_user(
+        self,
+        user_id: int,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> List[Transaction]:
+        """Retrieves all transactions for a specific user, optionally only
+        those created in [since, until)."""
+        pass
+
+    @abstractmethod
+    def checkpoint_balances(self) -> int:
+        """Advances the per-user balance checkpoints over new transactions.
+
+        Each checkpoint stores a user's ledger balance over every transaction
+        written by a database transaction that had finished when it was
+        taken, so later sums start from there instead of the whole history
+        and transactions still being committed are never skipped.
+
+        Returns:
+            int: The number of checkpoints written.
+        """
+        pass
+
+    @abstractmethod
+    def get_ledger_balance(self, user_id: int) -> Optional[float]:
+        """Computes a user's balance from the ledger: the checkpoint plus the
+        transactions after it (None on error)."""
+        pass
+
+    @abstractmethod
+    def audit_balance(self, user_id: int) -> Optional[Tuple[float, float]]:
+        """Reads a user's stored balance and ledger balance together.
+
+        Returns:
+            Optional[Tuple[float, float]]: The stored and the ledger balance,
+            or None if the user was not found.
+        """
+        pass
+
+    @abstractmethod
+    def reconcile(
+        self, tolerance: float, settle_seconds: float, full: bool = False
+    ) -> Iterator[LedgerDiscrepancy]:
+        """Streams the discrepancies of the whole ledger from one snapshot.
+
+        Checks with set-based aggregates that every stored balance equals
+        the ledger balance, that every completed prediction has exactly
+        one transaction of its cost (and other predictions none), and that
+        every reserved_balance equals the holds of the user's predictions
+        not finished or not settled yet.
+
+        Args:
+            tolerance (float): Largest amount difference treated as equal.
+            settle_seconds (float): Predictions completed more recently are
+                not reported as missing a transaction (still being settled),
+                users with predictions submitted or finished more recently
+                not for their reserved balance.
+            full (bool): Sum the whole history instead of starting from the
+                balance checkpoints (also verifies the checkpoints).
+        """
         pass
@@ -1,6 +1,6 @@
 # core/repositories/user_repository.py
 from abc import ABC, abstractmethod
-from typing import Optional, List
+from typing import Optional, List, Tuple
 
 from core.entities.user import User
 
@@ -56,6 +56,63 @@ class UserRepository(ABC):
         """
         pass
 
+    @abstractmethod
+    def reserve_funds(self, user_id: int, amount: float) -> bool:
+        """Holds funds for a queued prediction if the available balance allows.
+
+        Args:
+            user_id (int): The ID of the user.
+            amount (float): The amount to hold.
+
+        Returns:
+            bool: True if the funds were held, False if the available
+            balance (balance - reserved_balance) is too small.
+        """
+        pass
+
+    @abstractmethod
+    def reserve_up_to(self, user_id: int, amount: float) -> float:
+        """Holds as much of `amount` as the available balance allows.
+
+        Args:
+            user_id (int): The ID of the user.
+            amount (float): The amount wanted.
+
+        Returns:
+            float: The amount actually held (0 if nothing is available).
+        """
+        pass
+
+    @abstractmethod
+    def release_funds(self, user_id: int, amount: float) -> bool:
+        """Releases funds held by reserve_funds without charging them.
+
+        Args:
+            user_id (int): The ID of the user.
+            amount (float): The amount to release.
+
+        Returns:
+            bool: True if the update was successful, False otherwise.
+        """
+        pass
+
+    @abstractmethod
+    def settle_charge(
+        self, user_id: int, cost: float, reserved: float
+    ) -> Optional[Tuple[float, float]]:
+        """Charges a finished prediction and releases its hold in one update.
+
+        Args:
+            user_id (int): The ID of the user.
+            cost (float): The cost to charge, capped at the current balance.
+            reserved (float): The amount held for the prediction.
+
+        Returns:
+            Optional[Tuple[float, float]]: The charged amount and the new
+            balance, or None if the user was not found.
+        """
+        pass
+
     @abstractmethod
     def list_all(self) -> List[User]:
         """Retrieves a list of all users.
@@ -0,0 +1,124 @@
+# core/use_cases/billing_use_cases.py
+import logging
+import math
+from typing import Optional
+
+from core.entities.model import Model
+from core.entities.user import User
+from core.repositories.user_repository import UserRepository
+
+# Rough characters per token for English-like text (no tokenizer needed)
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimates the token count of a text from its length."""
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+def output_token_budget(
+    available: float, model: Model, input_text: str,
+    max_output_tokens: Optional[int] = None,
+) -> Optional[int]:
+    """Computes how many output tokens a user can still pay for.
+
+    Args:
+        available (float): Funds usable by this prediction.
+        max_output_tokens (Optional[int]): Global cap, None for no cap.
+
+    Returns:
+        Optional[int]: The token budget (0 if even the input is
+        unaffordable), or None if unbounded (free output, no cap).
+    """
+    if model.output_token_price <= 0:
+        return max_output_tokens
+    remaining = available - estimate_tokens(input_text) * model.input_token_price
+    budget = max(int(remaining / model.output_token_price), 0)
+    if max_output_tokens is not None:
+        budget = min(budget, max_output_tokens)
+    return budget
+
+
+def bucket_token_budget(
+    budget: Optional[int], max_output_tokens: Optional[int] = None,
+) -> Optional[int]:
+    """Rounds a token budget down to a power of two (the cap is kept).
+
+    Predictions whose budgets differ only a little then share the
+    single-flight key of an identical prompt.
+    """
+    if budget is None or budget < 1 or budget == max_output_tokens:
+        return budget
+    return 1 << (budget.bit_length() - 1)
+
+
+def max_prediction_cost(
+    model: Model, input_text: str, max_output_tokens: Optional[int] = None,
+) -> Optional[float]:
+    """Estimates the most a prediction can cost (see output_token_budget).
+
+    Returns:
+        Optional[float]: The cost, or None if unbounded (priced output,
+        no cap).
+    """
+    input_cost = estimate_tokens(input_text) * model.input_token_price
+    if model.output_token_price <= 0:
+        return input_cost
+    if max_output_tokens is None:
+        return None
+    return input_cost + max_output_tokens * model.output_token_price
+
+
+class BillingUseCases:
+    """Pre-flight cost estimation and funds holds for prediction submission.
+
+    The estimated cost is held (reserved) when a prediction is submitted and
+    settled against the real cost when the worker completes it, so work the
+    user cannot afford is rejected before it reaches the queue.
+    """
+
+    def __init__(
+        self, user_repository: UserRepository, expected_output_tokens: int = 256
+    ):
+        """Initializes the BillingUseCases with a user repository.
+
+        Args:
+            expected_output_tokens (int): Output length assumed by estimates.
+        """
+        self.user_repository = user_repository
+        self.expected_output_tokens = expected_output_tokens
+
+    def estimate_cost(self, model: Model, input_text: str) -> float:
+        """Estimates the cost of a prediction from model token prices."""
+        input_cost = estimate_tokens(input_text) * model.input_token_price
+        output_cost = self.expected_output_tokens * model.output_token_price
+        return input_cost + output_cost
+
+    def available_balance(self, user: User) -> float:
+        """Returns the balance not held by queued predictions."""
+        return user.balance - user.reserved_balance
+
+    def reserve_for_prediction(
+        self, user: User, model: Model, input_text: str
+    ) -> Optional[float]:
+        """Holds the estimated cost of a prediction.
+
+        Returns:
+            Optional[float]: The held amount, or None if the user cannot
+            afford it.
+        """
+        if user.balance <= 0:
+            return None
+        estimate = self.estimate_cost(model, input_text)
+        if not self.user_repository.reserve_funds(user.id, estimate):
+            logging.warning(
+                f"Billing: User {user.id} cannot afford estimated cost "
+                f"{estimate:.6f} (available {self.available_balance(user):.6f})"
+            )
+            return None
+        return estimate
+
+    def release(self, user_id: int, amount: Optional[float]) -> None:
+        """Releases a hold, e.g. when the prediction could not be queued."""
+        if amount:
+            self.user_repository.release_funds(user_id, amount)
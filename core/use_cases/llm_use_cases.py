@@ -2,9 +2,18 @@
 
 # TODO should divide logic for WORKER and for API!
 # For API we do NOT need load LLMs and llm classes or methods!!!
+import asyncio
+import hashlib
 import logging
 import time
 from datetime import datetime, timezone # Ensure timezone is imported
+from typing import Callable, Optional
+
+from config.settings import (
+    LLM_MAX_OUTPUT_TOKENS,
+    PREDICTION_LEASE_SECONDS,
+    SYSTEM_PROMPT,
+)
 
 from core.entities.prediction import Prediction
 from core.entities.transaction import Transaction
@@ -12,93 +21,369 @@ from core.repositories.user_repository import UserRepository
 from core.repositories.model_repository import ModelRepository
 from core.repositories.prediction_repository import PredictionRepository
 from core.repositories.transaction_repository import TransactionRepository
+from core.repositories.llm_backend_repository import LLMBackendRepository
+from core.repositories.response_cache_repository import ResponseCacheRepository
+from core.repositories.single_flight_repository import SingleFlightRepository
+from core.use_cases.billing_use_cases import (
+    bucket_token_budget,
+    estimate_tokens,
+    max_prediction_cost,
+    output_token_budget,
+)
+from core.use_cases.settlement_use_cases import SettlementUseCases
 # from infra.llm.gguf_llm import predict  # MOVED TO BOTTOM! NEED OTHER LOGIC!
 
+# Billing policies for responses served from the cache
+CACHE_BILLING_POLICIES = ("full", "input", "free")
+
+
+def prompt_cache_key(model_id: int, system_prompt: str, input_text: str) -> str:
+    """Builds the exact-match cache key of a prompt.
+
+    Whitespace is normalised (trimmed and collapsed), case is kept since it
+    may change the answer.
+    """
+    normalised = " ".join(input_text.split())
+    raw = f"{model_id}\x00{system_prompt}\x00{normalised}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
 class LLMUseCases:
     def __init__(
         self,
         user_repository: UserRepository,
         model_repository: ModelRepository,
         prediction_repository: PredictionRepository,
-        transaction_repository: TransactionRepository
+        transaction_repository: TransactionRepository,
+        response_cache: Optional[ResponseCacheRepository] = None,
+        cache_hit_billing: str = "full",
+        single_flight: Optional[SingleFlightRepository] = None,
+        max_output_tokens: int = LLM_MAX_OUTPUT_TOKENS,
+        cancel_poll_seconds: float = 2.0,
+        metrics: Optional[Callable[[str, float], None]] = None,
+        llm_backend: Optional[LLMBackendRepository] = None,
+        settlement: Optional[SettlementUseCases] = None,
+        lease_seconds: float = PREDICTION_LEASE_SECONDS,
     ):
-        """Initializes the LLMUseCases with necessary repositories."""
+        """Initializes the LLMUseCases with necessary repositories.
+
+        Args:
+            response_cache: Optional exact-match cache in front of the LLM.
+            cache_hit_billing: How cache hits are charged, one of
+                CACHE_BILLING_POLICIES ("full", "input" or "free"). Results
+                shared by single-flight are charged the same way.
+            single_flight: Optional coalescing of identical in-flight prompts.
+            max_output_tokens: Hard cap of generated tokens; the budget is
+                lowered further to what the user's balance can pay for. It
+                also bounds what a prediction holds of the balance.
+            cancel_poll_seconds: How often a running generation checks
+                whether its prediction was cancelled.
+            metrics: Optional counter callback, metrics(name, amount).
+            llm_backend: Runs the generation on the endpoints of the model
+                (None: the default OpenAI-compatible endpoint).
+            settlement: Batched settlement of the charges (None: each
+                prediction updates the balance itself).
+            lease_seconds: How long a worker holds a running prediction
+                before another delivery of the job may take it over.
+        """
+        if cache_hit_billing not in CACHE_BILLING_POLICIES:
+            raise ValueError(f"Unknown cache billing policy: {cache_hit_billing}")
         self.user_repository = user_repository
         self.model_repository = model_repository
         self.prediction_repository = prediction_repository
         self.transaction_repository = transaction_repository
+        self.response_cache = response_cache
+        self.cache_hit_billing = cache_hit_billing
+        self.single_flight = single_flight
+        self.max_output_tokens = max_output_tokens
+        self.cancel_poll_seconds = cancel_poll_seconds
+        self.metrics = metrics
+        self.llm_backend = llm_backend
+        self.settlement = settlement
+        self.lease_seconds = lease_seconds
+
+    def _count(self, name: str, amount: float = 1) -> None:
+        if self.metrics:
+            self.metrics(name, amount)
+
+    def _buffer_charge(
+        self, prediction: Prediction, cost: float, reserved: float
+    ) -> bool:
+        """Hands the charge to batched settlement; False if it is off or
+        surely not buffered (the caller then settles immediately)."""
+        if not self.settlement:
+            return False
+        try:
+            if not self.settlement.record(
+                prediction.user_id, prediction.id, cost, reserved
+            ):
+                logging.warning(
+                    f"Use Case: Prediction {prediction.id} already charged."
+                )
+            return True
+        except ConnectionRefusedError as e:
+            # Nothing reached the buffer
+            logging.warning(f"Use Case: Charge buffer unavailable: {e}")
+            return False
+        except Exception as e:
+            # E.g. a timeout after the charge was sent: it may be buffered
+            logging.warning(
+                f"Use Case: Charge of prediction {prediction.id} may not be "
+                f"buffered: {e}"
+            )
+        try:
+            # Settled directly only if the buffer can no longer take it
+            return not self.settlement.claim_unbuffered(prediction.id)
+        except Exception as e:
+            # Never charge twice: a missing charge shows up in the ledger
+            # reconciliation, a double one would not be undone
+            logging.error(
+                f"Use Case: Charge of prediction {prediction.id} left "
+                f"unsettled, buffer unreachable: {e}"
+            )
+            return True
+
+    async def _watch_cancel(
+        self, prediction_id: int, cancel_event: asyncio.Event,
+        claim_token: Optional[str] = None,
+    ) -> bool:
+        """Sets cancel_event once the prediction is marked 'cancelling' and
+        keeps renewing its lease meanwhile.
+
+        Returns:
+            bool: True if the lease was lost (another worker took the
+            prediction over), the generation is then cancelled too.
+        """
+        renewed_at = time.monotonic()
+        while not cancel_event.is_set():
+            await asyncio.sleep(self.cancel_poll_seconds)
+            if (claim_token
+                    and time.monotonic() - renewed_at
+                    >= self.lease_seconds / 3):
+                # Heartbeat: the status comes with the renewal
+                status = self.prediction_repository.renew_lease(
+                    prediction_id, claim_token, self.lease_seconds
+                )
+                if status is None:
+                    logging.warning(
+                        f"Use Case: Lost the lease of prediction "
+                        f"{prediction_id}, stopping."
+                    )
+                    cancel_event.set()
+                    return True
+                renewed_at = time.monotonic()
+            else:
+                status = self.prediction_repository.get_status(prediction_id)
+            if status == 'cancelling':
+                logging.info(f"Use Case: Prediction {prediction_id} cancelled.")
+                cancel_event.set()
+        return False
         
-    async def create_prediction(self, prediction_id: int, user_id: int, input_text: str) -> Prediction:
-        """Processes an existing prediction (billing, LLM call, status update)."""
-        # 1. Load existing prediction record
-        
-        prediction = self.prediction_repository.get_by_id(prediction_id)
-        if not prediction:
-            logging.error(f"Use Case Error: Prediction not found for id={prediction_id}")
-            raise ValueError(f"Prediction with id {prediction_id} not found.")
+    async def create_prediction(
+        self, prediction_id: int, user_id: int, input_text: Optional[str],
+        claim_token: Optional[str] = None,
+    ) -> Optional[Prediction]:
+        """Processes an existing prediction (billing, LLM call, status update).
+
+        Returns None without doing anything if the prediction does not exist
+        or another worker is running it (duplicate delivery of the job).
+        """
+        # 1. Claim the prediction and load its user and model in one
+        # atomic step (marks it 'processing' with its queue_time)
+        context = self.prediction_repository.start_processing(
+            prediction_id, claim_token, self.lease_seconds
+        )
+        if not context:
+            logging.warning(
+                f"Use Case: Prediction {prediction_id} not found or held by "
+                f"another worker, skipping."
+            )
+            return None
+        prediction = context.prediction
+        if not context.claimed:
+            # Cancelled while queued (the hold was released at cancel
+            # time) or already finished by another delivery of the job
+            logging.info(
+                f"Use Case: Skipping {prediction.status} prediction {prediction_id}"
+            )
+            return prediction
         logging.info(f"Use Case: Starting prediction for id={prediction_id}")
+        if input_text is None:
+            # Dispatched from the queue table, the prompt lives in the record
+            input_text = prediction.input_text
 
-        # 2. Get User
-        user = self.user_repository.get_by_id(prediction.user_id)
+        # 2. User of the prediction
+        user = context.user
         if not user:
             logging.error(f"Use Case Error: User not found for id={prediction.user_id}")
             raise ValueError(f"User with id {prediction.user_id} not found.")
 
-        # 3. Get Active Model
-        model = self.model_repository.get_active_model()
-        if not model:
-            logging.error("Use Case Error: No active LLM model found.")
-            raise ValueError("No active LLM model configured.")
-        logging.info(f"Use Case: Using model '{model.name}' (ID: {model.id})")
-
-        # 4. Check Balance
-        # For now, let's assume a minimum cost or just check > 0
-        if user.balance <= 0:
-            logging.warning(f"Use Case Warning: User {user_id} has insufficient balance ({user.balance})")
-            # In a real app, raise InsufficientFundsError
-            raise ValueError("Insufficient balance to create prediction.")
-
-        # 5. Mark prediction as processing
-        prediction.status = 'processing'
-        # Calculate queue_time before updating with 'processing' status
-        if prediction.created_at:
-            start_processing_time_utc = datetime.now(timezone.utc)
-
-            # Ensure prediction.created_at is UTC
-            if prediction.created_at.tzinfo is None:
-                # If naive, assume it's UTC and make it aware
-                created_at_utc = prediction.created_at.replace(tzinfo=timezone.utc)
-            else:
-                # If aware, convert to UTC
-                created_at_utc = prediction.created_at.astimezone(timezone.utc)
-            
-            queue_duration = start_processing_time_utc - created_at_utc
-            # Convert duration to milliseconds
-            prediction.queue_time = int(queue_duration.total_seconds() * 1000)
-        else:
-            # Fallback if created_at is somehow not set
-            logging.warning(
-                f"Prediction ID {prediction.id} missing created_at "
-                f"for queue_time calculation."
+        # (the estimated cost was already held at submission, see
+        # BillingUseCases, and is settled against the real cost below)
+        reserved_cost = prediction.reserved_cost or 0.0
+        hold_released = False
+        if prediction.status == 'cancelled':
+            # Cancelled after a worker claimed it, before generation started
+            self.user_repository.release_funds(user.id, reserved_cost)
+            return prediction
+
+        # Skip jobs whose submitter stopped waiting, before any LLM work
+        if prediction.status == 'expired':
+            logging.info(
+                f"Use Case: Prediction {prediction.id} expired in the queue "
+                f"(waited {prediction.queue_time} ms)."
             )
-            prediction.queue_time = None
+            self.user_repository.release_funds(user.id, reserved_cost)
+            # Shed work: jobs, prompt tokens never sent and time they waited
+            self._count("predictions_expired")
+            self._count(
+                "predictions_expired_input_tokens", estimate_tokens(input_text)
+            )
+            self._count(
+                "predictions_expired_queue_ms", prediction.queue_time or 0
+            )
+            return prediction
 
-        # Update with status 'processing' and calculated queue_time
-        self.prediction_repository.update(prediction)
-        
         start_time = time.time()  # For process_time calculation
 
         try:
-            from infra.llm.openai_llm import predict
-            # 5. Call the LLM (Dummy Implementation)
-            llm_result = await predict(input_text)
+            # 3. The model chosen at submission, or the active one if it
+            # was deactivated meanwhile
+            model = context.model
+            if not model:
+                logging.error("Use Case Error: No active LLM model found.")
+                raise ValueError("No active LLM model configured.")
+            logging.info(f"Use Case: Using model '{model.name}' (ID: {model.id})")
+
+            # 4. Check Balance
+            # For now, let's assume a minimum cost or just check > 0
+            if user.balance <= 0:
+                logging.warning(f"Use Case Warning: User {user_id} has insufficient balance ({user.balance})")
+                # In a real app, raise InsufficientFundsError
+                raise ValueError("Insufficient balance to create prediction.")
+
+            # 5. Limit the generation to what the user can pay for. Free
+            # balance is added to this prediction's hold first (atomic), so
+            # parallel predictions of the user cannot spend the same funds.
+            # Never more than the capped cost, the rest stays free for them
+            max_cost = max_prediction_cost(
+                model, input_text, self.max_output_tokens
+            )
+            if max_cost is not None and max_cost > reserved_cost:
+                extra = self.user_repository.reserve_up_to(
+                    user.id, max_cost - reserved_cost
+                )
+                if extra > 0:
+                    reserved_cost += extra
+                    # Released with the rest of the hold, also on recovery
+                    prediction.reserved_cost = reserved_cost
+                    self.prediction_repository.update_changed(prediction)
+            available = reserved_cost
+            max_tokens = bucket_token_budget(
+                output_token_budget(
+                    available, model, input_text, self.max_output_tokens
+                ),
+                self.max_output_tokens,
+            )
+            if max_tokens is not None and max_tokens < 1:
+                raise ValueError("Insufficient balance to generate any output.")
+            logging.info(f"Use Case: Output token budget: {max_tokens}")
+
+            # Look up the response cache, then call the LLM on a miss
+            prompt_key = prompt_cache_key(model.id, SYSTEM_PROMPT, input_text)
+            llm_result = None
+            if self.response_cache:
+                llm_result = self.response_cache.get(prompt_key)
+                # Only complete answers are cached, but one generated with
+                # a larger budget may be longer than this prediction can
+                # pay for: generated again within the budget
+                if (llm_result is not None and max_tokens is not None
+                        and llm_result['output_tokens'] > max_tokens):
+                    llm_result = None
+            # Served from the cache or shared with an identical prompt
+            reused = llm_result is not None
+            if reused:
+                logging.info(f"Use Case: Cache hit for prediction {prediction.id}")
+            else:
+                # Stops the generation when the prediction gets cancelled
+                cancel_event = asyncio.Event()
+
+                async def generate() -> dict:
+                    if self.llm_backend:
+                        result = await self.llm_backend.predict(
+                            model, input_text, max_tokens=max_tokens,
+                            cancel_event=cancel_event,
+                        )
+                    else:
+                        from infra.llm.openai_llm import predict
+                        result = await predict(
+                            input_text, max_tokens=max_tokens,
+                            cancel_event=cancel_event,
+                        )
+                    # Answers cut by the budget or a cancel are not the full
+                    # answer
+                    if (self.response_cache
+                            and result.get('finish_reason')
+                            not in ('length', 'cancelled')):
+                        self.response_cache.set(prompt_key, result)
+                    return result
+
+                watcher = asyncio.create_task(
+                    self._watch_cancel(
+                        prediction.id, cancel_event, prediction.claim_token
+                    )
+                )
+                try:
+                    if self.single_flight:
+                        # Identical prompts in flight share one generation
+                        # (only among predictions with the same budget)
+                        llm_result, reused = await self.single_flight.run(
+                            f"{prompt_key}:{max_tokens}", generate,
+                            cancel_event,
+                        )
+                        if llm_result is None:
+                            # Cancelled while waiting for the identical
+                            # prompt: nothing was generated for it
+                            llm_result = {
+                                'output_text': '', 'input_tokens': 0,
+                                'output_tokens': 0,
+                                'finish_reason': 'cancelled',
+                            }
+                        elif (reused and not cancel_event.is_set()
+                                and llm_result.get('finish_reason')
+                                == 'cancelled'):
+                            # The shared generation was cancelled by
+                            # someone else, this prediction still wants it
+                            llm_result, reused = await generate(), False
+                    else:
+                        llm_result = await generate()
+                finally:
+                    watcher.cancel()
+                if (watcher.done() and not watcher.cancelled()
+                        and watcher.result()):
+                    # Another worker runs it now and settles its hold
+                    return None
+            cancelled = llm_result.get('finish_reason') == 'cancelled'
             process_time_ms = int((time.time() - start_time) * 1000)
             logging.info(f"Use Case: Dummy LLM returned: {llm_result}")
 
             # 6. Calculate Cost
             input_cost = llm_result['input_tokens'] * model.input_token_price
             output_cost = llm_result['output_tokens'] * model.output_token_price
+            if reused and self.cache_hit_billing == "input":
+                output_cost = 0.0
+            elif reused and self.cache_hit_billing == "free":
+                input_cost = output_cost = 0.0
             total_cost = input_cost + output_cost
+            if 0 < reserved_cost < total_cost:
+                # The input was longer than estimated. Never more than the
+                # hold, the rest of the balance may be held by other
+                # predictions of the user
+                logging.warning(
+                    f"Use Case: Cost {total_cost:.6f} of prediction "
+                    f"{prediction.id} capped at its hold {reserved_cost:.6f}."
+                )
+                total_cost = reserved_cost
             logging.info(f"Use Case: Calculated cost: {total_cost:.6f}")
 
             # 6. Update Prediction Record with Results
@@ -106,34 +391,49 @@ class LLMUseCases:
             prediction.input_tokens = llm_result['input_tokens']
             prediction.output_tokens = llm_result['output_tokens']
             prediction.total_cost = total_cost
-            prediction.status = 'completed'
+            # A cancelled prediction pays only for the tokens produced
+            prediction.status = 'cancelled' if cancelled else 'completed'
             prediction.process_time = process_time_ms
             prediction.completed_at = datetime.now(timezone.utc)  # Set completed_at as UTC
             # Original comment below is now addressed by the line above
             # completed_at is set automatically by the repository update method # TODO NEED TEST
 
-            # 7. Update User Balance & Create Transaction
-            new_balance = user.balance - total_cost
-            if new_balance < 0:
+            # 7. Batched settlement: the hold stays on the balance until the
+            # flusher settles this charge with the user's other charges
+            if self._buffer_charge(prediction, total_cost, reserved_cost):
+                hold_released = True
+                self.prediction_repository.update_changed(prediction)
+                logging.info(
+                    f"Use Case: Buffered charge of prediction {prediction.id} "
+                    f"for settlement."
+                )
+                return prediction
+
+            # 7. Charge the user (capped at the balance) and release the
+            # funds held at submission, in one atomic update
+            settled = self.user_repository.settle_charge(
+                user.id, total_cost, reserved_cost
+            )
+            if settled is None:
+                raise ValueError(f"Failed to charge user {user.id}.")
+            hold_released = True
+            actual_cost, new_balance = settled
+            if actual_cost < total_cost:
                 # This case should ideally be caught earlier,
                 # but handle defensively
                 logging.warning(
                     f"Use Case Warning: User {user_id} balance "
-                    f"({user.balance}) insufficient for cost ({total_cost}). "
-                    f"Setting balance to 0."
+                    f"insufficient for cost ({total_cost}). "
+                    f"Charged only {actual_cost}."
                 )
-                # For simplicity, cap at 0
-                actual_cost = user.balance  # Charge only what they have
-                new_balance = 0.0
                 # Adjust prediction cost recorded
                 prediction.total_cost = actual_cost
-            else:
-                actual_cost = total_cost
 
-            # Update prediction in DB before charging
-            self.prediction_repository.update(prediction)
+            # Update prediction in DB after charging (cost may be capped)
+            self.prediction_repository.update_changed(prediction)
             logging.info(
-                f"Use Case: Updated prediction record {prediction.id} to 'completed'."
+                f"Use Case: Updated prediction record {prediction.id} "
+                f"to '{prediction.status}'."
             )
 
             # Create transaction record
@@ -148,8 +448,6 @@ class LLMUseCases:
                 f"Use Case: Created transaction for prediction {prediction.id}"
             )
 
-            # Update user's balance in DB
-            self.user_repository.update_balance(user.id, new_balance)
             logging.info(
                 f"Use Case: Updated balance for user {user.id} to {new_balance:.2f}"
             )
@@ -169,6 +467,8 @@ class LLMUseCases:
             prediction.completed_at = datetime.now(timezone.utc)
             # Optionally add error message to output_text or a new field
             prediction.output_text = f"Error: {e}"
-            self.prediction_repository.update(prediction)
+            self.prediction_repository.update_changed(prediction)
             # Do not charge the user if the process failed
+            if not hold_released:
+                self.user_repository.release_funds(user.id, reserved_cost)
             raise  # Re-raise the exception
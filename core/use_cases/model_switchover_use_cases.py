@@ -0,0 +1,128 @@
+# core/use_cases/model_switchover_use_cases.py
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+from core.entities.model_switchover import ModelSwitchover
+from core.repositories.model_repository import ModelRepository
+from core.repositories.model_switchover_repository import (
+    ModelSwitchoverRepository
+)
+
+
+class ModelSwitchoverUseCases:
+    """Changes the active model without load stalls.
+
+    1. warming: every live worker loads and warms the new model in the
+       background while the old one keeps serving.
+    2. cutover: both is_active flags flip in one statement.
+    3. draining: workers finish the running requests of the old model and
+       unload it once idle.
+
+    Workers take part through their residency reports (see
+    ModelSwitchoverRepository.report_residency).
+    """
+
+    def __init__(
+        self,
+        model_repository: ModelRepository,
+        switchover_repository: ModelSwitchoverRepository,
+        heartbeat_seconds: float = 60.0,
+        poll_seconds: float = 2.0,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """Initializes the use cases.
+
+        Args:
+            heartbeat_seconds (float): A worker without a report for this
+                long is considered gone.
+            poll_seconds (float): Interval between readiness checks.
+        """
+        self.model_repository = model_repository
+        self.switchover_repository = switchover_repository
+        self.heartbeat_seconds = heartbeat_seconds
+        self.poll_seconds = poll_seconds
+        self.sleep = sleep
+
+    def _wait(self, done: Callable[[], bool], timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while not done():
+            if time.monotonic() >= deadline:
+                return False
+            self.sleep(self.poll_seconds)
+        return True
+
+    def _finish(self, switchover: ModelSwitchover, status: str) -> ModelSwitchover:
+        switchover.status = status
+        switchover.completed_at = datetime.now(timezone.utc)
+        self.switchover_repository.update(switchover)
+        return switchover
+
+    def switch(
+        self,
+        to_model_id: int,
+        warm_timeout: float = 600.0,
+        drain_timeout: float = 600.0,
+    ) -> ModelSwitchover:
+        """Makes to_model_id the active model (blocking until drained).
+
+        If the workers are not warm within warm_timeout the switch fails and
+        the old model stays active. The drain timeout only bounds the wait,
+        the cutover has already happened by then.
+
+        Raises:
+            ValueError: If the model does not exist.
+        """
+        if self.model_repository.get_by_id(to_model_id) is None:
+            raise ValueError(f"Model {to_model_id} not found.")
+        current = self.model_repository.get_active_model()
+        switchover = self.switchover_repository.add(ModelSwitchover(
+            from_model_id=current.id if current else None,
+            to_model_id=to_model_id,
+            warm_until=datetime.now(timezone.utc)
+            + timedelta(seconds=warm_timeout),
+        ))
+        if current is not None and current.id == to_model_id:
+            return self._finish(switchover, 'completed')
+
+        logging.info(f"Switchover {switchover.id}: Warming model {to_model_id}")
+        warm = self._wait(
+            lambda: self.switchover_repository.count_unready_workers(
+                to_model_id, self.heartbeat_seconds
+            ) == 0,
+            warm_timeout,
+        )
+        if not warm:
+            logging.warning(
+                f"Switchover {switchover.id}: Workers not warm after "
+                f"{warm_timeout}s, keeping model {switchover.from_model_id}"
+            )
+            return self._finish(switchover, 'failed')
+
+        if not self.model_repository.switch_active_model(
+            switchover.from_model_id, to_model_id
+        ):
+            logging.warning(
+                f"Switchover {switchover.id}: Active model changed meanwhile"
+            )
+            return self._finish(switchover, 'failed')
+        switchover.status = 'draining'
+        switchover.cutover_at = datetime.now(timezone.utc)
+        self.switchover_repository.update(switchover)
+        logging.info(f"Switchover {switchover.id}: Cut over to {to_model_id}")
+
+        if switchover.from_model_id is not None:
+            drained = self._wait(
+                lambda: self.switchover_repository.count_hosting_workers(
+                    switchover.from_model_id, self.heartbeat_seconds
+                ) == 0,
+                drain_timeout,
+            )
+            if not drained:
+                logging.warning(
+                    f"Switchover {switchover.id}: Model "
+                    f"{switchover.from_model_id} still loaded after "
+                    f"{drain_timeout}s"
+                )
+        return self._finish(switchover, 'completed')
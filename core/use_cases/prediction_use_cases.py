@@ -0,0 +1,61 @@
+# core/use_cases/prediction_use_cases.py
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from core.entities.prediction import Prediction
+from core.repositories.prediction_repository import PredictionRepository
+from core.repositories.user_repository import UserRepository
+
+
+def queue_deadline(
+    max_queue_seconds: Optional[float] = None,
+    deadline_at: Optional[datetime] = None,
+) -> Optional[datetime]:
+    """Combines a max queue time and an absolute deadline (the earlier
+    one wins) into the deadline stored on the prediction."""
+    deadlines = []
+    if max_queue_seconds:
+        deadlines.append(
+            datetime.now(timezone.utc) + timedelta(seconds=max_queue_seconds)
+        )
+    if deadline_at:
+        if deadline_at.tzinfo is None:
+            deadline_at = deadline_at.replace(tzinfo=timezone.utc)
+        deadlines.append(deadline_at)
+    return min(deadlines) if deadlines else None
+
+
+class PredictionUseCases:
+    """Use cases of a prediction outside of the worker (e.g. cancellation)."""
+
+    def __init__(
+        self,
+        prediction_repository: PredictionRepository,
+        user_repository: UserRepository,
+    ):
+        """Initializes the PredictionUseCases with necessary repositories."""
+        self.prediction_repository = prediction_repository
+        self.user_repository = user_repository
+
+    def cancel(self, prediction: Prediction) -> Optional[str]:
+        """Cancels a pending or processing prediction.
+
+        A pending prediction is cancelled at once and its funds hold is
+        released here. A processing one is marked 'cancelling': the worker
+        stops the generation, charges only the tokens already produced and
+        marks it 'cancelled'.
+
+        Returns:
+            Optional[str]: 'cancelled', 'cancelling', or None if the
+            prediction had already finished.
+        """
+        status = self.prediction_repository.request_cancel(prediction.id)
+        if status == 'cancelled' and prediction.reserved_cost:
+            self.user_repository.release_funds(
+                prediction.user_id, prediction.reserved_cost
+            )
+        logging.info(
+            f"Use Case: Cancel of prediction {prediction.id}: {status}"
+        )
+        return status
@@ -0,0 +1,156 @@
+# core/use_cases/queue_use_cases.py
+import logging
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+from core.entities.queue_item import QueueItem
+from core.repositories.queue_repository import QueueRepository
+
+
+class QueueUseCases:
+    """Fair-share dispatch of queued predictions to the LLM workers.
+
+    Predictions are not sent to the worker queue directly. They wait in the
+    queue table and are released with deficit round-robin (DRR) across users,
+    so one user submitting thousands of prompts cannot starve everyone else.
+    Every released job costs 1, and each user's deficit is seeded with minus
+    their in-flight jobs, so the queue table is the only state we need.
+    """
+
+    def __init__(
+        self,
+        queue_repository: QueueRepository,
+        max_in_flight: int = 8,
+        quantum: float = 1.0,
+        aging_seconds: float = 30.0,
+        stale_seconds: float = 600.0,
+    ):
+        """Initializes the QueueUseCases with the queue repository.
+
+        Args:
+            queue_repository (QueueRepository): Queue table persistence.
+            max_in_flight (int): Jobs allowed in the worker queue at once.
+            quantum (float): Deficit added per user on each DRR round
+                (must be positive).
+            aging_seconds (float): Waiting time that adds +1 priority.
+            stale_seconds (float): Time after which a dispatched item whose
+                job shows no sign of life is queued again (0: never).
+        """
+        if quantum <= 0:
+            # A round would add nothing, the DRR loop could never progress
+            raise ValueError(f"DRR quantum must be positive: {quantum}")
+        self.queue_repository = queue_repository
+        self.max_in_flight = max_in_flight
+        self.quantum = quantum
+        self.aging_seconds = aging_seconds
+        self.stale_seconds = stale_seconds
+
+    def submit(
+        self, prediction_id: int, user_id: int, priority: int = 0
+    ) -> QueueItem:
+        """Puts a prediction into the queue table with status 'waiting'."""
+        item = QueueItem(
+            prediction_id=prediction_id,
+            user_id=user_id,
+            priority=priority,
+            status='waiting',
+        )
+        return self.queue_repository.add(item)
+
+    def complete(self, prediction_id: int, status: str = 'completed') -> bool:
+        """Marks the queue item of a finished prediction, freeing its slot."""
+        return self.queue_repository.update_status(prediction_id, status)
+
+    def cancel(self, prediction_id: int) -> bool:
+        """Drops a prediction still waiting in the queue table."""
+        return self.queue_repository.cancel_waiting(prediction_id)
+
+    def dispatch(self, send: Callable[[QueueItem], None]) -> int:
+        """Releases waiting items into free worker slots in fair-share order.
+
+        Args:
+            send (Callable[[QueueItem], None]): Hands an item to the workers.
+
+        Returns:
+            int: Number of items sent.
+        """
+        if self.stale_seconds > 0:
+            # Lost jobs would otherwise hold their slots forever
+            requeued = self.queue_repository.requeue_stale(self.stale_seconds)
+            if requeued:
+                logging.warning(f"Queue: Freed {requeued} stale item(s).")
+        in_flight = self.queue_repository.count_processing_by_user()
+        slots = self.max_in_flight - sum(in_flight.values())
+        if slots <= 0:
+            return 0
+        waiting = self.queue_repository.list_waiting(limit_per_user=slots)
+        selected = self.select_fair(waiting, in_flight, slots)
+        # Only items we managed to move to 'processing' are ours to send
+        moved = set(
+            self.queue_repository.mark_processing(
+                [i.id for i in selected], self.max_in_flight
+            )
+        )
+        sent = 0
+        for item in selected:
+            if item.id in moved:
+                send(item)
+                sent += 1
+        if sent:
+            logging.info(f"Queue: Dispatched {sent} item(s) to workers.")
+        return sent
+
+    def effective_priority(self, item: QueueItem, now: datetime) -> float:
+        """Returns the item priority aged by its waiting time."""
+        if not item.queued_at or self.aging_seconds <= 0:
+            return float(item.priority)
+        queued_at = item.queued_at
+        if queued_at.tzinfo is None:
+            queued_at = queued_at.replace(tzinfo=timezone.utc)
+        waited = (now - queued_at).total_seconds()
+        return item.priority + max(waited, 0.0) / self.aging_seconds
+
+    def select_fair(
+        self,
+        waiting: List[QueueItem],
+        in_flight: Dict[int, int],
+        slots: int,
+    ) -> List[QueueItem]:
+        """Picks up to `slots` items with deficit round-robin across users.
+
+        Users are visited in order of their best aged priority, so old items
+        are served first when slots are scarce. On each visit a user earns
+        `quantum` scaled by the static priority of its head item and spends 1
+        per item. Aging only reorders, it never buys extra throughput.
+        """
+        now = datetime.now(timezone.utc)
+        per_user: Dict[int, deque] = {}
+        for item in sorted(
+            waiting,
+            key=lambda i: (
+                -self.effective_priority(i, now),
+                i.queued_at or now,
+            ),
+        ):
+            per_user.setdefault(item.user_id, deque()).append(item)
+
+        deficits = {
+            user_id: -float(in_flight.get(user_id, 0)) for user_id in per_user
+        }
+        selected: List[QueueItem] = []
+        # per_user keeps insertion order, i.e. users by their best item
+        while slots > 0 and per_user:
+            for user_id in list(per_user):
+                items = per_user[user_id]
+                weight = 1.0 + max(items[0].priority, 0)
+                deficits[user_id] += self.quantum * weight
+                while items and slots > 0 and deficits[user_id] >= 1.0:
+                    selected.append(items.popleft())
+                    deficits[user_id] -= 1.0
+                    slots -= 1
+                if not items:
+                    del per_user[user_id]
+                if slots <= 0:
+                    break
+        return selected
@@ -0,0 +1,84 @@
+# core/use_cases/settlement_use_cases.py
+import logging
+
+from core.entities.charge import Charge
+from core.repositories.charge_buffer_repository import ChargeBufferRepository
+from core.repositories.settlement_repository import SettlementRepository
+
+
+class SettlementUseCases:
+    """Batched balance settlement.
+
+    Finished predictions append their charge to a fast buffer instead of
+    updating the user's row each; flush() settles the buffered charges with
+    one balance update per user. The prediction's hold
+    stays on the balance until its charge is settled, so the settlement lag
+    can never let a user spend the same funds twice.
+    """
+
+    def __init__(
+        self,
+        charge_buffer: ChargeBufferRepository,
+        settlement_repository: SettlementRepository,
+        name: str = "default",
+        batch_size: int = 1000,
+    ):
+        """Initializes the use cases.
+
+        Args:
+            name (str): Buffer name, keys the settled offset in Postgres.
+            batch_size (int): Charges settled per transaction.
+        """
+        self.charge_buffer = charge_buffer
+        self.settlement_repository = settlement_repository
+        self.name = name
+        self.batch_size = batch_size
+
+    def record(
+        self, user_id: int, prediction_id: int, amount: float, reserved: float
+    ) -> bool:
+        """Buffers the charge of a finished prediction.
+
+        Returns:
+            bool: False if the prediction was already charged.
+        """
+        return self.charge_buffer.append(Charge(
+            user_id=user_id,
+            prediction_id=prediction_id,
+            amount=amount,
+            reserved=reserved,
+        ))
+
+    def claim_unbuffered(self, prediction_id: int) -> bool:
+        """Takes a prediction out of batched settlement when it is unknown
+        whether its charge was buffered (it is then charged directly).
+
+        Returns:
+            bool: False if its charge is in the buffer after all.
+        """
+        return self.charge_buffer.claim(prediction_id)
+
+    def flush(self) -> int:
+        """Settles buffered charges until the buffer is empty.
+
+        Returns:
+            int: The number of charges settled.
+        """
+        settled = 0
+        while True:
+            offset = self.settlement_repository.get_offset(self.name)
+            charges = self.charge_buffer.read_after(offset, self.batch_size)
+            if not charges:
+                return settled
+            applied = self.settlement_repository.apply(self.name, charges)
+            if applied is None:
+                return settled  # Another flusher is on it
+            # Everything read is settled now (by us or before a crash)
+            self.charge_buffer.delete_through(charges[-1].seq)
+            settled += applied
+            logging.info(
+                f"Settlement: Settled {applied} charge(s) "
+                f"through #{charges[-1].seq}"
+            )
+            if len(charges) < self.batch_size:
+                return settled
@@ -0,0 +1,101 @@
+# infra/cache/charge_buffer.py
+# Redis buffer of charges awaiting batched settlement (see
+# SettlementUseCases). Charges live in a sorted set scored by their seq;
+# Redis should run with appendonly persistence so buffered charges survive
+# a restart.
+import json
+import os
+from typing import List
+
+from core.entities.charge import Charge
+from core.repositories.charge_buffer_repository import ChargeBufferRepository
+
+# How long a prediction is remembered as charged (duplicate job deliveries)
+SETTLEMENT_DEDUP_TTL_SECONDS = int(
+    os.getenv("SETTLEMENT_DEDUP_TTL_SECONDS", "604800")
+)
+
+# Atomic append: once per prediction, seq = Redis clock in microseconds (kept
+# increasing), so seqs never go back below the settled offset even if the
+# buffer was lost
+_APPEND_LUA = """
+if not redis.call('SET', KEYS[3], '1', 'NX', 'EX', ARGV[2]) then
+    return 0
+end
+local now = redis.call('TIME')
+local seq = tonumber(now[1]) * 1000000 + tonumber(now[2])
+local last = tonumber(redis.call('GET', KEYS[2]) or '0')
+if seq <= last then
+    seq = last + 1
+end
+seq = string.format('%d', seq)
+redis.call('SET', KEYS[2], seq)
+redis.call('ZADD', KEYS[1], seq, seq .. ':' .. ARGV[1])
+return seq
+"""
+
+
+class RedisChargeBuffer(ChargeBufferRepository):
+    """Charges buffered in a Redis sorted set."""
+
+    def __init__(
+        self,
+        url: str,
+        prefix: str = "sbllm:settle:",
+        dedup_ttl_seconds: int = SETTLEMENT_DEDUP_TTL_SECONDS,
+    ):
+        import redis  # Optional dependency, only needed for this backend
+        self._connection_error = redis.ConnectionError
+        self._redis = redis.Redis.from_url(url)
+        self._append = self._redis.register_script(_APPEND_LUA)
+        self.prefix = prefix
+        self.key = prefix + "charges"
+        self.dedup_ttl_seconds = dedup_ttl_seconds
+
+    def append(self, charge: Charge) -> bool:
+        payload = json.dumps({
+            "user_id": charge.user_id,
+            "prediction_id": charge.prediction_id,
+            "amount": charge.amount,
+            "reserved": charge.reserved,
+        })
+        try:
+            seq = self._append(
+                keys=[
+                    self.key, self.prefix + "seq",
+                    self._charged_key(charge.prediction_id),
+                ],
+                args=[payload, self.dedup_ttl_seconds],
+            )
+        except self._connection_error as e:
+            # Refused before anything was sent; a connection lost later
+            # may have run the script, that stays a plain error
+            if isinstance(e.__context__, ConnectionRefusedError):
+                raise ConnectionRefusedError(str(e)) from e
+            raise
+        if not seq:
+            return False
+        charge.seq = int(seq)
+        return True
+
+    def claim(self, prediction_id: int) -> bool:
+        return bool(self._redis.set(
+            self._charged_key(prediction_id), "1",
+            nx=True, ex=self.dedup_ttl_seconds,
+        ))
+
+    def _charged_key(self, prediction_id: int) -> str:
+        return f"{self.prefix}charged:{prediction_id}"
+
+    def read_after(self, seq: int, limit: int) -> List[Charge]:
+        members = self._redis.zrangebyscore(
+            self.key, f"({seq}", "+inf", start=0, num=limit
+        )
+        charges = []
+        for member in members:
+            member_seq, payload = member.decode().split(":", 1)
+            charges.append(Charge(seq=int(member_seq), **json.loads(payload)))
+        return charges
+
+    def delete_through(self, seq: int) -> None:
+        self._redis.zremrangebyscore(self.key, "-inf", seq)
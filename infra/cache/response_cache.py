@@ -0,0 +1,121 @@
+# infra/cache/response_cache.py
+# Exact-match LLM response cache: in-process LRU or shared Redis LRU,
+# both bounded by entry count and TTL.
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from config.settings import REDIS_URL
+from core.repositories.response_cache_repository import (
+    ResponseCacheRepository
+)
+from infra.metrics import counters
+
+# "memory", "redis" or "off" (default: redis if REDIS_URL is set)
+RESPONSE_CACHE_BACKEND = os.getenv(
+    "RESPONSE_CACHE_BACKEND", "redis" if REDIS_URL else "memory"
+)
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "86400"))
+# What a cache hit costs the user: "full", "input" (input tokens only), "free"
+RESPONSE_CACHE_BILLING = os.getenv("RESPONSE_CACHE_BILLING", "full")
+
+
+def _count(hit: bool) -> None:
+    """Updates the hit-rate counters."""
+    counters.incr("response_cache_hits" if hit else "response_cache_misses")
+
+
+class InMemoryResponseCache(ResponseCacheRepository):
+    """LRU cache with TTL kept in the current process."""
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict = OrderedDict()  # key -> (expires, result)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry:
+                self._entries.move_to_end(key)
+        _count(entry is not None)
+        return dict(entry[1]) if entry else None
+
+    def set(self, key: str, result: dict) -> None:
+        with self._lock:
+            self._entries[key] = (
+                time.monotonic() + self.ttl_seconds, dict(result)
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class RedisResponseCache(ResponseCacheRepository):
+    """LRU cache with TTL shared by all processes through Redis.
+
+    Values expire by Redis TTL; a sorted set of last access times bounds the
+    number of entries.
+    """
+
+    def __init__(
+        self, url: str, max_entries: int, ttl_seconds: int,
+        prefix: str = "sbllm:cache:"
+    ):
+        import redis  # Optional dependency, only needed for this backend
+        self._redis = redis.Redis.from_url(url)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self.lru_key = prefix + "lru"
+
+    def get(self, key: str) -> Optional[dict]:
+        try:
+            raw = self._redis.get(self.prefix + key)
+            if raw is not None:
+                self._redis.zadd(self.lru_key, {key: time.time()})
+        except Exception as e:
+            logging.warning(f"Response cache: Redis get failed: {e}")
+            raw = None
+        _count(raw is not None)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, result: dict) -> None:
+        try:
+            pipe = self._redis.pipeline()
+            pipe.set(self.prefix + key, json.dumps(result), ex=self.ttl_seconds)
+            pipe.zadd(self.lru_key, {key: time.time()})
+            pipe.zcard(self.lru_key)
+            size = pipe.execute()[-1]
+            if size > self.max_entries:
+                evicted = self._redis.zpopmin(
+                    self.lru_key, size - self.max_entries
+                )
+                if evicted:
+                    self._redis.delete(
+                        *(self.prefix + k.decode() for k, _ in evicted)
+                    )
+        except Exception as e:
+            logging.warning(f"Response cache: Redis set failed: {e}")
+
+
+def get_response_cache() -> Optional[ResponseCacheRepository]:
+    """Builds the response cache configured by RESPONSE_CACHE_BACKEND."""
+    if RESPONSE_CACHE_BACKEND == "redis":
+        return RedisResponseCache(
+            REDIS_URL, RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL_SECONDS
+        )
+    if RESPONSE_CACHE_BACKEND == "memory":
+        return InMemoryResponseCache(
+            RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL_SECONDS
+        )
+    return None
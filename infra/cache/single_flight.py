@@ -0,0 +1,167 @@
+# infra/cache/single_flight.py
+# Single-flight coalescing: the first job for a prompt key runs the
+# generation, concurrent duplicates wait for its result.
+import asyncio
+import json
+import logging
+import os
+import uuid
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from config.settings import REDIS_URL
+from core.repositories.single_flight_repository import SingleFlightRepository
+from infra.metrics import counters
+
+# "memory" (same event loop only), "redis" (all workers) or "off"
+SINGLE_FLIGHT_BACKEND = os.getenv(
+    "SINGLE_FLIGHT_BACKEND", "redis" if REDIS_URL else "memory"
+)
+# Longest generation a follower waits for before running it itself
+SINGLE_FLIGHT_TIMEOUT_SECONDS = float(
+    os.getenv("SINGLE_FLIGHT_TIMEOUT_SECONDS", "300")
+)
+
+
+class LocalSingleFlight(SingleFlightRepository):
+    """Coalesces identical calls running in the same event loop.
+
+    Useful for the in-process and Postgres queue backends, where one loop
+    processes many predictions concurrently.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def run(
+        self, key: str, generate: Callable[[], Awaitable[dict]],
+        cancel_event: Optional[asyncio.Event] = None,
+    ) -> Tuple[Optional[dict], bool]:
+        loop = asyncio.get_running_loop()
+        leader = self._inflight.get(key)
+        if leader is not None and leader.get_loop() is loop:
+            # shield: a cancelled follower must not cancel the leader
+            shared = asyncio.shield(leader)
+            if cancel_event is not None:
+                stop = asyncio.ensure_future(cancel_event.wait())
+                try:
+                    await asyncio.wait(
+                        {shared, stop}, return_when=asyncio.FIRST_COMPLETED
+                    )
+                finally:
+                    stop.cancel()
+                if not shared.done():
+                    shared.cancel()  # Only this follower stops waiting
+                    return None, True
+            try:
+                result = await shared
+                counters.incr("single_flight_shared")
+                return dict(result), True
+            except asyncio.CancelledError:
+                if not leader.cancelled():
+                    raise  # This follower itself was cancelled
+            except Exception:
+                pass
+            # Leader failed or was cancelled, generate on our own
+            return await generate(), False
+
+        future = loop.create_future()
+        self._inflight[key] = future
+        try:
+            result = await generate()
+            future.set_result(result)
+            return result, False
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved when nobody waits
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+
+class RedisSingleFlight(SingleFlightRepository):
+    """Coalesces identical calls across all worker processes through Redis.
+
+    The leader holds a lock key while generating and publishes the result
+    under a short-lived result key; followers poll for it. If the leader
+    fails, a follower takes over the lock and generates itself.
+    """
+
+    def __init__(
+        self, url: str, timeout_seconds: float,
+        poll_seconds: float = 0.05, prefix: str = "sbllm:sf:"
+    ):
+        import redis  # Optional dependency, only needed for this backend
+        self._redis = redis.Redis.from_url(url)
+        self.timeout_seconds = timeout_seconds
+        self.poll_seconds = poll_seconds
+        self.prefix = prefix
+
+    def _try_lead(self, key: str, token: str) -> bool:
+        return bool(self._redis.set(
+            self.prefix + "lock:" + key, token, nx=True,
+            px=int(self.timeout_seconds * 1000),
+        ))
+
+    def _get_result(self, key: str) -> Optional[dict]:
+        raw = self._redis.get(self.prefix + "result:" + key)
+        return json.loads(raw) if raw is not None else None
+
+    async def run(
+        self, key: str, generate: Callable[[], Awaitable[dict]],
+        cancel_event: Optional[asyncio.Event] = None,
+    ) -> Tuple[Optional[dict], bool]:
+        token = uuid.uuid4().hex
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout_seconds
+        while True:
+            try:
+                if self._try_lead(key, token):
+                    break
+                result = self._get_result(key)
+            except Exception as e:
+                # Redis trouble must not block predictions
+                logging.warning(f"Single-flight: Redis unavailable: {e}")
+                return await generate(), False
+            if result is not None:
+                counters.incr("single_flight_shared")
+                return result, True
+            if cancel_event is not None and cancel_event.is_set():
+                return None, True  # The leader goes on for the others
+            if loop.time() > deadline:
+                logging.warning(
+                    f"Single-flight: Gave up waiting for {key[:12]}."
+                )
+                return await generate(), False
+            await asyncio.sleep(self.poll_seconds)
+
+        try:
+            result = await generate()
+            try:
+                # Followers poll at least every poll_seconds, a few seconds
+                # of result lifetime is plenty (the cache keeps it longer)
+                self._redis.set(
+                    self.prefix + "result:" + key, json.dumps(result), ex=10
+                )
+            except Exception as e:
+                logging.warning(f"Single-flight: Redis publish failed: {e}")
+            return result, False
+        finally:
+            try:
+                lock_key = self.prefix + "lock:" + key
+                if self._redis.get(lock_key) == token.encode():
+                    self._redis.delete(lock_key)
+            except Exception:
+                pass
+
+
+def get_single_flight() -> Optional[SingleFlightRepository]:
+    """Builds the single-flight coordinator configured by SINGLE_FLIGHT_BACKEND."""
+    if SINGLE_FLIGHT_BACKEND == "redis":
+        return RedisSingleFlight(REDIS_URL, SINGLE_FLIGHT_TIMEOUT_SECONDS)
+    if SINGLE_FLIGHT_BACKEND == "memory":
+        return LocalSingleFlight()
+    return None
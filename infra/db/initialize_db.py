@@ -42,8 +42,18 @@ def initialize_database():
         print("PostgreSQL database connection established.")
 
         print("Dropping existing tables (if any)...")
+        cursor.execute("DROP TABLE IF EXISTS idempotency_keys CASCADE;")
+        cursor.execute("DROP TABLE IF EXISTS balance_checkpoints CASCADE;")
+        cursor.execute("DROP TABLE IF EXISTS archived_predictions CASCADE;")
+        cursor.execute("DROP TABLE IF EXISTS prediction_uuids CASCADE;")
+        cursor.execute("DROP TABLE IF EXISTS model_residency CASCADE;")
+        cursor.execute("DROP TABLE IF EXISTS settlement_offsets CASCADE;")
+        cursor.execute("DROP TABLE IF EXISTS model_switchovers CASCADE;")
+        cursor.execute("DROP TABLE IF EXISTS model_endpoints CASCADE;")
+        cursor.execute("DROP TABLE IF EXISTS queue_items CASCADE;")
         cursor.execute("DROP TABLE IF EXISTS transactions CASCADE;")
         cursor.execute("DROP TABLE IF EXISTS predictions CASCADE;")
+        cursor.execute("DROP TABLE IF EXISTS balances CASCADE;")
         cursor.execute("DROP TABLE IF EXISTS models CASCADE;")
         cursor.execute("DROP TABLE IF EXISTS users CASCADE;")
         print("Existing tables dropped.")
@@ -56,7 +66,6 @@ def initialize_database():
             id SERIAL PRIMARY KEY,
             name TEXT NOT NULL,
             telegram_id TEXT UNIQUE,
-            balance REAL DEFAULT 0.0 NOT NULL,
             password_hash TEXT,
             api_key TEXT,
             created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
@@ -64,6 +73,24 @@ def initialize_database():
         """)
         print("Created 'users' table.")
 
+        # balances table: the hot, often updated part of a user. Narrow rows,
+        # no index on the updated columns and free space on every page (low
+        # fillfactor) let PostgreSQL update them in place (HOT), and
+        # aggressive autovacuum keeps the table small.
+        cursor.execute("""
+        CREATE TABLE balances (
+            user_id INTEGER PRIMARY KEY
+                REFERENCES users(id) ON DELETE CASCADE,
+            balance REAL DEFAULT 0.0 NOT NULL,
+            reserved_balance REAL DEFAULT 0.0 NOT NULL
+        ) WITH (
+            fillfactor = 50,
+            autovacuum_vacuum_scale_factor = 0.01,
+            autovacuum_vacuum_cost_delay = 0
+        );
+        """)
+        print("Created 'balances' table.")
+
         # models table
         cursor.execute("""
         CREATE TABLE models (
@@ -77,11 +104,63 @@ def initialize_database():
         """)
         print("Created 'models' table.")
 
-        # predictions table
+        # model_endpoints table (inference backends serving a model; a model
+        # without rows uses the default OPENAI_BASE_URL endpoint)
         cursor.execute("""
-        CREATE TABLE predictions (
+        CREATE TABLE model_endpoints (
             id SERIAL PRIMARY KEY,
-            uuid TEXT UNIQUE NOT NULL,
+            model_id INTEGER NOT NULL,
+            kind TEXT DEFAULT 'openai' NOT NULL,
+            base_url TEXT,
+            api_key TEXT,
+            model_name TEXT,
+            is_active BOOLEAN DEFAULT TRUE,
+            timeout_seconds REAL,
+            FOREIGN KEY (model_id) REFERENCES models(id) ON DELETE CASCADE
+        );
+        """)
+        print("Created 'model_endpoints' table.")
+
+        # model_switchovers table (changes of the active model, see
+        # ModelSwitchover)
+        cursor.execute("""
+        CREATE TABLE model_switchovers (
+            id SERIAL PRIMARY KEY,
+            from_model_id INTEGER,
+            to_model_id INTEGER NOT NULL,
+            status TEXT DEFAULT 'warming' NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            cutover_at TIMESTAMP WITH TIME ZONE,
+            completed_at TIMESTAMP WITH TIME ZONE,
+            warm_until TIMESTAMP WITH TIME ZONE,
+            FOREIGN KEY (from_model_id) REFERENCES models(id) ON DELETE CASCADE,
+            FOREIGN KEY (to_model_id) REFERENCES models(id) ON DELETE CASCADE
+        );
+        """)
+        print("Created 'model_switchovers' table.")
+
+        # model_residency table (models loaded by each worker process,
+        # refreshed as a heartbeat)
+        cursor.execute("""
+        CREATE TABLE model_residency (
+            worker_id TEXT NOT NULL,
+            model_id INTEGER NOT NULL,
+            warm BOOLEAN DEFAULT FALSE NOT NULL,
+            heartbeat_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (worker_id, model_id),
+            FOREIGN KEY (model_id) REFERENCES models(id) ON DELETE CASCADE
+        );
+        """)
+        print("Created 'model_residency' table.")
+
+        # predictions table, partitioned by created_at month (see
+        # infra/db/partitions.py). The primary key of a partitioned table
+        # must contain created_at, so no foreign key references predictions
+        # and uuid is unique through prediction_uuids instead.
+        cursor.execute("""
+        CREATE TABLE predictions (
+            id SERIAL,
+            uuid TEXT NOT NULL,
             user_id INTEGER NOT NULL,
             model_id INTEGER NOT NULL,
             input_text TEXT NOT NULL,
@@ -89,32 +168,130 @@ def initialize_database():
             input_tokens INTEGER,
             output_tokens INTEGER,
             total_cost REAL,
+            reserved_cost REAL,
             status TEXT NOT NULL,
-            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            created_at TIMESTAMP WITH TIME ZONE
+                DEFAULT CURRENT_TIMESTAMP NOT NULL,
             completed_at TIMESTAMP WITH TIME ZONE,
             queue_time INTEGER,
             process_time INTEGER,
+            lease_expires_at TIMESTAMP WITH TIME ZONE,
+            claim_token TEXT,
+            deadline_at TIMESTAMP WITH TIME ZONE,
+            PRIMARY KEY (id, created_at),
             FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
             FOREIGN KEY (model_id) REFERENCES models(id) ON DELETE RESTRICT
-        );
+        ) PARTITION BY RANGE (created_at);
         """)
         print("Created 'predictions' table.")
 
-        # transactions table
+        # transactions table, partitioned by created_at month
         cursor.execute("""
         CREATE TABLE transactions (
-            id SERIAL PRIMARY KEY,
+            id SERIAL,
             user_id INTEGER NOT NULL,
             amount REAL NOT NULL,
             description TEXT,
             prediction_id INTEGER,
+            created_at TIMESTAMP WITH TIME ZONE
+                DEFAULT CURRENT_TIMESTAMP NOT NULL,
+            -- Database transaction that wrote the row (see
+            -- balance_checkpoints)
+            xact_id XID8 DEFAULT pg_current_xact_id() NOT NULL,
+            PRIMARY KEY (id, created_at),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        ) PARTITION BY RANGE (created_at);
+        """)
+        print("Created 'transactions' table.")
+
+        # prediction_uuids table: uuid -> partition key of a prediction,
+        # written with the prediction, so a lookup by uuid reads one
+        # partition and uuids stay globally unique
+        cursor.execute("""
+        CREATE TABLE prediction_uuids (
+            uuid TEXT PRIMARY KEY,
+            id INTEGER NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL
+        );
+        """)
+        print("Created 'prediction_uuids' table.")
+
+        # archived_predictions table: stubs of predictions moved to the
+        # Parquet archive (see infra/db/prediction_archive.py)
+        cursor.execute("""
+        CREATE TABLE archived_predictions (
+            uuid TEXT PRIMARY KEY,
+            id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            location TEXT NOT NULL,
+            archived_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        );
+        """)
+        print("Created 'archived_predictions' table.")
+
+        from infra.db.partitions import create_partitions
+        created = create_partitions(cursor)
+        print(f"Created partitions {', '.join(created)}.")
+
+        # balance_checkpoints table: a user's ledger balance over every
+        # transaction written before covered_xact_id (all finished when the
+        # checkpoint was taken), so the current one is the checkpoint plus
+        # the transactions written from covered_xact_id on
+        cursor.execute("""
+        CREATE TABLE balance_checkpoints (
+            user_id INTEGER PRIMARY KEY
+                REFERENCES users(id) ON DELETE CASCADE,
+            balance DOUBLE PRECISION NOT NULL,
+            last_transaction_id INTEGER NOT NULL,
+            covered_xact_id XID8 NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        );
+        """)
+        print("Created 'balance_checkpoints' table.")
+
+        # queue_items table (fair-share dispatch state, see QueueItem)
+        cursor.execute("""
+        CREATE TABLE queue_items (
+            id SERIAL PRIMARY KEY,
+            prediction_id INTEGER NOT NULL UNIQUE,
+            user_id INTEGER NOT NULL,
+            priority INTEGER DEFAULT 0 NOT NULL,
+            status TEXT DEFAULT 'waiting' NOT NULL,
+            queued_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            dispatched_at TIMESTAMP WITH TIME ZONE,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        );
+        """)
+        print("Created 'queue_items' table.")
+
+        # idempotency_keys table (Idempotency-Key header -> prediction)
+        cursor.execute("""
+        CREATE TABLE idempotency_keys (
+            user_id INTEGER NOT NULL,
+            key TEXT NOT NULL,
+            prediction_id INTEGER,
+            -- Resolved like GET by uuid, so also once archived
+            prediction_uuid TEXT,
             created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-            FOREIGN KEY (prediction_id)
-                REFERENCES predictions(id) ON DELETE SET NULL
+            expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            PRIMARY KEY (user_id, key),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
         );
         """)
-        print("Created 'transactions' table.")
+        print("Created 'idempotency_keys' table.")
+
+        # settlement_offsets table (last charge of a buffer applied by
+        # batched settlement, makes replays after a crash idempotent)
+        cursor.execute("""
+        CREATE TABLE settlement_offsets (
+            name TEXT PRIMARY KEY,
+            last_seq BIGINT DEFAULT 0 NOT NULL,
+            updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        );
+        """)
+        print("Created 'settlement_offsets' table.")
 
         # --- Create Indexes ---
         print("Creating indexes...")
@@ -126,16 +303,38 @@ def initialize_database():
             "CREATE INDEX IF NOT EXISTS idx_models_name ON models(name);"
         )
         cursor.execute(
-            "CREATE INDEX IF NOT EXISTS idx_predictions_uuid "
-            "ON predictions(uuid);"
+            "CREATE INDEX IF NOT EXISTS idx_model_endpoints_model_id "
+            "ON model_endpoints(model_id);"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_model_switchovers_status "
+            "ON model_switchovers(status);"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_model_residency_model_id "
+            "ON model_residency(model_id, heartbeat_at);"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_prediction_uuids_created_at "
+            "ON prediction_uuids(created_at);"
         )
         cursor.execute(
             "CREATE INDEX IF NOT EXISTS idx_predictions_user_id "
             "ON predictions(user_id);"
         )
+        # Partial index for the Postgres queue backend claim query
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_predictions_claimable "
+            "ON predictions(created_at) "
+            "WHERE status IN ('pending', 'processing', 'cancelling');"
+        )
         cursor.execute(
             "CREATE INDEX IF NOT EXISTS idx_transactions_user_id "
-            "ON transactions(user_id);"
+            "ON transactions(user_id, xact_id);"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_queue_items_status_user "
+            "ON queue_items(status, user_id);"
         )
         print("Indexes created.")
 
@@ -194,16 +393,25 @@ def initialize_database():
             admin_api_key = secrets.token_hex(32)
 
             cursor.execute("""
-                INSERT INTO users (
-                    name, balance, password_hash, api_key, telegram_id
+                WITH admin AS (
+                    INSERT INTO users (
+                        name, password_hash, api_key, telegram_id
+                    )
+                    VALUES (%s, %s, %s, %s)
+                    RETURNING id
+                ), balance AS (
+                    INSERT INTO balances (user_id, balance)
+                    SELECT id, %s FROM admin
                 )
-                VALUES (%s, %s, %s, %s, %s)
+                INSERT INTO transactions (user_id, amount, description)
+                SELECT id, %s, 'Opening balance' FROM admin
             """, (
                 'admin',
-                1000.0,
                 admin_password_hash,
                 admin_api_key,
-                None  # Admin user might not have a Telegram ID
+                None,  # Admin user might not have a Telegram ID
+                1000.0,
+                1000.0
             ))
             print(
                 "Added default user 'admin' with balance 1000, "
@@ -0,0 +1,105 @@
+# infra/db/ledger_maintenance.py
+# Maintenance jobs of the balance ledger:
+#   python ledger_maintenance.py checkpoint [--every S]
+#   python ledger_maintenance.py audit <user id>
+#   python ledger_maintenance.py reconcile [--full] [--max-report N]
+import argparse
+import logging
+import os
+import time
+from collections import Counter
+
+from infra.db.transaction_repository_impl import (
+    PostgreSQLTransactionRepository
+)
+
+# Predictions completed more recently may still be settling (reconcile)
+LEDGER_CHECKPOINT_SETTLE_SECONDS = float(
+    os.getenv("LEDGER_CHECKPOINT_SETTLE_SECONDS", "300")
+)
+# Largest difference between stored and ledger balance reported as equal
+LEDGER_AUDIT_TOLERANCE = float(os.getenv("LEDGER_AUDIT_TOLERANCE", "0.01"))
+
+
+def checkpoint(repo: PostgreSQLTransactionRepository, every: float) -> None:
+    """Advances the balance checkpoints once, or every `every` seconds."""
+    while True:
+        written = repo.checkpoint_balances()
+        logging.info(f"Ledger: Checkpointed {written} balance(s)")
+        if every <= 0:
+            return
+        time.sleep(every)
+
+
+def audit(repo: PostgreSQLTransactionRepository, user_id: int) -> bool:
+    """Compares a user's stored balance with the ledger."""
+    balances = repo.audit_balance(user_id)
+    if balances is None:
+        raise SystemExit(f"User {user_id} not found.")
+    stored, ledger = balances
+    logging.info(
+        f"Ledger: User {user_id} balance {stored:.4f}, ledger {ledger:.4f}"
+    )
+    return abs(stored - ledger) <= LEDGER_AUDIT_TOLERANCE
+
+
+def reconcile(
+    repo: PostgreSQLTransactionRepository, full: bool, max_report: int
+) -> int:
+    """Reports every ledger discrepancy (the first max_report in detail).
+
+    Returns:
+        int: The number of discrepancies.
+    """
+    started = time.monotonic()
+    kinds = Counter()
+    for discrepancy in repo.reconcile(
+        LEDGER_AUDIT_TOLERANCE, LEDGER_CHECKPOINT_SETTLE_SECONDS, full
+    ):
+        kinds[discrepancy.kind] += 1
+        if sum(kinds.values()) <= max_report:
+            logging.warning(
+                f"Ledger: {discrepancy.kind} user={discrepancy.user_id} "
+                f"prediction={discrepancy.prediction_id} "
+                f"expected={discrepancy.expected} actual={discrepancy.actual}"
+            )
+    total = sum(kinds.values())
+    logging.info(
+        f"Ledger: Reconciled in {time.monotonic() - started:.1f}s, "
+        f"{total} discrepancies {dict(kinds)}"
+    )
+    return total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Balance ledger maintenance.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    checkpoint_parser = commands.add_parser(
+        "checkpoint", help="Advance the per-user balance checkpoints"
+    )
+    checkpoint_parser.add_argument(
+        "--every", type=float, default=0.0,
+        help="Repeat every N seconds (default: run once)",
+    )
+    audit_parser = commands.add_parser(
+        "audit", help="Compare a user's balance with the ledger"
+    )
+    audit_parser.add_argument("user_id", type=int)
+    reconcile_parser = commands.add_parser(
+        "reconcile", help="Check balances and predictions against the ledger"
+    )
+    reconcile_parser.add_argument(
+        "--full", action="store_true",
+        help="Sum the whole history instead of starting from the checkpoints",
+    )
+    reconcile_parser.add_argument("--max-report", type=int, default=100)
+    args = parser.parse_args()
+
+    repo = PostgreSQLTransactionRepository()
+    if args.command == "checkpoint":
+        checkpoint(repo, args.every)
+    elif args.command == "reconcile":
+        if reconcile(repo, args.full, args.max_report):
+            raise SystemExit(1)
+    elif not audit(repo, args.user_id):
+        raise SystemExit(1)
@@ -0,0 +1,104 @@
+# infra/db/model_endpoint_repository_impl.py
+import os
+import sys
+from typing import List, Optional
+
+import psycopg2
+from psycopg2.extras import DictCursor  # For dictionary-like row access
+
+# Adjust import paths
+try:
+    from core.entities.model_endpoint import ModelEndpoint
+    from core.repositories.model_endpoint_repository import (
+        ModelEndpointRepository
+    )
+    from infra.db.initialize_db import get_db_connection
+except ImportError:
+    project_root = os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    if project_root not in sys.path:
+        sys.path.insert(0, project_root)
+    from core.entities.model_endpoint import ModelEndpoint
+    from core.repositories.model_endpoint_repository import (
+        ModelEndpointRepository
+    )
+    from infra.db.initialize_db import get_db_connection
+
+
+class PostgreSQLModelEndpointRepository(ModelEndpointRepository):
+    """PostgreSQL implementation of the ModelEndpointRepository interface."""
+
+    def _map_row_to_endpoint(
+        self, row: DictCursor
+    ) -> Optional[ModelEndpoint]:
+        """Helper method to map a database row to a ModelEndpoint entity."""
+        if row:
+            return ModelEndpoint(
+                id=row['id'],
+                model_id=row['model_id'],
+                kind=row['kind'],
+                base_url=row['base_url'],
+                api_key=row['api_key'],
+                model_name=row['model_name'],
+                is_active=bool(row['is_active']),
+                timeout_seconds=row['timeout_seconds']
+            )
+        return None
+
+    def add(self, endpoint: ModelEndpoint) -> ModelEndpoint:
+        """Adds a new endpoint of a model."""
+        conn = get_db_connection()
+        cursor = None
+        try:
+            cursor = conn.cursor(cursor_factory=DictCursor)
+            cursor.execute(
+                """INSERT INTO model_endpoints (model_id, kind, base_url,
+                                             api_key, model_name, is_active,
+                                             timeout_seconds)
+                   VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id""",
+                (
+                    endpoint.model_id, endpoint.kind, endpoint.base_url,
+                    endpoint.api_key, endpoint.model_name, endpoint.is_active,
+                    endpoint.timeout_seconds
+                )
+            )
+            endpoint.id = cursor.fetchone()['id']
+            conn.commit()
+        except psycopg2.Error as e:
+            print(f"Error adding model endpoint: {e}")
+            if conn:
+                conn.rollback()
+            raise
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+        return endpoint
+
+    def list_by_model(self, model_id: int) -> List[ModelEndpoint]:
+        """Retrieves the active endpoints serving a model."""
+        conn = get_db_connection()
+        cursor = None
+        endpoints = []
+        try:
+            cursor = conn.cursor(cursor_factory=DictCursor)
+            cursor.execute(
+                """SELECT * FROM model_endpoints
+                   WHERE model_id = %s AND is_active = TRUE
+                   ORDER BY id""",
+                (model_id,)
+            )
+            endpoints = [
+                self._map_row_to_endpoint(row)
+                for row in cursor.fetchall() if row
+            ]
+        except psycopg2.Error as e:
+            print(f"Error listing endpoints of model {model_id}: {e}")
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+        return endpoints
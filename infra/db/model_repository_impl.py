@@ -112,14 +112,16 @@ class PostgreSQLModelRepository(ModelRepository):  # Renamed
                 conn.close()
 
     def get_active_model(self) -> Optional[Model]:
-        """Retrieves the first active model found."""
+        """Retrieves the first active model (lowest ID, so every caller
+        agrees on it while several are active)."""
         conn = get_db_connection()
         cursor = None
         try:
             cursor = conn.cursor(cursor_factory=DictCursor)
             # Simple approach: get the first active one
             cursor.execute(
-                "SELECT * FROM models WHERE is_active = TRUE LIMIT 1"
+                "SELECT * FROM models WHERE is_active = TRUE "
+                "ORDER BY id LIMIT 1"
             )
             row = cursor.fetchone()
             return self._map_row_to_model(row)
@@ -132,6 +134,67 @@ class PostgreSQLModelRepository(ModelRepository):  # Renamed
             if conn:
                 conn.close()
 
+    def list_active(self) -> List[Model]:
+        """Retrieves the active models, in creation order."""
+        conn = get_db_connection()
+        cursor = None
+        models = []
+        try:
+            cursor = conn.cursor(cursor_factory=DictCursor)
+            cursor.execute(
+                "SELECT * FROM models WHERE is_active = TRUE ORDER BY id"
+            )
+            rows = cursor.fetchall()
+            models = [self._map_row_to_model(row) for row in rows if row]
+        except psycopg2.Error as e:
+            print(f"Error listing active models: {e}")
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+        return models
+
+    def switch_active_model(
+        self, from_model_id: Optional[int], to_model_id: int
+    ) -> bool:
+        """Swaps the active model in one statement (compare-and-set on
+        from_model_id), so no request sees both or neither active."""
+        conn = get_db_connection()
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            if from_model_id is None:
+                cursor.execute(
+                    "UPDATE models SET is_active = TRUE WHERE id = %s",
+                    (to_model_id,)
+                )
+                switched = cursor.rowcount == 1
+            else:
+                cursor.execute(
+                    """UPDATE models SET is_active = (id = %s)
+                       WHERE id IN (%s, %s)
+                         AND EXISTS (SELECT 1 FROM models
+                                     WHERE id = %s AND is_active = TRUE)""",
+                    (to_model_id, from_model_id, to_model_id, from_model_id)
+                )
+                switched = cursor.rowcount == 2
+            if switched:
+                conn.commit()
+            else:
+                conn.rollback()
+            return switched
+        except psycopg2.Error as e:
+            print(f"Error switching active model to {to_model_id}: {e}")
+            if conn:
+                conn.rollback()
+            return False
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+
     def list_all(self) -> List[Model]:
         """Retrieves a list of all models."""
         conn = get_db_connection()
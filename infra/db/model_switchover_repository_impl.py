@@ -0,0 +1,219 @@
+# infra/db/model_switchover_repository_impl.py
+import os
+import sys
+from typing import Dict, List, Optional
+
+import psycopg2
+from psycopg2.extras import DictCursor  # For dictionary-like row access
+
+# Adjust import paths
+try:
+    from core.entities.model_switchover import ModelSwitchover
+    from core.repositories.model_switchover_repository import (
+        ModelSwitchoverRepository
+    )
+    from infra.db.initialize_db import get_db_connection
+except ImportError:
+    project_root = os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    if project_root not in sys.path:
+        sys.path.insert(0, project_root)
+    from core.entities.model_switchover import ModelSwitchover
+    from core.repositories.model_switchover_repository import (
+        ModelSwitchoverRepository
+    )
+    from infra.db.initialize_db import get_db_connection
+
+
+class PostgreSQLModelSwitchoverRepository(ModelSwitchoverRepository):
+    """PostgreSQL implementation of the ModelSwitchoverRepository interface."""
+
+    def _map_row_to_switchover(
+        self, row: DictCursor
+    ) -> Optional[ModelSwitchover]:
+        """Helper method to map a database row to a ModelSwitchover entity."""
+        if row:
+            return ModelSwitchover(
+                id=row['id'],
+                from_model_id=row['from_model_id'],
+                to_model_id=row['to_model_id'],
+                status=row['status'],
+                created_at=row['created_at'],
+                cutover_at=row['cutover_at'],
+                completed_at=row['completed_at'],
+                warm_until=row['warm_until']
+            )
+        return None
+
+    def add(self, switchover: ModelSwitchover) -> ModelSwitchover:
+        """Adds a new switchover."""
+        conn = get_db_connection()
+        cursor = None
+        try:
+            cursor = conn.cursor(cursor_factory=DictCursor)
+            cursor.execute(
+                """INSERT INTO model_switchovers (from_model_id, to_model_id,
+                                               status, warm_until)
+                   VALUES (%s, %s, %s, %s) RETURNING id, created_at""",
+                (
+                    switchover.from_model_id, switchover.to_model_id,
+                    switchover.status, switchover.warm_until
+                )
+            )
+            row = cursor.fetchone()
+            switchover.id = row['id']
+            switchover.created_at = row['created_at']
+            conn.commit()
+        except psycopg2.Error as e:
+            print(f"Error adding model switchover: {e}")
+            if conn:
+                conn.rollback()
+            raise
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+        return switchover
+
+    def update(self, switchover: ModelSwitchover) -> None:
+        """Updates the status and timestamps of a switchover."""
+        conn = get_db_connection()
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """UPDATE model_switchovers
+                   SET status = %s, cutover_at = %s, completed_at = %s
+                   WHERE id = %s""",
+                (
+                    switchover.status, switchover.cutover_at,
+                    switchover.completed_at, switchover.id
+                )
+            )
+            conn.commit()
+        except psycopg2.Error as e:
+            print(f"Error updating model switchover {switchover.id}: {e}")
+            if conn:
+                conn.rollback()
+            raise
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+
+    def list_warming_model_ids(self) -> List[int]:
+        """Retrieves the target models of switchovers still warming."""
+        conn = get_db_connection()
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            # A switch abandoned while warming (its process died) stops
+            # evicting models at its warm timeout
+            cursor.execute(
+                """SELECT DISTINCT to_model_id FROM model_switchovers
+                   WHERE status = 'warming' AND warm_until > NOW()"""
+            )
+            return [row[0] for row in cursor.fetchall()]
+        except psycopg2.Error as e:
+            print(f"Error listing warming models: {e}")
+            return []
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+
+    def report_residency(
+        self, worker_id: str, warm_by_model: Dict[int, bool]
+    ) -> None:
+        """Replaces the rows of a worker in one transaction."""
+        conn = get_db_connection()
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """DELETE FROM model_residency
+                   WHERE worker_id = %s AND NOT (model_id = ANY(%s))""",
+                (worker_id, list(warm_by_model))
+            )
+            for model_id, warm in warm_by_model.items():
+                cursor.execute(
+                    """INSERT INTO model_residency (worker_id, model_id, warm,
+                                                 heartbeat_at)
+                       VALUES (%s, %s, %s, NOW())
+                       ON CONFLICT (worker_id, model_id) DO UPDATE
+                       SET warm = EXCLUDED.warm,
+                           heartbeat_at = EXCLUDED.heartbeat_at""",
+                    (worker_id, model_id, warm)
+                )
+            # Rows of workers gone for a long time
+            cursor.execute(
+                """DELETE FROM model_residency
+                   WHERE heartbeat_at < NOW() - INTERVAL '1 day'"""
+            )
+            conn.commit()
+        except psycopg2.Error as e:
+            print(f"Error reporting residency of worker {worker_id}: {e}")
+            if conn:
+                conn.rollback()
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+
+    def count_unready_workers(
+        self, model_id: int, heartbeat_seconds: float
+    ) -> int:
+        """Counts live workers without a fresh warm row for the model."""
+        conn = get_db_connection()
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """SELECT COUNT(DISTINCT r.worker_id) FROM model_residency r
+                   WHERE r.heartbeat_at > NOW() - make_interval(secs => %s)
+                     AND NOT EXISTS (
+                         SELECT 1 FROM model_residency w
+                         WHERE w.worker_id = r.worker_id
+                           AND w.model_id = %s AND w.warm = TRUE
+                           AND w.heartbeat_at >
+                               NOW() - make_interval(secs => %s))""",
+                (heartbeat_seconds, model_id, heartbeat_seconds)
+            )
+            return cursor.fetchone()[0]
+        except psycopg2.Error as e:
+            print(f"Error counting unready workers of model {model_id}: {e}")
+            raise
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+
+    def count_hosting_workers(
+        self, model_id: int, heartbeat_seconds: float
+    ) -> int:
+        """Counts live workers that still report the model."""
+        conn = get_db_connection()
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """SELECT COUNT(*) FROM model_residency
+                   WHERE model_id = %s
+                     AND heartbeat_at > NOW() - make_interval(secs => %s)""",
+                (model_id, heartbeat_seconds)
+            )
+            return cursor.fetchone()[0]
+        except psycopg2.Error as e:
+            print(f"Error counting workers hosting model {model_id}: {e}")
+            raise
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
@@ -0,0 +1,281 @@
+# infra/db/partitions.py
+# Monthly range partitions of the predictions and transactions tables (by
+# created_at). Every worker creates the upcoming months ahead of time
+# (PartitionMaintainer); old months are detached without locking the hot
+# partitions:
+#   python partition_maintenance.py create [--months-ahead N]
+#   python partition_maintenance.py detach --before YYYY-MM [--drop]
+import argparse
+import logging
+import os
+import re
+import threading
+import time
+from datetime import date, datetime, timezone
+from typing import List, Optional
+
+import psycopg2
+
+from infra.db.initialize_db import get_db_connection
+
+PARTITIONED_TABLES = ("predictions", "transactions")
+# Months created after the current one
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+# How often each worker checks the upcoming partitions (0: never)
+PARTITION_MAINTENANCE_SECONDS = float(
+    os.getenv("PARTITION_MAINTENANCE_SECONDS", "3600")
+)
+# Partition DDL gives up instead of queueing hot queries behind its lock
+PARTITION_LOCK_TIMEOUT_MS = int(os.getenv("PARTITION_LOCK_TIMEOUT_MS", "2000"))
+
+_PARTITION_NAME = re.compile(r"^(\w+)_(\d{4})_(\d{2})$")
+
+
+def add_months(month: date, months: int) -> date:
+    """Returns the first day of the month `months` after `month`."""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_{month:%Y_%m}"
+
+
+def _bound(month: date) -> datetime:
+    # Explicit UTC, so the bounds do not depend on the session time zone
+    return datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+
+
+def create_partitions(
+    cursor,
+    months_ahead: int = PARTITION_MONTHS_AHEAD,
+    today: Optional[date] = None,
+) -> List[str]:
+    """Creates the missing partitions from the current month to
+    months_ahead months later (no commit).
+
+    Returns:
+        List[str]: The names of the created partitions.
+    """
+    first = (today or datetime.now(timezone.utc).date()).replace(day=1)
+    created = []
+    for table in PARTITIONED_TABLES:
+        for offset in range(months_ahead + 1):
+            month = add_months(first, offset)
+            name = partition_name(table, month)
+            cursor.execute("SELECT to_regclass(%s)", (name,))
+            if cursor.fetchone()[0] is not None:
+                continue
+            # Created apart and then attached: ATTACH PARTITION only takes a
+            # SHARE UPDATE EXCLUSIVE lock on the parent, CREATE TABLE ...
+            # PARTITION OF would block every query of the table
+            cursor.execute(
+                f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)"
+            )
+            cursor.execute(
+                f"ALTER TABLE {table} ATTACH PARTITION {name} "
+                f"FOR VALUES FROM (%s) TO (%s)",
+                (_bound(month), _bound(add_months(month, 1)))
+            )
+            created.append(name)
+    return created
+
+
+def ensure_partitions(months_ahead: int = PARTITION_MONTHS_AHEAD) -> List[str]:
+    """Creates the upcoming partitions unless another process is at it."""
+    conn = get_db_connection()
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT pg_try_advisory_xact_lock(hashtext('partitions'))"
+        )
+        if not cursor.fetchone()[0]:
+            conn.rollback()
+            return []
+        cursor.execute(
+            "SET LOCAL lock_timeout = %s", (PARTITION_LOCK_TIMEOUT_MS,)
+        )
+        created = create_partitions(cursor, months_ahead)
+        conn.commit()
+        return created
+    except psycopg2.Error as e:
+        print(f"Error creating partitions: {e}")
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.close()
+
+
+def _checkpointed(cursor, name: str) -> bool:
+    """Whether every row of a transactions partition is in its user's
+    balance checkpoint, so the ledger balances do not need it anymore."""
+    cursor.execute(
+        f"""SELECT NOT EXISTS (
+                SELECT 1 FROM {name} t
+                LEFT JOIN balance_checkpoints c ON c.user_id = t.user_id
+                WHERE c.user_id IS NULL
+                   OR t.xact_id >= c.covered_xact_id
+            )"""
+    )
+    return cursor.fetchone()[0]
+
+
+def _archived(cursor, name: str) -> bool:
+    """Whether a predictions partition holds no rows but archived ones, so
+    get_by_uuid finds all of them through their stubs."""
+    cursor.execute(
+        f"""SELECT NOT EXISTS (
+                SELECT 1 FROM {name} p
+                LEFT JOIN archived_predictions a ON a.uuid = p.uuid
+                WHERE a.uuid IS NULL
+            )"""
+    )
+    return cursor.fetchone()[0]
+
+
+def detach_partitions(before: date, drop: bool = False) -> List[str]:
+    """Detaches (and optionally drops) the partitions of months before
+    `before` with DETACH PARTITION ... CONCURRENTLY (PostgreSQL 14+), so
+    queries of the other partitions are never blocked.
+
+    Detached partitions stay as plain tables unless dropped. A transactions
+    partition is only detached once the balance checkpoints cover all its
+    rows (run `ledger_maintenance.py checkpoint` first), otherwise the
+    ledger balances would lose them. A predictions partition is only
+    detached once all its rows are archived (run `archive_predictions.py`
+    first), otherwise they could no longer be found.
+
+    Returns:
+        List[str]: The names of the detached partitions.
+    """
+    conn = get_db_connection()
+    # DETACH ... CONCURRENTLY cannot run inside a transaction block
+    conn.autocommit = True
+    cursor = None
+    detached = []
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SET lock_timeout = %s", (PARTITION_LOCK_TIMEOUT_MS,)
+        )
+        for table in PARTITIONED_TABLES:
+            cursor.execute(
+                """SELECT c.relname, i.inhdetachpending
+                   FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                   WHERE i.inhparent = %s::regclass
+                   ORDER BY c.relname""",
+                (table,)
+            )
+            for name, pending in cursor.fetchall():
+                match = _PARTITION_NAME.match(name)
+                if not match or match.group(1) != table:
+                    continue
+                month = date(int(match.group(2)), int(match.group(3)), 1)
+                if month >= before:
+                    continue
+                if table == "transactions" and not _checkpointed(cursor, name):
+                    logging.warning(
+                        f"Partitions: Kept {name}, not covered by the "
+                        f"balance checkpoints yet"
+                    )
+                    continue
+                if table == "predictions" and not _archived(cursor, name):
+                    logging.warning(
+                        f"Partitions: Kept {name}, not archived yet"
+                    )
+                    continue
+                # FINALIZE completes a concurrent detach that was interrupted
+                mode = "FINALIZE" if pending else "CONCURRENTLY"
+                cursor.execute(
+                    f"ALTER TABLE {table} DETACH PARTITION {name} {mode}"
+                )
+                if table == "predictions":
+                    # Their uuids no longer resolve to a partition
+                    cursor.execute(
+                        "DELETE FROM prediction_uuids "
+                        "WHERE created_at >= %s AND created_at < %s",
+                        (_bound(month), _bound(add_months(month, 1)))
+                    )
+                if drop:
+                    cursor.execute(f"DROP TABLE {name}")
+                detached.append(name)
+        return detached
+    except psycopg2.Error as e:
+        print(f"Error detaching partitions: {e}")
+        raise
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.close()
+
+
+class PartitionMaintainer:
+    """Creates the upcoming partitions periodically in a daemon thread."""
+
+    def __init__(
+        self,
+        months_ahead: int = PARTITION_MONTHS_AHEAD,
+        interval_seconds: float = PARTITION_MAINTENANCE_SECONDS,
+    ):
+        self.months_ahead = months_ahead
+        self.interval_seconds = interval_seconds
+        self._thread: Optional[threading.Thread] = None
+
+    def run_forever(self) -> None:
+        while True:
+            try:
+                created = ensure_partitions(self.months_ahead)
+                if created:
+                    logging.info(
+                        f"Partitions: Created {', '.join(created)}"
+                    )
+            except Exception as e:
+                # Retried next time, months_ahead leaves plenty of margin
+                logging.warning(f"Partitions: Maintenance failed: {e}")
+            time.sleep(self.interval_seconds)
+
+    def start(self) -> None:
+        """Starts the maintainer thread of this process (also after a fork)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self.run_forever, daemon=True)
+        self._thread.start()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Partition maintenance.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    create_parser = commands.add_parser(
+        "create", help="Create the upcoming monthly partitions"
+    )
+    create_parser.add_argument(
+        "--months-ahead", type=int, default=PARTITION_MONTHS_AHEAD
+    )
+    detach_parser = commands.add_parser(
+        "detach", help="Detach the partitions of old months"
+    )
+    detach_parser.add_argument(
+        "--before", required=True,
+        type=lambda value: datetime.strptime(value, "%Y-%m").date(),
+        help="First month to keep (YYYY-MM)",
+    )
+    detach_parser.add_argument(
+        "--drop", action="store_true", help="Drop the detached partitions"
+    )
+    args = parser.parse_args()
+
+    if args.command == "create":
+        created = ensure_partitions(args.months_ahead)
+        logging.info(f"Partitions: Created {created or 'none'}")
+        return
+    current = datetime.now(timezone.utc).date().replace(day=1)
+    if args.before > current:
+        raise SystemExit("Refusing to detach the current or future months.")
+    detached = detach_partitions(args.before, args.drop)
+    logging.info(f"Partitions: Detached {detached or 'none'}")
@@ -0,0 +1,154 @@
+# infra/db/prediction_archive.py
+# Cold archive of old finished predictions: zstd-compressed Parquet files
+# under PREDICTION_ARCHIVE_DIR/month=YYYY-MM/, while Postgres keeps a stub
+# (archived_predictions) so get_by_uuid still finds them.
+#   python archive_predictions.py [--retention-days N] [--batch-size N]
+# Needs pyarrow (pip install .[archive]).
+import argparse
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from core.entities.prediction import Prediction
+from core.repositories.prediction_archive_repository import (
+    PredictionArchiveRepository
+)
+
+PREDICTION_ARCHIVE_DIR = os.getenv("PREDICTION_ARCHIVE_DIR", "data/archive")
+# Finished predictions older than this are archived
+PREDICTION_ARCHIVE_RETENTION_DAYS = float(
+    os.getenv("PREDICTION_ARCHIVE_RETENTION_DAYS", "90")
+)
+# Predictions moved per Postgres transaction (and file per month)
+PREDICTION_ARCHIVE_BATCH_SIZE = int(
+    os.getenv("PREDICTION_ARCHIVE_BATCH_SIZE", "5000")
+)
+PREDICTION_ARCHIVE_COMPRESSION = os.getenv(
+    "PREDICTION_ARCHIVE_COMPRESSION", "zstd"
+)
+
+_COLUMNS = (
+    "id", "uuid", "user_id", "model_id", "input_text", "output_text",
+    "input_tokens", "output_tokens", "total_cost", "reserved_cost", "status",
+    "created_at", "completed_at", "queue_time", "process_time", "deadline_at",
+)
+
+
+def _schema():
+    import pyarrow as pa  # Optional dependency, only needed for the archive
+    timestamp = pa.timestamp("us", tz="UTC")
+    types = {
+        "id": pa.int64(), "uuid": pa.string(), "user_id": pa.int64(),
+        "model_id": pa.int64(), "input_text": pa.string(),
+        "output_text": pa.string(), "input_tokens": pa.int64(),
+        "output_tokens": pa.int64(), "total_cost": pa.float64(),
+        "reserved_cost": pa.float64(), "status": pa.string(),
+        "created_at": timestamp, "completed_at": timestamp,
+        "queue_time": pa.int64(), "process_time": pa.int64(),
+        "deadline_at": timestamp,
+    }
+    return pa.schema([(column, types[column]) for column in _COLUMNS])
+
+
+class ParquetPredictionArchive(PredictionArchiveRepository):
+    """Predictions in Parquet files, one directory per created_at month."""
+
+    def __init__(
+        self,
+        root: str = PREDICTION_ARCHIVE_DIR,
+        compression: str = PREDICTION_ARCHIVE_COMPRESSION,
+        row_group_size: int = 1000,
+    ):
+        self.root = root
+        self.compression = compression
+        self.row_group_size = row_group_size
+
+    def write(self, predictions: List[Prediction]) -> Dict[str, str]:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        by_month: Dict[str, List[Prediction]] = {}
+        for prediction in predictions:
+            month = prediction.created_at.astimezone(timezone.utc)
+            by_month.setdefault(f"{month:%Y-%m}", []).append(prediction)
+
+        locations = {}
+        for month, month_predictions in by_month.items():
+            # Sorted by uuid, the row group statistics let read() skip
+            # almost every row group of the file
+            month_predictions.sort(key=lambda p: p.uuid)
+            ids = [p.id for p in month_predictions]
+            directory = os.path.join(self.root, f"month={month}")
+            os.makedirs(directory, exist_ok=True)
+            # Named by its ids, a batch rewritten after a crash replaces
+            # its own file
+            path = os.path.join(
+                directory, f"part-{min(ids)}-{max(ids)}.parquet"
+            )
+            table = pa.Table.from_pylist(
+                [
+                    {column: getattr(p, column) for column in _COLUMNS}
+                    for p in month_predictions
+                ],
+                schema=_schema(),
+            )
+            pq.write_table(
+                table, path + ".tmp",
+                compression=self.compression,
+                row_group_size=self.row_group_size,
+            )
+            # Durable before the rows are deleted from Postgres
+            with open(path + ".tmp", "rb") as f:
+                os.fsync(f.fileno())
+            os.replace(path + ".tmp", path)
+            for prediction in month_predictions:
+                locations[prediction.uuid] = path
+        return locations
+
+    def read(self, location: str, uuid: str) -> Optional[Prediction]:
+        import pyarrow.parquet as pq
+
+        rows = pq.read_table(
+            location, filters=[("uuid", "=", uuid)]
+        ).to_pylist()
+        return Prediction(**rows[0]) if rows else None
+
+
+def main() -> None:
+    from infra.db.prediction_repository_impl import (
+        PostgreSQLPredictionRepository
+    )
+
+    parser = argparse.ArgumentParser(
+        description="Archive old finished predictions to Parquet."
+    )
+    parser.add_argument(
+        "--retention-days", type=float,
+        default=PREDICTION_ARCHIVE_RETENTION_DAYS,
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=PREDICTION_ARCHIVE_BATCH_SIZE
+    )
+    parser.add_argument(
+        "--max-batches", type=int, default=0, help="0: until none are left"
+    )
+    args = parser.parse_args()
+
+    repo = PostgreSQLPredictionRepository()
+    older_than = (
+        datetime.now(timezone.utc) - timedelta(days=args.retention_days)
+    )
+    started = time.monotonic()
+    archived = batches = 0
+    while True:
+        moved = repo.archive_finished(older_than, args.batch_size)
+        archived += moved
+        batches += 1
+        if moved < args.batch_size or batches == args.max_batches:
+            break
+    logging.info(
+        f"Archive: Moved {archived} prediction(s) older than {older_than} "
+        f"in {time.monotonic() - started:.1f}s"
+    )
@@ -3,33 +3,63 @@ import psycopg2  # Changed from sqlite3
 from psycopg2.extras import DictCursor  # For dictionary-like row access
 import os
 import sys
-from typing import Optional, List
+from typing import Dict, Optional, List, Tuple
 from datetime import datetime
 
 # Adjust import paths
 try:
+    from core.entities.job_context import JobContext
     from core.entities.prediction import Prediction
+    from core.repositories.prediction_archive_repository import (
+        PredictionArchiveRepository
+    )
     from core.repositories.prediction_repository import PredictionRepository
     # Import the centralized get_db_connection
     from infra.db.initialize_db import get_db_connection
+    from infra.db.model_repository_impl import PostgreSQLModelRepository
+    from infra.db.prediction_archive import ParquetPredictionArchive
+    from infra.db.user_repository_impl import PostgreSQLUserRepository
 except ImportError:
     project_root = os.path.dirname(
         os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     )
     if project_root not in sys.path:
         sys.path.insert(0, project_root)
+    from core.entities.job_context import JobContext
     from core.entities.prediction import Prediction
+    from core.repositories.prediction_archive_repository import (
+        PredictionArchiveRepository
+    )
     from core.repositories.prediction_repository import PredictionRepository
     # Import the centralized get_db_connection
     from infra.db.initialize_db import get_db_connection
+    from infra.db.model_repository_impl import PostgreSQLModelRepository
+    from infra.db.prediction_archive import ParquetPredictionArchive
+    from infra.db.user_repository_impl import PostgreSQLUserRepository
 
 
 # Removed DB_DIR, DB_PATH, and local get_db_connection
+
+# Columns update_changed() may write (the others never change after insert)
+_UPDATABLE_COLUMNS = (
+    'model_id', 'output_text', 'input_tokens', 'output_tokens', 'total_cost',
+    'reserved_cost', 'status', 'completed_at', 'queue_time', 'process_time',
+    'deadline_at',
+)
 # as we use the centralized one
 
 class PostgreSQLPredictionRepository(PredictionRepository):  # Renamed class
     """PostgreSQL implementation of the PredictionRepository interface."""
 
+    def __init__(self, archive: Optional[PredictionArchiveRepository] = None):
+        """Initializes the repository.
+
+        Args:
+            archive: Cold storage of archived predictions (default: Parquet
+                files in PREDICTION_ARCHIVE_DIR).
+        """
+        self.archive = archive or ParquetPredictionArchive()
+
     def _map_row_to_prediction(  # Changed row type
         self, row: DictCursor
     ) -> Optional[Prediction]:
@@ -45,50 +75,68 @@ class PostgreSQLPredictionRepository(PredictionRepository):  # Renamed class
                 input_tokens=row['input_tokens'],
                 output_tokens=row['output_tokens'],
                 total_cost=row['total_cost'],
+                reserved_cost=row['reserved_cost'],
                 status=row['status'],
                 # PostgreSQL returns datetime objects directly
                 # for TIMESTAMP WITH TIME ZONE
                 created_at=row['created_at'],
                 completed_at=row['completed_at'],
                 queue_time=row['queue_time'],
-                process_time=row['process_time']
+                process_time=row['process_time'],
+                deadline_at=row['deadline_at'],
+                claim_token=row.get('claim_token')
             )
         return None
 
+    def _insert(self, cursor, prediction: Prediction) -> None:
+        """Inserts a prediction with the given cursor (no commit)."""
+        cursor.execute("""
+            INSERT INTO predictions (
+                uuid, user_id, model_id, input_text, output_text,
+                input_tokens, output_tokens, total_cost, reserved_cost,
+                status, created_at, completed_at, queue_time,
+                process_time, deadline_at
+            )
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
+                    %s, %s)
+            RETURNING id, created_at;  -- Return id and created_at
+        """, (
+            prediction.uuid,
+            prediction.user_id,
+            prediction.model_id,
+            prediction.input_text,
+            prediction.output_text,
+            prediction.input_tokens,
+            prediction.output_tokens,
+            prediction.total_cost,
+            prediction.reserved_cost,
+            prediction.status,
+            prediction.created_at,  # Explicitly pass created_at
+            prediction.completed_at,
+            prediction.queue_time,
+            prediction.process_time,
+            prediction.deadline_at
+        ))
+        inserted_row = cursor.fetchone()
+        if inserted_row:
+            prediction.id = inserted_row['id']
+            # Update created_at from DB if it was set by default/trigger
+            prediction.created_at = inserted_row['created_at']
+        # Same transaction: a duplicate uuid fails the whole insert
+        cursor.execute(
+            """INSERT INTO prediction_uuids (uuid, id, created_at)
+               VALUES (%s, %s, %s)""",
+            (prediction.uuid, prediction.id, prediction.created_at)
+        )
+        prediction.mark_clean()
+
     def add(self, prediction: Prediction) -> Prediction:
         """Adds a new prediction record."""
         conn = get_db_connection()
         # Use DictCursor to access rows by column name
         cursor = conn.cursor(cursor_factory=DictCursor)
         try:
-            cursor.execute("""
-                INSERT INTO predictions (
-                    uuid, user_id, model_id, input_text, output_text,
-                    input_tokens, output_tokens, total_cost, status,
-                    created_at, completed_at, queue_time, process_time
-                )
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                RETURNING id, created_at;  -- Return id and created_at
-            """, (
-                prediction.uuid,
-                prediction.user_id,
-                prediction.model_id,
-                prediction.input_text,
-                prediction.output_text,
-                prediction.input_tokens,
-                prediction.output_tokens,
-                prediction.total_cost,
-                prediction.status,
-                prediction.created_at,  # Explicitly pass created_at
-                prediction.completed_at,
-                prediction.queue_time,
-                prediction.process_time
-            ))
-            inserted_row = cursor.fetchone()
-            if inserted_row:
-                prediction.id = inserted_row['id']
-                # Update created_at from DB if it was set by default/trigger
-                prediction.created_at = inserted_row['created_at']
+            self._insert(cursor, prediction)
             conn.commit()
         except psycopg2.Error as e:
             print(f"Database error in add prediction: {e}")
@@ -103,6 +151,90 @@ class PostgreSQLPredictionRepository(PredictionRepository):  # Renamed class
                 conn.close()
         return prediction
 
+    def add_idempotent(
+        self, prediction: Prediction, key: str, ttl_seconds: int
+    ) -> Tuple[Prediction, bool]:
+        """Adds a prediction and its idempotency key in one transaction."""
+        conn = get_db_connection()
+        cursor = conn.cursor(cursor_factory=DictCursor)
+        try:
+            # An expired key may be reused for a new prediction
+            cursor.execute(
+                """DELETE FROM idempotency_keys
+                   WHERE user_id = %s AND key = %s AND expires_at < NOW()""",
+                (prediction.user_id, key)
+            )
+            # A concurrent retry with the same key waits here until the
+            # first one commits, then finds its row
+            cursor.execute(
+                """INSERT INTO idempotency_keys (user_id, key, expires_at)
+                   VALUES (%s, %s, NOW() + make_interval(secs => %s))
+                   ON CONFLICT (user_id, key) DO NOTHING""",
+                (prediction.user_id, key, ttl_seconds)
+            )
+            if cursor.rowcount == 0:
+                # Locked, so concurrent retries agree on the outcome below
+                cursor.execute(
+                    """SELECT prediction_uuid FROM idempotency_keys
+                       WHERE user_id = %s AND key = %s FOR UPDATE""",
+                    (prediction.user_id, key)
+                )
+                row = cursor.fetchone()
+                # The prediction may be archived by now (read back from
+                # the archive)
+                original = (
+                    self.get_by_uuid(row['prediction_uuid'])
+                    if row and row['prediction_uuid'] else None
+                )
+                if original is not None:
+                    conn.commit()
+                    return original, False
+                # Gone for good (its month was dropped): the key is reused
+                print(
+                    f"Warning: Prediction of idempotency key {key!r} not "
+                    f"found, creating a new one."
+                )
+            self._insert(cursor, prediction)
+            cursor.execute(
+                """UPDATE idempotency_keys
+                   SET prediction_id = %s, prediction_uuid = %s
+                   WHERE user_id = %s AND key = %s""",
+                (prediction.id, prediction.uuid, prediction.user_id, key)
+            )
+            conn.commit()
+            return prediction, True
+        except psycopg2.Error as e:
+            print(f"Database error in add idempotent prediction: {e}")
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+    def get_by_idempotency_key(
+        self, user_id: int, key: str
+    ) -> Optional[Prediction]:
+        """Retrieves the prediction of an unexpired idempotency key (also an
+        archived one)."""
+        conn = get_db_connection()
+        cursor = conn.cursor(cursor_factory=DictCursor)
+        try:
+            cursor.execute(
+                """SELECT prediction_uuid FROM idempotency_keys
+                   WHERE user_id = %s AND key = %s
+                     AND expires_at >= NOW()""",
+                (user_id, key)
+            )
+            row = cursor.fetchone()
+        except psycopg2.Error as e:
+            print(f"Error getting prediction by idempotency key: {e}")
+            return None
+        finally:
+            conn.close()
+        if not row or not row['prediction_uuid']:
+            return None
+        return self.get_by_uuid(row['prediction_uuid'])
+
     def get_by_id(self, prediction_id: int) -> Optional[Prediction]:
         """Retrieves a prediction by its database ID."""
         conn = get_db_connection()
@@ -123,22 +255,53 @@ class PostgreSQLPredictionRepository(PredictionRepository):  # Renamed class
             conn.close()
 
     def get_by_uuid(self, uuid: str) -> Optional[Prediction]:
-        """Retrieves a prediction by its unique UUID."""
+        """Retrieves a prediction by its unique UUID (also archived ones)."""
         conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=DictCursor)  # Use DictCursor
         try:
+            # The partition key first, so only one partition is read
             cursor.execute(
-                "SELECT * FROM predictions WHERE uuid = %s",
+                "SELECT id, created_at FROM prediction_uuids WHERE uuid = %s",
                 (uuid,)
             )  # Changed placeholder
-            row = cursor.fetchone()
-            return self._map_row_to_prediction(row)
+            key = cursor.fetchone()
+            if key:
+                cursor.execute(
+                    "SELECT * FROM predictions "
+                    "WHERE id = %s AND created_at = %s",
+                    (key['id'], key['created_at'])
+                )
+                row = cursor.fetchone()
+                if row:
+                    return self._map_row_to_prediction(row)
+            # Archived predictions only leave a stub with their location
+            cursor.execute(
+                "SELECT location FROM archived_predictions WHERE uuid = %s",
+                (uuid,)
+            )
+            stub = cursor.fetchone()
         except psycopg2.Error as e:  # Changed error type
             # Replace with logging
             print(f"Error getting prediction by uuid: {e}")
             return None
         finally:
             conn.close()
+        if stub is None:
+            return None
+        try:
+            return self.archive.read(stub['location'], uuid)
+        except (ImportError, OSError) as e:
+            print(f"Error reading archived prediction {uuid}: {e}")
+            return None
+
+    def _key_filter(self, prediction: Prediction) -> Tuple[str, list]:
+        """WHERE clause of a prediction row; with created_at the query only
+        touches the partition of its month."""
+        if prediction.created_at is None:
+            return "id = %s", [prediction.id]
+        return "id = %s AND created_at = %s", [
+            prediction.id, prediction.created_at
+        ]
 
     def update(self, prediction: Prediction) -> bool:
         """Updates an existing prediction record."""
@@ -151,21 +314,21 @@ class PostgreSQLPredictionRepository(PredictionRepository):  # Renamed class
         # or can be set explicitly if needed.
         # Assuming DDL handles it or it's passed.
         try:
+            key, key_params = self._key_filter(prediction)
             cursor.execute(
-                """UPDATE predictions SET
+                f"""UPDATE predictions SET
                        output_text = %s, input_tokens = %s,
                        output_tokens = %s, total_cost = %s,
                        status = %s, completed_at = %s,
                        queue_time = %s, process_time = %s
-                   WHERE id = %s""",  # Changed placeholders
-                (
+                   WHERE {key}""",  # Changed placeholders
+                [
                     prediction.output_text, prediction.input_tokens,
                     prediction.output_tokens, prediction.total_cost,
                     prediction.status, prediction.completed_at,
                     # Pass completed_at directly
                     prediction.queue_time, prediction.process_time,
-                    prediction.id
-                )
+                ] + key_params
             )
             conn.commit()
             if cursor.rowcount == 0:
@@ -176,6 +339,7 @@ class PostgreSQLPredictionRepository(PredictionRepository):  # Renamed class
                 return False
             # No need to update prediction.completed_at from now_iso,
             # it's passed or handled by DB
+            prediction.mark_clean()
             return True
         except psycopg2.Error as e:  # Changed error type
             print(
@@ -186,16 +350,437 @@ class PostgreSQLPredictionRepository(PredictionRepository):  # Renamed class
         finally:
             conn.close()
 
-    def list_by_user(self, user_id: int) -> List[Prediction]:
-        """Retrieves all predictions for a specific user."""
+    def update_changed(self, prediction: Prediction) -> bool:
+        """Updates only the changed columns, so a status change does not
+        rewrite the (TOASTed) output_text."""
+        if not prediction.id:
+            return False  # Cannot update without ID
+        columns = [
+            column for column in _UPDATABLE_COLUMNS
+            if column in prediction.dirty_fields()
+        ]
+        if not columns:
+            return True
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            # Column names come from _UPDATABLE_COLUMNS, never from input
+            assignments = ", ".join(f"{column} = %s" for column in columns)
+            key, key_params = self._key_filter(prediction)
+            cursor.execute(
+                f"UPDATE predictions SET {assignments} WHERE {key}",
+                [getattr(prediction, column) for column in columns]
+                + key_params
+            )
+            conn.commit()
+            if cursor.rowcount == 0:
+                print(
+                    f"Warning: No prediction found with ID {prediction.id} "
+                    f"to update."
+                )
+                return False
+            prediction.mark_clean()
+            return True
+        except psycopg2.Error as e:
+            print(f"Error updating prediction {prediction.id}: {e}")
+            conn.rollback()
+            return False
+        finally:
+            conn.close()
+
+    def start_processing(
+        self,
+        prediction_id: int,
+        claim_token: Optional[str] = None,
+        lease_seconds: float = 600,
+    ) -> Optional[JobContext]:
+        """Claims a prediction and joins its user and model (one query).
+
+        The status change happens in the same UPDATE that reads it, so a
+        cancel either lands before (seen here) or after (seen by the
+        cancel watcher); it cannot be overwritten.
+        """
+        conn = get_db_connection()
+        cursor = conn.cursor(cursor_factory=DictCursor)
+        try:
+            cursor.execute(
+                """WITH claimed AS (
+                       UPDATE predictions SET
+                           status = CASE
+                               WHEN status = 'cancelling' THEN 'cancelled'
+                               WHEN deadline_at < NOW() THEN 'expired'
+                               ELSE 'processing' END,
+                           completed_at = CASE
+                               WHEN status = 'cancelling'
+                                    OR deadline_at < NOW() THEN NOW()
+                               ELSE completed_at END,
+                           queue_time = (EXTRACT(EPOCH FROM
+                               NOW() - created_at) * 1000)::INTEGER,
+                           claim_token = COALESCE(%s, gen_random_uuid()::TEXT),
+                           lease_expires_at =
+                               NOW() + make_interval(secs => %s)
+                       WHERE id = %s
+                         -- A running prediction only by its holder, or
+                         -- once its holder stopped renewing the lease
+                         AND (status = 'pending'
+                              OR (status IN ('processing', 'cancelling')
+                                  AND (claim_token = %s
+                                       OR lease_expires_at < NOW())))
+                       RETURNING *, TRUE AS claimed
+                   ), job AS (
+                       SELECT * FROM claimed
+                       UNION ALL
+                       SELECT *, FALSE FROM predictions
+                       WHERE id = %s AND NOT EXISTS (SELECT 1 FROM claimed)
+                   )
+                   SELECT job.*,
+                          u.id AS u_id, u.name AS u_name,
+                          u.telegram_id AS u_telegram_id,
+                          COALESCE(b.balance, 0) AS u_balance,
+                          COALESCE(b.reserved_balance, 0)
+                              AS u_reserved_balance,
+                          u.password_hash AS u_password_hash,
+                          u.api_key AS u_api_key,
+                          u.created_at AS u_created_at,
+                          m.id AS m_id, m.name AS m_name,
+                          m.description AS m_description,
+                          m.input_token_price AS m_input_token_price,
+                          m.output_token_price AS m_output_token_price,
+                          m.is_active AS m_is_active
+                   FROM job
+                   LEFT JOIN users u ON u.id = job.user_id
+                   LEFT JOIN balances b ON b.user_id = job.user_id
+                   -- The model of the prediction if still active, else
+                   -- the active one
+                   LEFT JOIN LATERAL (
+                       SELECT * FROM models
+                       WHERE is_active = TRUE
+                       ORDER BY (id = job.model_id) DESC, id
+                       LIMIT 1
+                   ) m ON TRUE""",
+                (
+                    claim_token, lease_seconds, prediction_id, claim_token,
+                    prediction_id
+                )
+            )
+            row = cursor.fetchone()
+            conn.commit()
+            if not row:
+                return None
+            if not row['claimed'] and row['status'] in (
+                'processing', 'cancelling'
+            ):
+                # Held by another worker (duplicate delivery of the job)
+                return None
+
+            def prefixed(prefix: str) -> Optional[dict]:
+                if row[prefix + 'id'] is None:
+                    return None
+                return {
+                    key[len(prefix):]: value for key, value in row.items()
+                    if key.startswith(prefix)
+                }
+
+            return JobContext(
+                prediction=self._map_row_to_prediction(row),
+                user=PostgreSQLUserRepository()._map_row_to_user(
+                    prefixed('u_')
+                ),
+                model=PostgreSQLModelRepository()._map_row_to_model(
+                    prefixed('m_')
+                ),
+                claimed=row['claimed'],
+            )
+        except psycopg2.Error as e:
+            print(f"Error starting prediction {prediction_id}: {e}")
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def claim_pending(
+        self, limit: int, lease_seconds: int
+    ) -> List[Prediction]:
+        """Claims pending (or lease-expired) predictions with SKIP LOCKED.
+
+        Each claimed prediction gets a new claim_token; start_processing()
+        only takes it over with that token until the lease expires.
+        """
+        conn = get_db_connection()
+        cursor = conn.cursor(cursor_factory=DictCursor)
+        predictions = []
+        try:
+            # Concurrent workers skip rows locked by each other instead of
+            # waiting, so every row is claimed by exactly one worker
+            cursor.execute(
+                """UPDATE predictions SET
+                       -- start_processing() turns a 'cancelling' one of a
+                       -- crashed worker into 'cancelled' and releases its hold
+                       status = CASE WHEN status = 'cancelling'
+                                     THEN 'cancelling' ELSE 'processing' END,
+                       lease_expires_at = NOW() + make_interval(secs => %s),
+                       claim_token = gen_random_uuid()::TEXT
+                   WHERE (id, created_at) IN (
+                       SELECT id, created_at FROM predictions
+                       WHERE status = 'pending'
+                          OR (status IN ('processing', 'cancelling')
+                              AND lease_expires_at < NOW())
+                       ORDER BY created_at
+                       LIMIT %s
+                       FOR UPDATE SKIP LOCKED
+                   )
+                   RETURNING *""",
+                (lease_seconds, limit)
+            )
+            rows = cursor.fetchall()
+            conn.commit()
+            predictions = [
+                self._map_row_to_prediction(row) for row in rows if row
+            ]
+            predictions.sort(key=lambda p: p.created_at)
+        except psycopg2.Error as e:
+            print(f"Error claiming pending predictions: {e}")
+            conn.rollback()
+        finally:
+            conn.close()
+        return predictions
+
+    def renew_lease(
+        self, prediction_id: int, claim_token: str, lease_seconds: float
+    ) -> Optional[str]:
+        """Extends the lease of a running prediction if still held."""
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                """UPDATE predictions SET
+                       lease_expires_at = NOW() + make_interval(secs => %s)
+                   WHERE id = %s AND claim_token = %s
+                     AND status IN ('processing', 'cancelling')
+                   RETURNING status""",
+                (lease_seconds, prediction_id, claim_token)
+            )
+            row = cursor.fetchone()
+            conn.commit()
+            return row[0] if row else None
+        except psycopg2.Error as e:
+            print(f"Error renewing lease of prediction {prediction_id}: {e}")
+            conn.rollback()
+            # Unknown, not lost: renewed again at the next poll
+            return 'processing'
+        finally:
+            conn.close()
+
+    def release_lost_holds(
+        self,
+        lease_grace_seconds: float,
+        max_pending_seconds: Optional[float],
+        limit: int,
+    ) -> int:
+        """Ends lost predictions and releases their holds (one transaction)."""
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            # A worker claiming one of them meanwhile finds it finished, so
+            # its hold cannot be released twice
+            cursor.execute(
+                """WITH lost AS (
+                       SELECT id, created_at FROM predictions
+                       WHERE (status = 'pending'
+                              AND (deadline_at < NOW()
+                                   OR created_at < NOW() - make_interval(
+                                       secs => %s)))
+                          OR (status IN ('processing', 'cancelling')
+                              AND lease_expires_at < NOW() - make_interval(
+                                  secs => %s))
+                       ORDER BY created_at
+                       LIMIT %s
+                       FOR UPDATE SKIP LOCKED
+                   ), ended AS (
+                       UPDATE predictions p SET
+                           status = CASE
+                               WHEN p.status = 'pending' THEN 'expired'
+                               WHEN p.status = 'cancelling' THEN 'cancelled'
+                               ELSE 'failed' END,
+                           completed_at = NOW(),
+                           output_text = CASE
+                               WHEN p.status = 'processing'
+                               THEN 'Error: Job lost by its worker'
+                               ELSE p.output_text END
+                       FROM lost
+                       WHERE p.id = lost.id AND p.created_at = lost.created_at
+                       RETURNING p.user_id, COALESCE(p.reserved_cost, 0)
+                                 AS reserved_cost
+                   ), released AS (
+                       UPDATE balances b SET
+                           reserved_balance =
+                               GREATEST(b.reserved_balance - held.amount, 0)
+                       FROM (
+                           SELECT user_id, SUM(reserved_cost) AS amount
+                           FROM ended GROUP BY user_id
+                       ) held
+                       WHERE b.user_id = held.user_id
+                   )
+                   SELECT COUNT(*) FROM ended""",
+                (max_pending_seconds, lease_grace_seconds, limit)
+            )
+            ended = cursor.fetchone()[0]
+            conn.commit()
+            return ended
+        except psycopg2.Error as e:
+            print(f"Error releasing holds of lost predictions: {e}")
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def request_cancel(self, prediction_id: int) -> Optional[str]:
+        """Moves a prediction to 'cancelled' or 'cancelling' atomically."""
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                """UPDATE predictions SET
+                       status = CASE WHEN status = 'pending'
+                                     THEN 'cancelled' ELSE 'cancelling' END,
+                       completed_at = CASE WHEN status = 'pending'
+                                           THEN NOW() ELSE completed_at END
+                   WHERE id = %s AND status IN ('pending', 'processing')
+                   RETURNING status""",
+                (prediction_id,)
+            )
+            row = cursor.fetchone()
+            conn.commit()
+            return row[0] if row else None
+        except psycopg2.Error as e:
+            print(f"Error cancelling prediction {prediction_id}: {e}")
+            conn.rollback()
+            return None
+        finally:
+            conn.close()
+
+    def get_status(self, prediction_id: int) -> Optional[str]:
+        """Retrieves only the status of a prediction."""
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "SELECT status FROM predictions WHERE id = %s",
+                (prediction_id,)
+            )
+            row = cursor.fetchone()
+            return row[0] if row else None
+        except psycopg2.Error as e:
+            print(f"Error getting status of prediction {prediction_id}: {e}")
+            return None
+        finally:
+            conn.close()
+
+    def count_pending_by_model(self) -> Dict[int, int]:
+        """Counts pending predictions per model (uses the claimable index)."""
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                """SELECT model_id, COUNT(*) FROM predictions
+                   WHERE status = 'pending'
+                   GROUP BY model_id"""
+            )
+            return {model_id: count for model_id, count in cursor.fetchall()}
+        except psycopg2.Error as e:
+            print(f"Error counting pending predictions by model: {e}")
+            return {}
+        finally:
+            conn.close()
+
+    def archive_finished(self, older_than: datetime, limit: int) -> int:
+        """Moves up to `limit` predictions finished before older_than to
+        the archive, leaving a stub (one transaction)."""
+        conn = get_db_connection()
+        cursor = conn.cursor(cursor_factory=DictCursor)
+        try:
+            # created_at <= completed_at, so the bound also prunes the
+            # recent partitions. The rows stay locked until they are
+            # replaced by their stubs; a crash before the commit only
+            # leaves files that the next run rewrites: ordered, it picks
+            # the same rows again, so the same part-<min>-<max> file names.
+            cursor.execute(
+                """SELECT * FROM predictions
+                   WHERE status IN ('completed', 'failed', 'cancelled',
+                                    'expired')
+                     AND completed_at < %s
+                     AND created_at < %s
+                   ORDER BY created_at, id
+                   LIMIT %s
+                   FOR UPDATE SKIP LOCKED""",
+                (older_than, older_than, limit)
+            )
+            predictions = [
+                self._map_row_to_prediction(row) for row in cursor.fetchall()
+            ]
+            if not predictions:
+                conn.rollback()
+                return 0
+            locations = self.archive.write(predictions)
+            cursor.execute(
+                """INSERT INTO archived_predictions
+                       (uuid, id, user_id, created_at, location)
+                   SELECT * FROM unnest(%s::TEXT[], %s::INTEGER[],
+                                        %s::INTEGER[], %s::TIMESTAMPTZ[],
+                                        %s::TEXT[])
+                   ON CONFLICT (uuid) DO NOTHING""",
+                (
+                    [p.uuid for p in predictions],
+                    [p.id for p in predictions],
+                    [p.user_id for p in predictions],
+                    [p.created_at for p in predictions],
+                    [locations[p.uuid] for p in predictions],
+                )
+            )
+            cursor.execute(
+                """DELETE FROM predictions
+                   WHERE (id, created_at) IN (
+                       SELECT * FROM unnest(%s::INTEGER[],
+                                            %s::TIMESTAMPTZ[]))""",
+                (
+                    [p.id for p in predictions],
+                    [p.created_at for p in predictions],
+                )
+            )
+            # The stubs resolve these uuids from now on
+            cursor.execute(
+                "DELETE FROM prediction_uuids WHERE uuid = ANY(%s)",
+                ([p.uuid for p in predictions],)
+            )
+            conn.commit()
+            return len(predictions)
+        except psycopg2.Error as e:
+            print(f"Error archiving predictions: {e}")
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def list_by_user(
+        self,
+        user_id: int,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> List[Prediction]:
+        """Retrieves the predictions of a user, only the partitions of the
+        months in [since, until) are read."""
         conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=DictCursor)  # Use DictCursor
         predictions = []
         try:
+            # Bounds are literals to the planner, which prunes partitions
             cursor.execute(
                 "SELECT * FROM predictions WHERE user_id = %s "
+                "AND (%s::timestamptz IS NULL OR created_at >= %s) "
+                "AND (%s::timestamptz IS NULL OR created_at < %s) "
                 "ORDER BY created_at DESC",
-                (user_id,)
+                (user_id, since, since, until, until)
             )  # Changed placeholder
             rows = cursor.fetchall()
             predictions = [
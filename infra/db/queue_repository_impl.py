@@ -0,0 +1,282 @@
+# infra/db/queue_repository_impl.py
+import os
+import sys
+from typing import Dict, List, Optional
+
+import psycopg2
+from psycopg2.extras import DictCursor  # For dictionary-like row access
+
+# Adjust import paths
+try:
+    from core.entities.queue_item import QueueItem
+    from core.repositories.queue_repository import QueueRepository
+    from infra.db.initialize_db import get_db_connection
+except ImportError:
+    project_root = os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    if project_root not in sys.path:
+        sys.path.insert(0, project_root)
+    from core.entities.queue_item import QueueItem
+    from core.repositories.queue_repository import QueueRepository
+    from infra.db.initialize_db import get_db_connection
+
+
+class PostgreSQLQueueRepository(QueueRepository):
+    """PostgreSQL implementation of the QueueRepository interface."""
+
+    def _map_row_to_queue_item(self, row: DictCursor) -> Optional[QueueItem]:
+        """Helper method to map a database row to a QueueItem entity."""
+        if row:
+            return QueueItem(
+                id=row['id'],
+                prediction_id=row['prediction_id'],
+                user_id=row['user_id'],
+                priority=row['priority'],
+                status=row['status'],
+                queued_at=row['queued_at'],
+                dispatched_at=row.get('dispatched_at')
+            )
+        return None
+
+    def add(self, item: QueueItem) -> QueueItem:
+        """Adds a new waiting item to the queue."""
+        conn = get_db_connection()
+        cursor = None
+        try:
+            cursor = conn.cursor(cursor_factory=DictCursor)
+            cursor.execute(
+                """INSERT INTO queue_items
+                   (prediction_id, user_id, priority, status)
+                   VALUES (%s, %s, %s, %s)
+                   RETURNING id, queued_at""",
+                (item.prediction_id, item.user_id, item.priority, item.status)
+            )
+            returned_data = cursor.fetchone()
+            item.id = returned_data['id']
+            item.queued_at = returned_data['queued_at']
+            conn.commit()
+        except psycopg2.Error as e:
+            print(f"Error adding queue item: {e}")
+            if conn:
+                conn.rollback()
+            raise
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+        return item
+
+    def list_waiting(self, limit_per_user: int) -> List[QueueItem]:
+        """Retrieves the oldest waiting items, at most `limit_per_user` per user."""
+        conn = get_db_connection()
+        cursor = None
+        items = []
+        try:
+            cursor = conn.cursor(cursor_factory=DictCursor)
+            # Window per user, so one heavy user cannot fill the whole batch
+            cursor.execute(
+                """SELECT id, prediction_id, user_id, priority, status,
+                          queued_at
+                   FROM (
+                       SELECT *, ROW_NUMBER() OVER (
+                           PARTITION BY user_id
+                           ORDER BY priority DESC, queued_at ASC
+                       ) AS user_rank
+                       FROM queue_items WHERE status = 'waiting'
+                   ) ranked
+                   WHERE user_rank <= %s
+                   ORDER BY queued_at ASC""",
+                (limit_per_user,)
+            )
+            rows = cursor.fetchall()
+            items = [self._map_row_to_queue_item(row) for row in rows if row]
+        except psycopg2.Error as e:
+            print(f"Error listing waiting queue items: {e}")
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+        return items
+
+    def count_processing_by_user(self) -> Dict[int, int]:
+        """Retrieves the number of dispatched (processing) items per user."""
+        conn = get_db_connection()
+        cursor = None
+        counts = {}
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """SELECT user_id, COUNT(*) FROM queue_items
+                   WHERE status = 'processing' GROUP BY user_id"""
+            )
+            counts = {user_id: count for user_id, count in cursor.fetchall()}
+        except psycopg2.Error as e:
+            print(f"Error counting processing queue items: {e}")
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+        return counts
+
+    def mark_processing(
+        self, item_ids: List[int], max_in_flight: int
+    ) -> List[int]:
+        """Moves waiting items to 'processing' into the free slots, skipping
+        already taken ones."""
+        if not item_ids:
+            return []
+        conn = get_db_connection()
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            # Dispatchers take turns, so the free slots counted here are not
+            # filled by a concurrent dispatcher before the update
+            cursor.execute(
+                "SELECT pg_advisory_xact_lock(hashtext('queue_dispatch'))"
+            )
+            cursor.execute(
+                "SELECT COUNT(*) FROM queue_items WHERE status = 'processing'"
+            )
+            slots = max_in_flight - cursor.fetchone()[0]
+            if slots <= 0:
+                conn.commit()
+                return []
+            # The status guard makes concurrent dispatchers safe:
+            # each item is moved (and therefore sent) exactly once
+            cursor.execute(
+                """UPDATE queue_items SET
+                       status = 'processing',
+                       dispatched_at = NOW()
+                   WHERE id IN (
+                       SELECT q.id
+                       FROM unnest(%s::INTEGER[]) WITH ORDINALITY
+                           AS selected(id, position)
+                       JOIN queue_items q ON q.id = selected.id
+                       WHERE q.status = 'waiting'
+                       ORDER BY selected.position
+                       LIMIT %s
+                   )
+                   RETURNING id""",
+                (item_ids, slots)
+            )
+            moved = [row[0] for row in cursor.fetchall()]
+            conn.commit()
+            return moved
+        except psycopg2.Error as e:
+            print(f"Error marking queue items as processing: {e}")
+            if conn:
+                conn.rollback()
+            return []
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+
+    def requeue_stale(self, stale_seconds: float) -> int:
+        """Frees the slots of long-dispatched items whose job was lost."""
+        conn = get_db_connection()
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            # A job still running keeps renewing its prediction lease, so
+            # only items without a live lease are taken back
+            cursor.execute(
+                """WITH stale AS (
+                       SELECT q.id, p.status AS prediction_status
+                       FROM queue_items q
+                       LEFT JOIN predictions p ON p.id = q.prediction_id
+                       WHERE q.status = 'processing'
+                         AND q.dispatched_at
+                             < NOW() - make_interval(secs => %s)
+                         AND (p.status IS NULL
+                              OR p.status NOT IN ('processing', 'cancelling')
+                              OR COALESCE(p.lease_expires_at,
+                                          q.dispatched_at) < NOW())
+                       FOR UPDATE OF q SKIP LOCKED
+                   )
+                   UPDATE queue_items q SET
+                       status = CASE
+                           WHEN s.prediction_status IN
+                                ('pending', 'processing', 'cancelling')
+                               THEN 'waiting'
+                           WHEN s.prediction_status = 'failed' THEN 'failed'
+                           WHEN s.prediction_status = 'cancelled'
+                               THEN 'cancelled'
+                           ELSE 'completed' END,
+                       dispatched_at = NULL
+                   FROM stale s
+                   WHERE q.id = s.id""",
+                (stale_seconds,)
+            )
+            freed = cursor.rowcount
+            conn.commit()
+            return freed
+        except psycopg2.Error as e:
+            print(f"Error requeuing stale queue items: {e}")
+            if conn:
+                conn.rollback()
+            return 0
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+
+    def update_status(self, prediction_id: int, status: str) -> bool:
+        """Updates the queue status of the item for a prediction."""
+        conn = get_db_connection()
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE queue_items SET status = %s WHERE prediction_id = %s",
+                (status, prediction_id)
+            )
+            conn.commit()
+            return cursor.rowcount > 0
+        except psycopg2.Error as e:
+            print(
+                f"Error updating queue status for prediction "
+                f"{prediction_id}: {e}"
+            )
+            if conn:
+                conn.rollback()
+            return False
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+
+    def cancel_waiting(self, prediction_id: int) -> bool:
+        """Marks a waiting queue item as 'cancelled' (dispatched ones keep
+        their slot until the worker finishes them)."""
+        conn = get_db_connection()
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """UPDATE queue_items SET status = 'cancelled'
+                   WHERE prediction_id = %s AND status = 'waiting'""",
+                (prediction_id,)
+            )
+            conn.commit()
+            return cursor.rowcount > 0
+        except psycopg2.Error as e:
+            print(
+                f"Error cancelling queue item for prediction "
+                f"{prediction_id}: {e}"
+            )
+            if conn:
+                conn.rollback()
+            return False
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
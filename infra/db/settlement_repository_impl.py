@@ -0,0 +1,152 @@
+# infra/db/settlement_repository_impl.py
+import os
+import sys
+from typing import Dict, List, Optional
+
+import psycopg2
+
+# Adjust import paths
+try:
+    from core.entities.charge import Charge
+    from core.repositories.settlement_repository import SettlementRepository
+    from infra.db.initialize_db import get_db_connection
+except ImportError:
+    project_root = os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    if project_root not in sys.path:
+        sys.path.insert(0, project_root)
+    from core.entities.charge import Charge
+    from core.repositories.settlement_repository import SettlementRepository
+    from infra.db.initialize_db import get_db_connection
+
+
+class PostgreSQLSettlementRepository(SettlementRepository):
+    """PostgreSQL implementation of the SettlementRepository interface."""
+
+    def get_offset(self, name: str) -> int:
+        """Retrieves the seq of the last settled charge (0: none)."""
+        conn = get_db_connection()
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT last_seq FROM settlement_offsets WHERE name = %s",
+                (name,)
+            )
+            row = cursor.fetchone()
+            return row[0] if row else 0
+        except psycopg2.Error as e:
+            print(f"Error getting settlement offset of '{name}': {e}")
+            raise
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+
+    def apply(self, name: str, charges: List[Charge]) -> Optional[int]:
+        """Settles a batch: one balance update per user (its charges merged,
+        each capped at its hold), one ledger row per charge, and the new
+        offset, all in one transaction."""
+        conn = get_db_connection()
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """INSERT INTO settlement_offsets (name) VALUES (%s)
+                   ON CONFLICT (name) DO NOTHING""",
+                (name,)
+            )
+            # The offset row lock serializes flushers of the same buffer
+            cursor.execute(
+                """SELECT last_seq FROM settlement_offsets
+                   WHERE name = %s FOR UPDATE SKIP LOCKED""",
+                (name,)
+            )
+            row = cursor.fetchone()
+            if not row:
+                conn.rollback()
+                return None
+            # Charges up to the offset were settled before a crash
+            fresh = [charge for charge in charges if charge.seq > row[0]]
+
+            totals: Dict[int, List[float]] = {}
+            by_user: Dict[int, List[Charge]] = {}
+            for charge in fresh:
+                if 0 < charge.reserved < charge.amount:
+                    # Never more than the prediction held (charges buffered
+                    # before the worker capped them)
+                    charge.amount = charge.reserved
+                total = totals.setdefault(charge.user_id, [0.0, 0.0])
+                total[0] += charge.amount
+                total[1] += charge.reserved
+                by_user.setdefault(charge.user_id, []).append(charge)
+            # Fixed lock order, concurrent writers of the same users
+            # cannot deadlock with us
+            for user_id in sorted(totals):
+                amount, reserved = totals[user_id]
+                cursor.execute(
+                    """WITH old AS (
+                           SELECT balance FROM balances
+                           WHERE user_id = %s FOR UPDATE
+                       )
+                       UPDATE balances b SET
+                           balance = b.balance
+                               - LEAST(%s, GREATEST(b.balance, 0)),
+                           reserved_balance =
+                               GREATEST(b.reserved_balance - %s, 0)
+                       FROM old WHERE b.user_id = %s
+                       RETURNING old.balance - b.balance""",
+                    (user_id, amount, reserved, user_id)
+                )
+                charged = cursor.fetchone()
+                if not charged:
+                    print(f"User ID: {user_id} not found for settlement.")
+                    continue
+                # One ledger row per prediction keeps them reconcilable
+                user_charges = by_user[user_id]
+                cursor.execute(
+                    """INSERT INTO transactions (user_id, amount, description,
+                                                 prediction_id)
+                       SELECT %s, -c.amount,
+                              'Settled cost of prediction ' || c.id, c.id
+                       FROM unnest(%s::INTEGER[], %s::REAL[])
+                            AS c(id, amount)""",
+                    (
+                        user_id,
+                        [charge.prediction_id for charge in user_charges],
+                        [charge.amount for charge in user_charges],
+                    )
+                )
+                if charged[0] < amount:
+                    # The balance did not cover the whole batch
+                    cursor.execute(
+                        """INSERT INTO transactions (user_id, amount,
+                                                     description)
+                           VALUES (%s, %s, %s)""",
+                        (
+                            user_id, amount - charged[0],
+                            "Settlement capped at balance"
+                        )
+                    )
+            if charges:
+                cursor.execute(
+                    """UPDATE settlement_offsets
+                       SET last_seq = GREATEST(last_seq, %s),
+                           updated_at = NOW()
+                       WHERE name = %s""",
+                    (charges[-1].seq, name)
+                )
+            conn.commit()
+            return len(fresh)
+        except psycopg2.Error as e:
+            print(f"Error settling charges of '{name}': {e}")
+            if conn:
+                conn.rollback()
+            raise
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
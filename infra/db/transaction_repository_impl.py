@@ -1,13 +1,15 @@
 # infra/db/transaction_repository_impl.py
 import os  # Added: For path operations
 import sys  # Added: For system-specific parameters and functions
-from typing import List, Optional
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
 
 import psycopg2  # Changed from sqlite3
 from psycopg2.extras import DictCursor  # For dictionary-like row access
 
 # Adjust import paths
 try:
+    from core.entities.ledger_discrepancy import LedgerDiscrepancy
     from core.entities.transaction import Transaction
     from core.repositories.transaction_repository import TransactionRepository
     # Import the new get_db_connection function
@@ -18,6 +20,7 @@ except ImportError:
     )
     if project_root not in sys.path:
         sys.path.insert(0, project_root)
+    from core.entities.ledger_discrepancy import LedgerDiscrepancy
     from core.entities.transaction import Transaction
     from core.repositories.transaction_repository import TransactionRepository
     # Import the new get_db_connection function
@@ -25,6 +28,9 @@ except ImportError:
 
 # DB_DIR and DB_PATH are no longer needed for SQLite connection
 
+# Rows fetched per round trip by the reconciliation's server-side cursors
+RECONCILE_FETCH_SIZE = int(os.getenv("RECONCILE_FETCH_SIZE", "10000"))
+
 
 class PostgreSQLTransactionRepository(TransactionRepository):  # Renamed
     """PostgreSQL implementation of the TransactionRepository interface."""
@@ -100,19 +106,28 @@ class PostgreSQLTransactionRepository(TransactionRepository):  # Renamed
             if conn:
                 conn.close()
 
-    def list_by_user(self, user_id: int) -> List[Transaction]:
-        """Retrieves all transactions for a specific user."""
+    def list_by_user(
+        self,
+        user_id: int,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> List[Transaction]:
+        """Retrieves the transactions of a user, only the partitions of the
+        months in [since, until) are read."""
         conn = get_db_connection()
         cursor = None
         transactions = []
         try:
             cursor = conn.cursor(cursor_factory=DictCursor)  # Use DictCursor
+            # Bounds are literals to the planner, which prunes partitions
             cursor.execute(
                 """SELECT id, user_id, amount, description, prediction_id,
                           created_at
                    FROM transactions WHERE user_id = %s
+                     AND (%s::timestamptz IS NULL OR created_at >= %s)
+                     AND (%s::timestamptz IS NULL OR created_at < %s)
                    ORDER BY created_at DESC""",  # Use %s
-                (user_id,)
+                (user_id, since, since, until, until)
             )
             rows = cursor.fetchall()
             for row in rows:
@@ -129,6 +144,252 @@ class PostgreSQLTransactionRepository(TransactionRepository):  # Renamed
                 conn.close()
         return transactions
 
+    def checkpoint_balances(self) -> int:
+        """Advances the per-user balance checkpoints over new transactions."""
+        conn = get_db_connection()
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            # One run at a time, each one sees the checkpoints of the last
+            cursor.execute(
+                "SELECT pg_advisory_xact_lock(hashtext('balance_checkpoints'))"
+            )
+            # Ids are drawn before commit, so a lower id may still appear
+            # after a higher one. Database transactions older than the
+            # snapshot xmin are all finished though: the rows they wrote
+            # are final, whatever their ids. Each user's checkpoint moves
+            # from its own covered_xact_id up to that horizon.
+            cursor.execute(
+                """WITH horizon AS (
+                       SELECT pg_snapshot_xmin(pg_current_snapshot())
+                           AS xact_id
+                   ), delta AS (
+                       SELECT b.user_id, d.amount, d.last_id
+                       FROM balances b
+                       LEFT JOIN balance_checkpoints c
+                           ON c.user_id = b.user_id
+                       CROSS JOIN LATERAL (
+                           SELECT SUM(t.amount::DOUBLE PRECISION) AS amount,
+                                  MAX(t.id) AS last_id
+                           FROM transactions t
+                           WHERE t.user_id = b.user_id
+                             AND t.xact_id >=
+                                 COALESCE(c.covered_xact_id, '0'::XID8)
+                             AND t.xact_id < (SELECT xact_id FROM horizon)
+                       ) d
+                       WHERE d.last_id IS NOT NULL
+                   )
+                   INSERT INTO balance_checkpoints AS c
+                       (user_id, balance, last_transaction_id,
+                        covered_xact_id)
+                   SELECT d.user_id, d.amount, d.last_id,
+                          (SELECT xact_id FROM horizon)
+                   FROM delta d
+                   ON CONFLICT (user_id) DO UPDATE
+                   SET balance = c.balance + EXCLUDED.balance,
+                       last_transaction_id = GREATEST(
+                           c.last_transaction_id,
+                           EXCLUDED.last_transaction_id
+                       ),
+                       covered_xact_id = EXCLUDED.covered_xact_id,
+                       created_at = NOW()
+                   WHERE EXCLUDED.covered_xact_id > c.covered_xact_id"""
+            )
+            written = cursor.rowcount
+            conn.commit()
+            return written
+        except psycopg2.Error as e:
+            print(f"Error checkpointing balances: {e}")
+            if conn:
+                conn.rollback()
+            raise
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+
+    def get_ledger_balance(self, user_id: int) -> Optional[float]:
+        """Computes a user's balance from the checkpoint plus the
+        transactions after it."""
+        audit = self.audit_balance(user_id)
+        return audit[1] if audit else None
+
+    def audit_balance(self, user_id: int) -> Optional[Tuple[float, float]]:
+        """Reads a user's stored balance and ledger balance together."""
+        conn = get_db_connection()
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """SELECT b.balance,
+                          COALESCE(c.balance, 0) + COALESCE((
+                              SELECT SUM(t.amount::DOUBLE PRECISION)
+                              FROM transactions t
+                              WHERE t.user_id = b.user_id
+                                AND t.xact_id >= COALESCE(
+                                    c.covered_xact_id, '0'::XID8
+                                )
+                          ), 0)
+                   FROM balances b
+                   LEFT JOIN balance_checkpoints c ON c.user_id = b.user_id
+                   WHERE b.user_id = %s""",
+                (user_id,)
+            )
+            row = cursor.fetchone()
+            return (row[0], row[1]) if row else None
+        except psycopg2.Error as e:
+            print(f"Error auditing balance of user {user_id}: {e}")
+            return None
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+
+    def reconcile(
+        self, tolerance: float, settle_seconds: float, full: bool = False
+    ) -> Iterator[LedgerDiscrepancy]:
+        """Streams the discrepancies of the whole ledger from one snapshot."""
+        conn = get_db_connection()
+        cursor = None
+        try:
+            # Both checks see the same snapshot of all three tables
+            conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+            # Each check is one aggregate (hash joins over sequential scans,
+            # no per-user queries); server-side cursors stream the result
+            cursor = conn.cursor(name="reconcile_balances")
+            cursor.itersize = RECONCILE_FETCH_SIZE
+            cursor.execute(
+                """WITH checkpoint AS (
+                       SELECT user_id, balance, covered_xact_id
+                       FROM balance_checkpoints WHERE NOT %s
+                   ), ledger AS (
+                       SELECT t.user_id,
+                              SUM(t.amount::DOUBLE PRECISION) AS amount
+                       FROM transactions t
+                       LEFT JOIN checkpoint c ON c.user_id = t.user_id
+                       WHERE t.xact_id >=
+                             COALESCE(c.covered_xact_id, '0'::XID8)
+                       GROUP BY t.user_id
+                   )
+                   SELECT b.user_id, b.balance,
+                          COALESCE(c.balance, 0) + COALESCE(l.amount, 0)
+                   FROM balances b
+                   LEFT JOIN checkpoint c ON c.user_id = b.user_id
+                   LEFT JOIN ledger l ON l.user_id = b.user_id
+                   WHERE ABS(b.balance - COALESCE(c.balance, 0)
+                             - COALESCE(l.amount, 0)) > %s""",
+                (full, tolerance)
+            )
+            for user_id, stored, ledger in cursor:
+                yield LedgerDiscrepancy(
+                    kind='balance', user_id=user_id,
+                    expected=ledger, actual=stored,
+                )
+            cursor.close()
+
+            cursor = conn.cursor(name="reconcile_predictions")
+            cursor.itersize = RECONCILE_FETCH_SIZE
+            cursor.execute(
+                """WITH ledger AS (
+                       SELECT prediction_id, COUNT(*) AS count,
+                              SUM(amount::DOUBLE PRECISION) AS amount
+                       FROM transactions WHERE prediction_id IS NOT NULL
+                       GROUP BY prediction_id
+                   )
+                   SELECT p.id, p.user_id, p.status,
+                          COALESCE(p.total_cost, 0),
+                          COALESCE(l.count, 0), COALESCE(l.amount, 0)
+                   FROM predictions p
+                   LEFT JOIN ledger l ON l.prediction_id = p.id
+                   WHERE (p.status = 'completed' AND l.count IS NULL
+                          AND p.completed_at <
+                              NOW() - make_interval(secs => %s))
+                      OR l.count > 1
+                      OR (l.count = 1 AND p.status NOT IN
+                          ('completed', 'cancelled'))
+                      OR (l.count = 1
+                          AND ABS(l.amount + COALESCE(p.total_cost, 0))
+                              > %s)""",
+                (settle_seconds, tolerance)
+            )
+            for (
+                prediction_id, user_id, status, total_cost, count, amount
+            ) in cursor:
+                if count == 0:
+                    kind, expected, actual = 'missing_transaction', 1, 0
+                elif count > 1:
+                    kind, expected, actual = 'duplicate_transaction', 1, count
+                elif status not in ('completed', 'cancelled'):
+                    kind, expected, actual = 'unexpected_transaction', 0, count
+                else:
+                    kind, expected, actual = 'amount', -total_cost, amount
+                yield LedgerDiscrepancy(
+                    kind=kind, user_id=user_id, prediction_id=prediction_id,
+                    expected=expected, actual=actual,
+                )
+            cursor.close()
+
+            # Holds stay reserved until the prediction finishes, or with
+            # batched settlement until its charge is in the ledger
+            cursor = conn.cursor(name="reconcile_holds")
+            cursor.itersize = RECONCILE_FETCH_SIZE
+            cursor.execute(
+                """WITH settled AS (
+                       SELECT DISTINCT prediction_id FROM transactions
+                       WHERE prediction_id IS NOT NULL
+                   ), holds AS (
+                       SELECT p.user_id,
+                              SUM(COALESCE(p.reserved_cost, 0)
+                                  ::DOUBLE PRECISION) AS amount
+                       FROM predictions p
+                       LEFT JOIN settled s ON s.prediction_id = p.id
+                       WHERE p.status IN ('pending', 'processing',
+                                          'cancelling')
+                          OR (p.status IN ('completed', 'cancelled')
+                              AND p.total_cost IS NOT NULL
+                              AND s.prediction_id IS NULL)
+                       GROUP BY p.user_id
+                   ), recent AS (
+                       SELECT DISTINCT user_id FROM predictions
+                       WHERE GREATEST(created_at, completed_at) >=
+                             NOW() - make_interval(secs => %s)
+                   )
+                   SELECT b.user_id, b.reserved_balance,
+                          COALESCE(h.amount, 0)
+                   FROM balances b
+                   LEFT JOIN holds h ON h.user_id = b.user_id
+                   -- Users still submitting or settling are skipped
+                   LEFT JOIN recent r ON r.user_id = b.user_id
+                   WHERE r.user_id IS NULL
+                     AND ABS(b.reserved_balance - COALESCE(h.amount, 0))
+                         > %s""",
+                (settle_seconds, tolerance)
+            )
+            for user_id, stored, held in cursor:
+                yield LedgerDiscrepancy(
+                    kind='reserved', user_id=user_id,
+                    expected=held, actual=stored,
+                )
+            # A named cursor is gone once its transaction ends
+            cursor.close()
+            cursor = None
+            conn.commit()
+        except psycopg2.Error as e:
+            print(f"Error reconciling the ledger: {e}")
+            if cursor:
+                cursor.close()
+                cursor = None
+            if conn:
+                conn.rollback()
+            raise
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+
 # Example Usage (Optional - Needs update for PostgreSQL and new User Repo)
 # if __name__ == '__main__':
 #     # Ensure correct imports and DB setup
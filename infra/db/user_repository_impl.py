@@ -1,7 +1,7 @@
 # infra/db/user_repository_impl.py
 import psycopg2  # Changed from sqlite3
 import os
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from datetime import datetime
 from psycopg2.extras import DictCursor  # For dictionary-like row access
 
@@ -29,6 +29,13 @@ except ImportError:
 
 # DB_DIR and DB_PATH are no longer needed for SQLite connection
 
+# Users with their row of the narrow, often updated balances table
+_SELECT_USER = """SELECT u.id, u.name, u.telegram_id, u.password_hash,
+                         u.api_key, u.created_at,
+                         COALESCE(b.balance, 0) AS balance,
+                         COALESCE(b.reserved_balance, 0) AS reserved_balance
+                  FROM users u LEFT JOIN balances b ON b.user_id = u.id"""
+
 
 # Consider renaming to PostgreSQLUserRepository
 class PostgreSQLUserRepository(UserRepository):  # Renamed
@@ -42,6 +49,7 @@ class PostgreSQLUserRepository(UserRepository):  # Renamed
                 name=row['name'],
                 telegram_id=row['telegram_id'],
                 balance=row['balance'],
+                reserved_balance=row['reserved_balance'],
                 password_hash=row['password_hash'],
                 api_key=row['api_key'],
                 # PostgreSQL returns datetime objects directly
@@ -57,12 +65,23 @@ class PostgreSQLUserRepository(UserRepository):  # Renamed
         try:
             cursor = conn.cursor(cursor_factory=DictCursor)
             cursor.execute(
-                """INSERT INTO users
-                   (name, telegram_id, balance, password_hash, api_key)
-                   VALUES (%s, %s, %s, %s, %s)
-                   RETURNING id, created_at""",  # Use %s and RETURNING
-                (user.name, user.telegram_id, user.balance,
-                 user.password_hash, user.api_key)
+                """WITH new_user AS (
+                       INSERT INTO users
+                       (name, telegram_id, password_hash, api_key)
+                       VALUES (%s, %s, %s, %s)
+                       RETURNING id, created_at
+                   ), new_balance AS (
+                       INSERT INTO balances (user_id, balance)
+                       SELECT id, %s FROM new_user
+                   ), opening AS (
+                       -- Keeps the ledger complete for balance audits
+                       INSERT INTO transactions (user_id, amount, description)
+                       SELECT id, %s, 'Opening balance' FROM new_user
+                       WHERE %s <> 0
+                   )
+                   SELECT id, created_at FROM new_user""",
+                (user.name, user.telegram_id, user.password_hash,
+                 user.api_key, user.balance, user.balance, user.balance)
             )
             returned_data = cursor.fetchone()
             user.id = returned_data['id']
@@ -95,9 +114,7 @@ class PostgreSQLUserRepository(UserRepository):  # Renamed
         try:
             cursor = conn.cursor(cursor_factory=DictCursor)
             cursor.execute(
-                """SELECT id, name, telegram_id, balance, password_hash,
-                          api_key, created_at
-                   FROM users WHERE id = %s""",  # Use %s
+                _SELECT_USER + " WHERE u.id = %s",
                 (user_id,)
             )
             row = cursor.fetchone()
@@ -118,9 +135,7 @@ class PostgreSQLUserRepository(UserRepository):  # Renamed
         try:
             cursor = conn.cursor(cursor_factory=DictCursor)
             cursor.execute(
-                """SELECT id, name, telegram_id, balance, password_hash,
-                          api_key, created_at
-                   FROM users WHERE telegram_id = %s""",  # Use %s
+                _SELECT_USER + " WHERE u.telegram_id = %s",
                 (telegram_id,)
             )
             row = cursor.fetchone()
@@ -144,9 +159,7 @@ class PostgreSQLUserRepository(UserRepository):  # Renamed
         try:
             cursor = conn.cursor(cursor_factory=DictCursor)
             cursor.execute(
-                """SELECT id, name, telegram_id, balance, password_hash,
-                          api_key, created_at
-                   FROM users WHERE name = %s""",  # Use %s
+                _SELECT_USER + " WHERE u.name = %s",
                 (name,)
             )
             row = cursor.fetchone()
@@ -166,12 +179,25 @@ class PostgreSQLUserRepository(UserRepository):  # Renamed
         cursor = None
         try:
             cursor = conn.cursor()  # No DictCursor needed for rowcount
+            # The difference goes to the ledger in the same statement
             cursor.execute(
-                "UPDATE users SET balance = %s WHERE id = %s",  # Use %s
-                (new_balance, user_id)
+                """WITH old AS (
+                       SELECT balance FROM balances
+                       WHERE user_id = %s FOR UPDATE
+                   ), updated AS (
+                       UPDATE balances b SET balance = %s
+                       FROM old WHERE b.user_id = %s
+                       RETURNING b.user_id, b.balance - old.balance AS delta
+                   ), adjustment AS (
+                       INSERT INTO transactions (user_id, amount, description)
+                       SELECT user_id, delta, 'Balance adjustment'
+                       FROM updated WHERE delta <> 0
+                   )
+                   SELECT COUNT(*) FROM updated""",
+                (user_id, new_balance, user_id)
             )
+            success = cursor.fetchone()[0] > 0
             conn.commit()
-            success = cursor.rowcount > 0
             if success:
                 print(f"Successfully updated balance for user ID: {user_id}")
             else:
@@ -191,6 +217,131 @@ class PostgreSQLUserRepository(UserRepository):  # Renamed
             if conn:
                 conn.close()
 
+    def reserve_funds(self, user_id: int, amount: float) -> bool:
+        """Holds `amount` if the available balance covers it (atomic)."""
+        conn = get_db_connection()
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            # The condition and the hold are one statement, so concurrent
+            # submissions cannot both spend the same funds
+            cursor.execute(
+                """UPDATE balances SET reserved_balance = reserved_balance + %s
+                   WHERE user_id = %s AND balance - reserved_balance >= %s""",
+                (amount, user_id, amount)
+            )
+            conn.commit()
+            return cursor.rowcount > 0
+        except psycopg2.Error as e:
+            print(f"Error reserving funds for user ID {user_id}: {e}")
+            if conn:
+                conn.rollback()
+            return False
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+
+    def reserve_up_to(self, user_id: int, amount: float) -> float:
+        """Holds up to `amount` of the available balance (atomic)."""
+        conn = get_db_connection()
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            # Read and hold in one statement, so concurrent predictions of
+            # the user cannot both take the same free funds
+            cursor.execute(
+                """UPDATE balances b SET
+                       reserved_balance = b.reserved_balance + granted.amount
+                   FROM (
+                       SELECT user_id, LEAST(
+                           %s, GREATEST(balance - reserved_balance, 0)
+                       ) AS amount
+                       FROM balances WHERE user_id = %s FOR UPDATE
+                   ) granted
+                   WHERE b.user_id = granted.user_id
+                   RETURNING granted.amount""",
+                (amount, user_id)
+            )
+            row = cursor.fetchone()
+            conn.commit()
+            return float(row[0]) if row else 0.0
+        except psycopg2.Error as e:
+            print(f"Error reserving funds for user ID {user_id}: {e}")
+            if conn:
+                conn.rollback()
+            return 0.0
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+
+    def release_funds(self, user_id: int, amount: float) -> bool:
+        """Releases a hold made by reserve_funds."""
+        conn = get_db_connection()
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """UPDATE balances SET
+                       reserved_balance = GREATEST(reserved_balance - %s, 0)
+                   WHERE user_id = %s""",
+                (amount, user_id)
+            )
+            conn.commit()
+            return cursor.rowcount > 0
+        except psycopg2.Error as e:
+            print(f"Error releasing funds for user ID {user_id}: {e}")
+            if conn:
+                conn.rollback()
+            return False
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+
+    def settle_charge(
+        self, user_id: int, cost: float, reserved: float
+    ) -> Optional[Tuple[float, float]]:
+        """Charges `cost` (capped at the balance) and releases `reserved`."""
+        conn = get_db_connection()
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            # Relative update under a row lock: concurrent jobs of the same
+            # user cannot overwrite each other's charge
+            cursor.execute(
+                """WITH old AS (
+                       SELECT balance FROM balances
+                       WHERE user_id = %s FOR UPDATE
+                   )
+                   UPDATE balances b SET
+                       balance = b.balance - LEAST(%s, GREATEST(b.balance, 0)),
+                       reserved_balance = GREATEST(b.reserved_balance - %s, 0)
+                   FROM old WHERE b.user_id = %s
+                   RETURNING old.balance - b.balance, b.balance""",
+                (user_id, cost, reserved, user_id)
+            )
+            row = cursor.fetchone()
+            conn.commit()
+            if not row:
+                print(f"User ID: {user_id} not found for charge settlement.")
+                return None
+            return row[0], row[1]
+        except psycopg2.Error as e:
+            print(f"Error settling charge for user ID {user_id}: {e}")
+            if conn:
+                conn.rollback()
+            return None
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+
     def list_all(self) -> List[User]:
         """Retrieves a list of all users."""
         conn = get_db_connection()
@@ -199,9 +350,7 @@ class PostgreSQLUserRepository(UserRepository):  # Renamed
         try:
             cursor = conn.cursor(cursor_factory=DictCursor)
             cursor.execute(
-                """SELECT id, name, telegram_id, balance, password_hash,
-                          api_key, created_at
-                   FROM users ORDER BY created_at DESC"""
+                _SELECT_USER + " ORDER BY u.created_at DESC"
             )
             rows = cursor.fetchall()
             for row in rows:
@@ -271,9 +420,7 @@ class PostgreSQLUserRepository(UserRepository):  # Renamed
         try:
             cursor = conn.cursor(cursor_factory=DictCursor)
             cursor.execute(
-                """SELECT id, name, telegram_id, balance, password_hash,
-                          api_key, created_at
-                   FROM users WHERE api_key = %s""",  # Use %s
+                _SELECT_USER + " WHERE u.api_key = %s",
                 (api_key,)
             )
             row = cursor.fetchone()
@@ -0,0 +1,213 @@
+# infra/llm/concurrency_limiter.py
+# Adaptive (AIMD) concurrency limit per LLM endpoint: the allowed number of
+# calls in flight grows by ~1 per `limit` successful calls and is cut by
+# `backoff` on an error or a latency spike. With Redis the limit and the
+# in-flight set are shared by all worker processes.
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+from config.settings import REDIS_URL
+
+# "redis" (shared by all workers), "memory" (per process) or "off"
+LLM_CONCURRENCY_BACKEND = os.getenv(
+    "LLM_CONCURRENCY_BACKEND", "redis" if REDIS_URL else "memory"
+)
+LLM_CONCURRENCY_INITIAL = float(os.getenv("LLM_CONCURRENCY_INITIAL", "8"))
+LLM_CONCURRENCY_MIN = float(os.getenv("LLM_CONCURRENCY_MIN", "1"))
+LLM_CONCURRENCY_MAX = float(os.getenv("LLM_CONCURRENCY_MAX", "256"))
+# Multiplicative decrease on an error or a latency spike
+LLM_CONCURRENCY_BACKOFF = float(os.getenv("LLM_CONCURRENCY_BACKOFF", "0.9"))
+# A call slower (per token) than this times the usual latency is a spike
+LLM_CONCURRENCY_TOLERANCE = float(os.getenv("LLM_CONCURRENCY_TOLERANCE", "2"))
+
+
+class LocalConcurrencyLimiter:
+    """AIMD limits kept in this process."""
+
+    def __init__(
+        self,
+        initial: float = LLM_CONCURRENCY_INITIAL,
+        min_limit: float = LLM_CONCURRENCY_MIN,
+        max_limit: float = LLM_CONCURRENCY_MAX,
+        backoff: float = LLM_CONCURRENCY_BACKOFF,
+        tolerance: float = LLM_CONCURRENCY_TOLERANCE,
+        alpha: float = 0.05,
+    ):
+        self.initial = initial
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.alpha = alpha  # Smoothing of the usual (long term) latency
+        self._lock = threading.Lock()
+        self._limits: Dict[str, float] = {}
+        self._norms: Dict[str, float] = {}
+        self._inflight: Dict[str, set] = {}
+
+    def limit(self, key: str) -> float:
+        return self._limits.get(key, self.initial)
+
+    def try_acquire(self, key: str, lease_seconds: float) -> Optional[str]:
+        """Takes a slot if the endpoint is under its limit.
+
+        Returns:
+            Optional[str]: A token for release(), or None if it is full.
+        """
+        with self._lock:
+            inflight = self._inflight.setdefault(key, set())
+            if len(inflight) >= max(math.floor(self.limit(key)), 1):
+                return None
+            token = uuid.uuid4().hex
+            inflight.add(token)
+            return token
+
+    def release(
+        self, key: str, token: str,
+        latency: Optional[float] = None, failed: bool = False,
+    ) -> float:
+        """Frees a slot and adapts the limit.
+
+        Args:
+            latency: Seconds per generated token of a successful call
+                (None and not failed: no feedback, e.g. a cancelled call).
+            failed: The call failed or timed out.
+
+        Returns:
+            float: The new limit.
+        """
+        with self._lock:
+            self._inflight.get(key, set()).discard(token)
+            limit = self.limit(key)
+            if latency is None and not failed:
+                return limit
+            drop = failed
+            if latency is not None:
+                norm = self._norms.get(key)
+                if norm is None:
+                    norm = latency
+                elif latency > norm * self.tolerance:
+                    drop = True
+                self._norms[key] = norm + self.alpha * (latency - norm)
+            if drop:
+                limit = max(self.min_limit, limit * self.backoff)
+            else:
+                limit = min(self.max_limit, limit + 1 / limit)
+            self._limits[key] = limit
+            return limit
+
+
+# Atomic slot acquisition: expired leases (crashed workers) are dropped first
+_ACQUIRE_LUA = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+local limit = tonumber(redis.call('HGET', KEYS[2], 'limit') or ARGV[4])
+if redis.call('ZCARD', KEYS[1]) < math.max(math.floor(limit), 1) then
+    redis.call('ZADD', KEYS[1], ARGV[2], ARGV[3])
+    return 1
+end
+return 0
+"""
+
+# Slot release with the AIMD update (same rules as LocalConcurrencyLimiter)
+_RELEASE_LUA = """
+redis.call('ZREM', KEYS[1], ARGV[1])
+local limit = tonumber(redis.call('HGET', KEYS[2], 'limit') or ARGV[8])
+local latency = tonumber(ARGV[2])
+local failed = ARGV[3] == '1'
+if latency < 0 and not failed then
+    return tostring(limit)
+end
+local drop = failed
+if latency >= 0 then
+    local norm = tonumber(redis.call('HGET', KEYS[2], 'norm') or '-1')
+    if norm < 0 then
+        norm = latency
+    elseif latency > norm * tonumber(ARGV[6]) then
+        drop = true
+    end
+    norm = norm + tonumber(ARGV[7]) * (latency - norm)
+    redis.call('HSET', KEYS[2], 'norm', tostring(norm))
+end
+if drop then
+    limit = math.max(tonumber(ARGV[4]), limit * tonumber(ARGV[5]))
+else
+    limit = math.min(tonumber(ARGV[9]), limit + 1 / limit)
+end
+redis.call('HSET', KEYS[2], 'limit', tostring(limit))
+return tostring(limit)
+"""
+
+
+class RedisConcurrencyLimiter(LocalConcurrencyLimiter):
+    """AIMD limits shared by all worker processes through Redis.
+
+    Each endpoint has a hash (limit, usual latency) and a sorted set of
+    in-flight tokens scored by lease expiry, so slots of a crashed worker
+    free themselves. If Redis is unavailable the process-local limiter is
+    used instead.
+    """
+
+    def __init__(self, url: str, prefix: str = "sbllm:aimd:", **kwargs):
+        super().__init__(**kwargs)
+        import redis  # Optional dependency, only needed for this backend
+        self._redis = redis.Redis.from_url(url)
+        self._acquire = self._redis.register_script(_ACQUIRE_LUA)
+        self._release = self._redis.register_script(_RELEASE_LUA)
+        self.prefix = prefix
+
+    def _keys(self, key: str) -> list:
+        return [self.prefix + key + ":inflight", self.prefix + key]
+
+    def limit(self, key: str) -> float:
+        try:
+            value = self._redis.hget(self.prefix + key, "limit")
+            return float(value) if value is not None else self.initial
+        except Exception:
+            return super().limit(key)
+
+    def try_acquire(self, key: str, lease_seconds: float) -> Optional[str]:
+        token = uuid.uuid4().hex
+        now = time.time()
+        try:
+            ok = self._acquire(
+                keys=self._keys(key),
+                args=[now, now + lease_seconds, token, self.initial],
+            )
+            return token if ok else None
+        except Exception as e:
+            logging.warning(f"Concurrency limiter: Redis unavailable: {e}")
+            local = super().try_acquire(key, lease_seconds)
+            return f"local:{local}" if local else None
+
+    def release(
+        self, key: str, token: str,
+        latency: Optional[float] = None, failed: bool = False,
+    ) -> float:
+        if token.startswith("local:"):
+            return super().release(key, token[6:], latency, failed)
+        try:
+            return float(self._release(
+                keys=self._keys(key),
+                args=[
+                    token, -1 if latency is None else latency,
+                    1 if failed else 0, self.min_limit, self.backoff,
+                    self.tolerance, self.alpha, self.initial, self.max_limit,
+                ],
+            ))
+        except Exception as e:
+            # The lease expires on its own
+            logging.warning(f"Concurrency limiter: Redis release failed: {e}")
+            return self.initial
+
+
+def get_concurrency_limiter() -> Optional[LocalConcurrencyLimiter]:
+    """Builds the limiter configured by LLM_CONCURRENCY_BACKEND."""
+    if LLM_CONCURRENCY_BACKEND == "redis":
+        return RedisConcurrencyLimiter(REDIS_URL)
+    if LLM_CONCURRENCY_BACKEND == "memory":
+        return LocalConcurrencyLimiter()
+    return None
@@ -2,9 +2,15 @@
 import time
 import random
 
-async def dummy_llm_predict(text: str) -> dict:
+async def dummy_llm_predict(
+    text: str,
+    max_tokens: int | None = None,
+    cancel_event: "asyncio.Event | None" = None,
+) -> dict:
     """Simulates an LLM call by echoing the input after a short delay.
 
+    The echo is cut to `max_tokens` characters (one token per character).
+
     Returns:
         dict: A dictionary containing the output text, input tokens, and output tokens.
     """
@@ -12,6 +18,14 @@ async def dummy_llm_predict(text: str) -> dict:
     await asyncio.sleep(random.uniform(0.1, 0.5)) # Simulate 100-500ms delay
 
     output_text = f"Echo: {text}"
+    finish_reason = "stop"
+    if cancel_event is not None and cancel_event.is_set():
+        # Pretend half of the echo was produced before the cancel
+        output_text = output_text[:len(output_text) // 2]
+        finish_reason = "cancelled"
+    if max_tokens is not None and len(output_text) > max_tokens:
+        output_text = output_text[:max_tokens]
+        finish_reason = "length"
 
     # Simulate token calculation (very basic)
     input_tokens = len(text)
@@ -21,6 +35,7 @@ async def dummy_llm_predict(text: str) -> dict:
         "output_text": output_text,
         "input_tokens": input_tokens,
         "output_tokens": output_tokens,
+        "finish_reason": finish_reason,
     }
 
 # Add asyncio import if not already present at the top
@@ -0,0 +1,170 @@
+# infra/llm/llama_cpp_llm.py
+"""
+llama.cpp GGUF backend (CPU only, no GPU needed).
+
+Weights are memory-mapped (use_mmap), so every worker process on the box
+shares the same read-only page cache copy of the file. One context per model
+decodes one sequence at a time on LLAMA_CPP_THREADS threads.
+
+LLAMA_CPP_PARALLEL > 1 keeps that many separate Llama instances instead:
+the high-level llama-cpp-python API decodes a single sequence per instance
+(no multi-sequence batching), so each has its own KV cache and, for weights
+llama.cpp repacks on load, its own copy of them. Only raise it with RAM to
+spare; for batched decoding run `llama-server --parallel N` instead.
+
+Needs `pip install .[llama-cpp]` (llama-cpp-python).
+"""
+
+import asyncio
+import os
+import queue
+import threading
+
+from config.settings import SYSTEM_PROMPT
+
+try:
+    from llama_cpp import Llama
+except ImportError:  # Optional dependency, only needed for this backend
+    Llama = None
+
+LLAMA_CPP_MODEL_PATH = os.getenv("LLAMA_CPP_MODEL_PATH", "")
+# Sequences decoded at once per model (one Llama instance each, see above)
+LLAMA_CPP_PARALLEL = int(os.getenv("LLAMA_CPP_PARALLEL", "1"))
+# Threads per context, default splits the cores between the contexts
+LLAMA_CPP_THREADS = int(os.getenv(
+    "LLAMA_CPP_THREADS",
+    str(max((os.cpu_count() or 1) // LLAMA_CPP_PARALLEL, 1)),
+))
+LLAMA_CPP_CTX = int(os.getenv("LLAMA_CPP_CTX", "4096"))
+# Prompt tokens evaluated per decode call
+LLAMA_CPP_BATCH = int(os.getenv("LLAMA_CPP_BATCH", "512"))
+# Lock the mapped weights in RAM (needs a high enough RLIMIT_MEMLOCK)
+LLAMA_CPP_MLOCK = os.getenv("LLAMA_CPP_MLOCK", "0") == "1"
+
+# Idle contexts by model path
+_pools: dict = {}
+_pools_lock = threading.Lock()
+# One lock per model path, so loading a model does not block the others
+_load_locks: dict = {}
+
+
+def _load(model_path: str) -> "Llama":
+    if Llama is None:
+        raise RuntimeError("llama-cpp-python is not installed.")
+    return Llama(
+        model_path=model_path,
+        n_ctx=LLAMA_CPP_CTX,
+        n_batch=LLAMA_CPP_BATCH,
+        n_threads=LLAMA_CPP_THREADS,
+        n_gpu_layers=0,
+        use_mmap=True,
+        use_mlock=LLAMA_CPP_MLOCK,
+        verbose=False,
+    )
+
+
+def _pool(model_path: str) -> queue.Queue:
+    """Returns the context pool of a model, loading the contexts once."""
+    pool = _pools.get(model_path)
+    if pool is not None:
+        return pool
+    with _pools_lock:
+        load_lock = _load_locks.setdefault(model_path, threading.Lock())
+    with load_lock:
+        pool = _pools.get(model_path)
+        if pool is None:
+            pool = queue.Queue()
+            # The first context maps the file, the others reuse its pages
+            for _ in range(LLAMA_CPP_PARALLEL):
+                pool.put(_load(model_path))
+            with _pools_lock:
+                _pools[model_path] = pool
+        return pool
+
+
+def resolve_path(model_name: str | None = None) -> str:
+    return model_name or LLAMA_CPP_MODEL_PATH
+
+
+def load(model_path: str) -> None:
+    """Loads the contexts of a model (blocking), no-op if already loaded."""
+    _pool(model_path)
+
+
+def unload(model_path: str) -> None:
+    """Drops the idle contexts of a model (busy ones are freed on return)."""
+    with _pools_lock:
+        pool = _pools.pop(model_path, None)
+    while pool is not None and not pool.empty():
+        pool.get_nowait().close()
+
+
+def _generate(
+    model_path: str,
+    text: str,
+    max_tokens: int | None,
+    cancel_event: asyncio.Event | None,
+) -> dict:
+    """Blocking generation on a free context (runs in a worker thread)."""
+    pool = _pool(model_path)
+    llm = pool.get()
+    try:
+        conversation = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": text},
+        ]
+        # Streamed so a cancel stops decoding between tokens
+        stream = llm.create_chat_completion(
+            messages=conversation,
+            max_tokens=max_tokens,
+            stream=True,
+        )
+        parts = []
+        output_tokens = 0
+        finish_reason = None
+        for chunk in stream:
+            if cancel_event is not None and cancel_event.is_set():
+                finish_reason = "cancelled"
+                break
+            choice = chunk["choices"][0]
+            delta = choice["delta"].get("content") or ""
+            if delta:
+                parts.append(delta)
+                output_tokens += 1
+            finish_reason = choice.get("finish_reason") or finish_reason
+        input_tokens = len(llm.tokenize(
+            (SYSTEM_PROMPT + "\n" + text).encode("utf-8")
+        ))
+        return {
+            "output_text": "".join(parts),
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "finish_reason": finish_reason,  # "length" if cut by max_tokens
+        }
+    finally:
+        if _pools.get(model_path) is pool:
+            pool.put(llm)
+        else:
+            llm.close()  # Model was unloaded meanwhile
+
+
+async def predict(
+    text: str,
+    max_tokens: int | None = None,
+    cancel_event: asyncio.Event | None = None,
+    model_name: str | None = None,
+) -> dict:
+    """Runs a GGUF model with llama.cpp on the CPU.
+
+    Args:
+        max_tokens: Upper bound of generated tokens (None: until EOS).
+        cancel_event: Stops the decoding between two tokens.
+        model_name: Path of the gguf weights (None: LLAMA_CPP_MODEL_PATH).
+    """
+    model_path = resolve_path(model_name)
+    if not model_path:
+        raise ValueError("No GGUF model path configured (LLAMA_CPP_MODEL_PATH).")
+    # llama.cpp is blocking, keep the event loop free
+    return await asyncio.to_thread(
+        _generate, model_path, text, max_tokens, cancel_event
+    )
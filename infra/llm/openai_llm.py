@@ -1,25 +1,84 @@
 # infra/llm/openai_llm.py
+import asyncio
 import os
-from openai import OpenAI
+from openai import AsyncOpenAI
 
-_client = None
+from config.settings import SYSTEM_PROMPT
+
+# Clients of the running event loop by (base_url, api_key)
+_clients: dict = {}
+_client_loop = None
 default_model_str = ""
 LM_STUDIO_API_BASE_URL = "http://26.126.159.93:22227/v1"
 
 
-async def predict(text: str) -> dict:
-    """Runs a prediction using the OpenAI API."""
-    global _client
-    if _client is None:
-        _client = OpenAI(
-            api_key=os.environ.get("OPENAI_API_KEY", "sk-your-improvised-api-key"),
-            base_url=os.environ.get("OPENAI_BASE_URL", LM_STUDIO_API_BASE_URL)
+def _get_client(
+    base_url: str | None = None, api_key: str | None = None
+) -> AsyncOpenAI:
+    """Returns the client of an endpoint for the running event loop.
+
+    Celery jobs run each prediction in a fresh event loop (asyncio.run) and
+    an async HTTP pool cannot be reused across loops.
+    """
+    global _clients, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client_loop is not loop:
+        _clients = {}
+        _client_loop = loop
+    key = (base_url, api_key)
+    if key not in _clients:
+        # Async client, so a generation does not block the event loop
+        # (matters for the in-process queue backend inside the API)
+        _clients[key] = AsyncOpenAI(
+            api_key=api_key or os.environ.get(
+                "OPENAI_API_KEY", "sk-your-improvised-api-key"
+            ),
+            base_url=base_url or os.environ.get(
+                "OPENAI_BASE_URL", LM_STUDIO_API_BASE_URL
+            )
+        )
+    return _clients[key]
+
+
+async def check_health(
+    base_url: str | None = None, api_key: str | None = None,
+    timeout: float = 5.0,
+) -> bool:
+    """Returns True if the endpoint answers its model list in time."""
+    try:
+        await asyncio.wait_for(
+            _get_client(base_url, api_key).models.list(), timeout
         )
+        return True
+    except Exception:
+        return False
+
+
+async def predict(
+    text: str,
+    max_tokens: int | None = None,
+    cancel_event: asyncio.Event | None = None,
+    base_url: str | None = None,
+    api_key: str | None = None,
+    model_name: str | None = None,
+) -> dict:
+    """Runs a prediction using the OpenAI API.
+
+    Args:
+        max_tokens: Upper bound of generated tokens (None: endpoint default).
+        cancel_event: If given, the answer is streamed and generation stops
+            as soon as the event is set; the partial answer is returned with
+            finish_reason "cancelled".
+        base_url, api_key: Endpoint to call (None: OPENAI_BASE_URL).
+        model_name: Model requested from the endpoint (None: its default).
+    """
+    client = _get_client(base_url, api_key)
+    model_name = model_name or default_model_str
 
     conversation = [
         {
             "role": "system",
-            "content": "You are a helpful assistant"
+            "content": SYSTEM_PROMPT
         },
         {
             "role": "user",
@@ -27,14 +86,22 @@ async def predict(text: str) -> dict:
         },
     ]
 
-    completion = _client.chat.completions.create(
-        model=default_model_str,
+    if cancel_event is not None:
+        return await _predict_stream(
+            client, model_name, text, conversation, max_tokens, cancel_event
+        )
+
+    completion = await client.chat.completions.create(
+        model=model_name,
         messages=conversation,
+        max_tokens=max_tokens,
     )
 
     output_text = ""
+    finish_reason = None
     if completion.choices:
         output_text = completion.choices[0].message.content or ""
+        finish_reason = completion.choices[0].finish_reason
 
     input_tokens = len(text.split())
     prompt_tokens_api = input_tokens
@@ -49,6 +116,54 @@ async def predict(text: str) -> dict:
         "output_text": output_text,
         "input_tokens": prompt_tokens_api,
         "output_tokens": completion_tokens_api,
+        "finish_reason": finish_reason,  # "length" if cut by max_tokens
+    }
+
+
+async def _predict_stream(
+    client: AsyncOpenAI,
+    model_name: str,
+    text: str,
+    conversation: list,
+    max_tokens: int | None,
+    cancel_event: asyncio.Event,
+) -> dict:
+    """Streams the answer so generation can be aborted midway."""
+    stream = await client.chat.completions.create(
+        model=model_name,
+        messages=conversation,
+        max_tokens=max_tokens,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    parts = []
+    chunks = 0
+    finish_reason = None
+    usage = None
+    try:
+        async for chunk in stream:
+            if cancel_event.is_set():
+                finish_reason = "cancelled"
+                break
+            if chunk.choices:
+                delta = chunk.choices[0].delta.content or ""
+                if delta:
+                    parts.append(delta)
+                    chunks += 1
+                finish_reason = chunk.choices[0].finish_reason or finish_reason
+            if getattr(chunk, "usage", None):
+                usage = chunk.usage
+    finally:
+        # Closing the stream aborts the request on the server side
+        await stream.close()
+
+    output_text = "".join(parts)
+    # Usage arrives in the last chunk only, fall back to counting chunks
+    return {
+        "output_text": output_text,
+        "input_tokens": usage.prompt_tokens if usage else len(text.split()),
+        "output_tokens": usage.completion_tokens if usage else chunks,
+        "finish_reason": finish_reason,
     }
 
 _client = None
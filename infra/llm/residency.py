@@ -0,0 +1,425 @@
+# infra/llm/residency.py
+# Keeps several local models (vllm, llama_cpp) loaded in this process up to
+# a memory budget. The least recently used idle model is unloaded to make
+# room, and models with queued predictions are preloaded in the background
+# so requests do not stall on a cold load. The preloader also loads the
+# target of an active-model switchover and unloads the old model once idle.
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from core.entities.model_endpoint import ModelEndpoint
+from core.repositories.model_endpoint_repository import ModelEndpointRepository
+from core.repositories.model_repository import ModelRepository
+from core.repositories.model_switchover_repository import (
+    ModelSwitchoverRepository
+)
+from core.repositories.prediction_repository import PredictionRepository
+from infra.llm.router import LLM_DEFAULT_BACKEND
+from infra.metrics import counters
+
+# Memory available for resident models (0: no limit)
+LLM_RESIDENCY_BUDGET_MB = float(os.getenv("LLM_RESIDENCY_BUDGET_MB", "0"))
+# Loaded size = weights file size * overhead (KV cache, runtime buffers)
+LLM_RESIDENCY_OVERHEAD = float(os.getenv("LLM_RESIDENCY_OVERHEAD", "1.2"))
+# Size assumed when the weights file cannot be found (e.g. a hub name)
+LLM_RESIDENCY_DEFAULT_MB = float(os.getenv("LLM_RESIDENCY_DEFAULT_MB", "2048"))
+# How often the backlog is checked for models worth preloading
+LLM_PRELOAD_INTERVAL_SECONDS = float(
+    os.getenv("LLM_PRELOAD_INTERVAL_SECONDS", "15")
+)
+# A worker without a residency report for this long is considered gone
+LLM_RESIDENCY_HEARTBEAT_SECONDS = float(os.getenv(
+    "LLM_RESIDENCY_HEARTBEAT_SECONDS", str(LLM_PRELOAD_INTERVAL_SECONDS * 4)
+))
+# Prompt of the warm-up generation after a switchover preload
+_WARMUP_TEXT = "Hi"
+
+# Engines whose models live in this process
+LOCAL_KINDS = ("vllm", "llama_cpp")
+
+
+def _engine(kind: str):
+    if kind == "vllm":
+        from infra.llm import vllm_gguf_llm
+        return vllm_gguf_llm
+    if kind == "llama_cpp":
+        from infra.llm import llama_cpp_llm
+        return llama_cpp_llm
+    raise ValueError(f"Not a local engine kind: {kind}")
+
+
+@dataclass
+class _Resident:
+    """A model loaded (or loading) in this process."""
+    kind: str
+    path: str
+    size: float # Estimated bytes
+    users: int = 0 # Requests using it (never evicted while > 0)
+    ready: threading.Event = field(default_factory=threading.Event)
+    error: Optional[Exception] = None
+    warm: bool = False # Served a generation since it was loaded
+
+
+class ModelResidencyManager:
+    """LRU set of loaded local models under a memory budget.
+
+    Thread based (not asyncio), so it works across the fresh event loops
+    of Celery jobs, the sidecar loop and background preload threads.
+    """
+
+    def __init__(
+        self,
+        budget_mb: float = LLM_RESIDENCY_BUDGET_MB,
+        overhead: float = LLM_RESIDENCY_OVERHEAD,
+        default_mb: float = LLM_RESIDENCY_DEFAULT_MB,
+    ):
+        self.budget = budget_mb * 2 ** 20
+        self.overhead = overhead
+        self.default_size = default_mb * 2 ** 20
+        self._lock = threading.Lock()
+        self._preloading: set = set()
+        # Least recently used first
+        self._resident: "OrderedDict[Tuple[str, str], _Resident]" = \
+            OrderedDict()
+
+    def estimate_size(self, path: str) -> float:
+        try:
+            return os.path.getsize(path) * self.overhead
+        except OSError:
+            return self.default_size
+
+    def used(self) -> float:
+        return sum(entry.size for entry in self._resident.values())
+
+    def resident(self) -> List[Tuple[str, str]]:
+        """Loaded models, least recently used first."""
+        with self._lock:
+            return [key for key, e in self._resident.items() if e.ready.is_set()]
+
+    def is_warm(self, kind: str, path: str) -> bool:
+        entry = self._resident.get((kind, path))
+        return entry is not None and entry.ready.is_set() and entry.warm
+
+    def _victims(self, size: float, keep: Tuple[str, str]) -> List[_Resident]:
+        """Picks idle models to unload (LRU first) so `size` fits."""
+        if not self.budget:
+            return []
+        victims = []
+        free = self.budget - self.used()
+        for key, entry in self._resident.items():
+            if free >= size:
+                break
+            if key != keep and entry.users == 0 and entry.ready.is_set():
+                victims.append(entry)
+                free += entry.size
+        return victims
+
+    def _fits_without_eviction(self, size: float) -> bool:
+        return not self.budget or self.used() + size <= self.budget
+
+    def acquire(
+        self, kind: str, path: str, evict: bool = True
+    ) -> Optional[_Resident]:
+        """Makes a model resident and marks it in use (blocking).
+
+        Args:
+            evict: Unload idle models to make room. When False (preloads),
+                the model is only loaded if it fits in the free budget.
+
+        Returns:
+            The resident entry (pass it to release), or None if it did not
+            fit and evict was False.
+        """
+        key = (kind, path)
+        load = False
+        victims = []
+        with self._lock:
+            entry = self._resident.get(key)
+            if entry is None:
+                size = self.estimate_size(path)
+                if not evict and not self._fits_without_eviction(size):
+                    return None
+                victims = self._victims(size, key)
+                for victim in victims:
+                    del self._resident[(victim.kind, victim.path)]
+                entry = _Resident(kind=kind, path=path, size=size)
+                self._resident[key] = entry
+                load = True
+                if self.budget and self.used() > self.budget:
+                    logging.warning(
+                        f"Residency: Loading {path} exceeds the budget, "
+                        f"all other models are busy."
+                    )
+            entry.users += 1
+            self._resident.move_to_end(key)
+
+        for victim in victims:
+            logging.info(f"Residency: Unloading {victim.path} (LRU).")
+            counters.incr("llm_model_evictions")
+            _engine(victim.kind).unload(victim.path)
+
+        if load:
+            started = time.monotonic()
+            try:
+                _engine(kind).load(path)
+                logging.info(
+                    f"Residency: Loaded {path} in "
+                    f"{time.monotonic() - started:.1f}s."
+                )
+                counters.incr("llm_model_loads")
+            except Exception as e:
+                entry.error = e
+                with self._lock:
+                    if self._resident.get(key) is entry:
+                        del self._resident[key]
+            finally:
+                entry.ready.set()
+        else:
+            entry.ready.wait()
+
+        if entry.error is not None:
+            self.release(entry)
+            raise entry.error
+        return entry
+
+    def release(self, entry: _Resident, warm: bool = True) -> None:
+        with self._lock:
+            entry.users = max(entry.users - 1, 0)
+            entry.warm = entry.warm or warm
+
+    def unload(self, kind: str, path: str) -> bool:
+        """Unloads a model once it is idle; False if it is still in use."""
+        key = (kind, path)
+        with self._lock:
+            entry = self._resident.get(key)
+            if entry is None:
+                return True
+            if entry.users > 0 or not entry.ready.is_set():
+                return False
+            del self._resident[key]
+        _engine(kind).unload(path)
+        logging.info(f"Residency: Unloaded {path}.")
+        return True
+
+    @asynccontextmanager
+    async def use(self, kind: str, model_name: Optional[str]):
+        """Keeps a local model loaded (and not evictable) while in use."""
+        path = _engine(kind).resolve_path(model_name)
+        entry = await asyncio.to_thread(self.acquire, kind, path)
+        try:
+            yield path
+        finally:
+            self.release(entry)
+
+    def preload(
+        self,
+        kind: str,
+        model_name: Optional[str],
+        evict: bool = False,
+        warm: bool = False,
+    ) -> bool:
+        """Starts loading a model in a background thread.
+
+        Args:
+            evict: Unload idle models to make room (switchover targets);
+                otherwise the model is only loaded if it fits in the free
+                budget.
+            warm: Run a one-token generation after loading, so the first
+                real request does not pay for lazy initialization.
+
+        Returns:
+            bool: True if the model is resident or loading.
+        """
+        path = _engine(kind).resolve_path(model_name)
+        with self._lock:
+            entry = self._resident.get((kind, path))
+            if entry is not None and (entry.warm or not warm):
+                return True
+            if entry is None and not evict and \
+                    not self._fits_without_eviction(self.estimate_size(path)):
+                return False
+            if (kind, path) in self._preloading:
+                return True
+            self._preloading.add((kind, path))
+
+        def load() -> None:
+            entry = None
+            try:
+                entry = self.acquire(kind, path, evict=evict)
+                if entry is not None and warm and not entry.warm:
+                    asyncio.run(_engine(kind).predict(
+                        _WARMUP_TEXT, max_tokens=1, model_name=path
+                    ))
+                    entry.warm = True
+            except Exception as e:
+                logging.warning(f"Residency: Preload of {path} failed: {e}")
+            finally:
+                if entry is not None:
+                    self.release(entry, warm=False)
+                with self._lock:
+                    self._preloading.discard((kind, path))
+
+        threading.Thread(target=load, daemon=True).start()
+        return True
+
+
+class BacklogPreloader:
+    """Background agent keeping the right local models loaded in a worker.
+
+    Each run it:
+    - loads and warms the targets of warming switchovers (evicting idle
+      models if needed),
+    - preloads the active models with queued predictions, most queued first,
+      if they fit next to the resident ones (never evicting a busy model),
+    - unloads models that are no longer active once their requests finished
+      (the drain of a switchover),
+    - reports the models it serves or still has loaded, which is also its
+      heartbeat for switchovers.
+    """
+
+    def __init__(
+        self,
+        manager: ModelResidencyManager,
+        prediction_repository: PredictionRepository,
+        model_repository: ModelRepository,
+        endpoint_repository: ModelEndpointRepository,
+        switchover_repository: Optional[ModelSwitchoverRepository] = None,
+        interval_seconds: float = LLM_PRELOAD_INTERVAL_SECONDS,
+    ):
+        self.manager = manager
+        self.prediction_repository = prediction_repository
+        self.model_repository = model_repository
+        self.endpoint_repository = endpoint_repository
+        self.switchover_repository = switchover_repository
+        self.interval_seconds = interval_seconds
+        self._last_run = 0.0
+        self._thread: Optional[threading.Thread] = None
+        # Local engine models of every model seen, by model ID
+        self._paths: Dict[int, List[Tuple[str, str]]] = {}
+
+    def _local_paths(self, model_id: int) -> List[Tuple[str, str]]:
+        endpoints = self.endpoint_repository.list_by_model(model_id)
+        if not endpoints:
+            # Served by the default backend, as in LLMRouter.endpoints_for
+            endpoints = [
+                ModelEndpoint(model_id=model_id, kind=LLM_DEFAULT_BACKEND)
+            ]
+        paths = [
+            (e.kind, _engine(e.kind).resolve_path(e.model_name))
+            for e in endpoints
+            if e.kind in LOCAL_KINDS
+        ]
+        self._paths[model_id] = paths
+        return paths
+
+    def _preload(
+        self, model_id: int, evict: bool = False, warm: bool = False
+    ) -> int:
+        started = 0
+        for kind, path in self._local_paths(model_id):
+            if self.manager.preload(kind, path, evict=evict, warm=warm):
+                started += 1
+        return started
+
+    def _unload_inactive(self, wanted: set) -> None:
+        """Unloads idle models of inactive models (busy ones drain first)."""
+        keep = {
+            key for model_id in wanted for key in self._paths.get(model_id, [])
+        }
+        for model_id, paths in self._paths.items():
+            if model_id in wanted:
+                continue
+            for kind, path in paths:
+                if (kind, path) not in keep:
+                    self.manager.unload(kind, path)
+
+    def _report(self, wanted: set) -> None:
+        """Reports wanted models (warm or not) and still loaded ones."""
+        resident = set(self.manager.resident())
+        report = {}
+        for model_id, paths in list(self._paths.items()):
+            if model_id in wanted:
+                # No local paths: only remote endpoints, nothing to warm
+                # (a model without endpoints has the default backend's)
+                report[model_id] = all(
+                    self.manager.is_warm(kind, path) for kind, path in paths
+                )
+            elif resident.intersection(paths):
+                report[model_id] = False
+            else:
+                del self._paths[model_id]  # Fully unloaded
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.switchover_repository.report_residency(worker_id, report)
+
+    def run(self) -> int:
+        """Preloads models with queued work; returns how many started."""
+        self._last_run = time.monotonic()
+        active_ids = {model.id for model in self.model_repository.list_active()}
+        # Pending predictions of an inactive model run on the active one
+        backlog: Dict[int, int] = {
+            model_id: count
+            for model_id, count
+            in self.prediction_repository.count_pending_by_model().items()
+            if model_id in active_ids
+        }
+        # The active (default) model is always wanted
+        active = self.model_repository.get_active_model()
+        if active is not None:
+            backlog.setdefault(active.id, 0)
+        warming = []
+        if self.switchover_repository is not None:
+            warming = self.switchover_repository.list_warming_model_ids()
+        started = 0
+        for model_id in warming:
+            started += self._preload(model_id, evict=True, warm=True)
+        for model_id, _ in sorted(backlog.items(), key=lambda kv: -kv[1]):
+            started += self._preload(model_id)
+        if self.switchover_repository is not None:
+            wanted = set(backlog) | set(warming)
+            self._unload_inactive(wanted | active_ids)
+            self._report(wanted)
+        return started
+
+    def maybe_run(self) -> None:
+        """Runs at most every interval_seconds, never raises."""
+        if time.monotonic() - self._last_run < self.interval_seconds:
+            return
+        try:
+            self.run()
+        except Exception as e:
+            logging.warning(f"Residency: Backlog preload failed: {e}")
+
+    def run_forever(self) -> None:
+        while True:
+            self.maybe_run()
+            time.sleep(self.interval_seconds)
+
+    def start(self) -> None:
+        """Runs the preloader in a daemon thread of this process.
+
+        Safe to call repeatedly, also after a fork (the thread of the parent
+        does not exist in the child).
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self.run_forever, daemon=True)
+        self._thread.start()
+
+
+_manager: Optional[ModelResidencyManager] = None
+
+
+def get_residency_manager() -> ModelResidencyManager:
+    """The residency manager of this process."""
+    global _manager
+    if _manager is None:
+        _manager = ModelResidencyManager()
+    return _manager
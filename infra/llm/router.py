@@ -0,0 +1,442 @@
+# infra/llm/router.py
+# Routes generations of a model to one of its endpoints (model_endpoints
+# table): least outstanding requests weighted by observed latency, with
+# per-call timeouts, a circuit breaker per endpoint (ejected for a while and
+# probed before it comes back) and optional hedged requests.
+import asyncio
+import logging
+import math
+import os
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Tuple
+
+from core.entities.model import Model
+from core.entities.model_endpoint import ModelEndpoint
+from core.repositories.llm_backend_repository import LLMBackendRepository
+from core.repositories.model_endpoint_repository import ModelEndpointRepository
+from infra.llm.concurrency_limiter import LocalConcurrencyLimiter
+from infra.metrics import counters
+
+# Backend of models without endpoint rows: "openai" (OPENAI_BASE_URL),
+# "llama_cpp", "vllm" or "dummy"
+LLM_DEFAULT_BACKEND = os.getenv("LLM_DEFAULT_BACKEND", "openai")
+# Seconds the endpoint list of a model is cached
+LLM_ROUTER_REFRESH_SECONDS = float(os.getenv("LLM_ROUTER_REFRESH_SECONDS", "30"))
+# Consecutive failures that eject an endpoint, and for how long
+LLM_ROUTER_EJECT_FAILURES = int(os.getenv("LLM_ROUTER_EJECT_FAILURES", "3"))
+LLM_ROUTER_EJECT_SECONDS = float(os.getenv("LLM_ROUTER_EJECT_SECONDS", "30"))
+# Default per-call timeout (model_endpoints.timeout_seconds overrides it),
+# extended by LLM_TIMEOUT_PER_TOKEN_SECONDS per output token the call may
+# generate, so a long answer is not cut, retried and counted as a failure
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+LLM_TIMEOUT_PER_TOKEN_SECONDS = float(
+    os.getenv("LLM_TIMEOUT_PER_TOKEN_SECONDS", "0.25")
+)
+# Circuit breaker over the last calls of an endpoint: trips on this share
+# of errors, or of calls slower than LLM_BREAKER_SLOW_CALL_SECONDS
+LLM_BREAKER_ERROR_RATE = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+LLM_BREAKER_SLOW_CALL_SECONDS = float(
+    os.getenv("LLM_BREAKER_SLOW_CALL_SECONDS", "60")
+)
+LLM_BREAKER_SLOW_RATE = float(os.getenv("LLM_BREAKER_SLOW_RATE", "0.8"))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "10"))
+# Hedged requests: a second endpoint is tried when the first one is slower
+# than its p95 call time (needs LLM_HEDGE_MIN_SAMPLES calls of history)
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0") == "1"
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+
+@dataclass
+class EndpointState:
+    """Load and health of one endpoint as seen by this process."""
+    outstanding: int = 0 # Requests in flight
+    latency: Optional[float] = None # EWMA of seconds per generated token
+    failures: int = 0 # Consecutive failures
+    ejected_until: float = 0.0 # Monotonic time the ejection ends (breaker open)
+    # Last calls as (ok, seconds), for the breaker rates and the hedge delay
+    window: Deque[Tuple[bool, float]] = field(
+        default_factory=lambda: deque(maxlen=50)
+    )
+
+    def p95(self) -> Optional[float]:
+        """95th percentile of successful call times, None without data."""
+        times = sorted(seconds for ok, seconds in self.window if ok)
+        if not times:
+            return None
+        return times[min(len(times) - 1, math.ceil(0.95 * len(times)) - 1)]
+
+
+def endpoint_key(endpoint: ModelEndpoint) -> str:
+    """Stable name of an endpoint (also used for metrics)."""
+    if endpoint.id is not None:
+        return f"endpoint:{endpoint.id}"
+    return f"{endpoint.kind}:{endpoint.base_url or 'default'}"
+
+
+async def call_endpoint(
+    endpoint: ModelEndpoint,
+    text: str,
+    max_tokens: Optional[int],
+    cancel_event: Optional[asyncio.Event],
+) -> dict:
+    """Runs one generation on an endpoint, dispatching on its kind."""
+    from infra.llm.sidecar import (
+        LLM_SIDECAR_SOCKET, SIDECAR_KINDS, predict_via_sidecar
+    )
+    if LLM_SIDECAR_SOCKET and endpoint.kind in SIDECAR_KINDS:
+        # The model lives in the sidecar process, not in this worker
+        return await predict_via_sidecar(
+            endpoint.kind, endpoint.model_name, text, max_tokens, cancel_event
+        )
+    if endpoint.kind == "openai":
+        from infra.llm.openai_llm import predict
+        return await predict(
+            text, max_tokens=max_tokens, cancel_event=cancel_event,
+            base_url=endpoint.base_url, api_key=endpoint.api_key,
+            model_name=endpoint.model_name,
+        )
+    if endpoint.kind in ("vllm", "llama_cpp"):
+        from infra.llm.residency import get_residency_manager
+        if endpoint.kind == "vllm":
+            from infra.llm.vllm_gguf_llm import predict
+        else:
+            from infra.llm.llama_cpp_llm import predict
+        # Loaded in this worker, next to other resident models
+        async with get_residency_manager().use(
+            endpoint.kind, endpoint.model_name
+        ) as model_path:
+            return await predict(
+                text, max_tokens=max_tokens, cancel_event=cancel_event,
+                model_name=model_path,
+            )
+    if endpoint.kind == "dummy":
+        from infra.llm.dummy_llm import dummy_llm_predict
+        return await dummy_llm_predict(
+            text, max_tokens=max_tokens, cancel_event=cancel_event
+        )
+    raise ValueError(f"Unknown endpoint kind: {endpoint.kind}")
+
+
+async def check_endpoint(endpoint: ModelEndpoint) -> bool:
+    """Active health check, local engines are always considered healthy."""
+    if endpoint.kind != "openai":
+        return True
+    from infra.llm.openai_llm import check_health
+    return await check_health(endpoint.base_url, endpoint.api_key)
+
+
+class LLMRouter(LLMBackendRepository):
+    """Balances generations of each model across its endpoints.
+
+    The endpoint with the lowest (outstanding + 1) * latency wins, latency
+    being an EWMA of seconds per generated token so long and short answers
+    compare. Endpoints never measured yet get the best known latency, so
+    they receive traffic. A failed or timed out call is retried on the next
+    endpoint.
+
+    Each endpoint has a circuit breaker: it opens (the endpoint is ejected)
+    after eject_failures failures in a row, or when too many of the recent
+    calls failed or were slow. When the ejection ends the endpoint must pass
+    a health check before it gets traffic again. With hedging on, a call
+    still running after the endpoint's p95 call time gets a twin on the
+    next endpoint; the first answer wins and the other call is cancelled, so
+    only the winner's tokens are billed. State is per process.
+
+    With a limiter, calls only start on endpoints under their adaptive
+    concurrency limit (best ranked first); when all are full the call waits
+    for a free slot, at most the call timeout.
+    """
+
+    def __init__(
+        self,
+        endpoint_repository: ModelEndpointRepository,
+        refresh_seconds: float = LLM_ROUTER_REFRESH_SECONDS,
+        eject_failures: int = LLM_ROUTER_EJECT_FAILURES,
+        eject_seconds: float = LLM_ROUTER_EJECT_SECONDS,
+        ewma_alpha: float = 0.3,
+        timeout_seconds: float = LLM_TIMEOUT_SECONDS,
+        timeout_per_token_seconds: float = LLM_TIMEOUT_PER_TOKEN_SECONDS,
+        error_rate: float = LLM_BREAKER_ERROR_RATE,
+        slow_call_seconds: float = LLM_BREAKER_SLOW_CALL_SECONDS,
+        slow_rate: float = LLM_BREAKER_SLOW_RATE,
+        min_calls: int = LLM_BREAKER_MIN_CALLS,
+        hedge: bool = LLM_HEDGE,
+        hedge_min_samples: int = LLM_HEDGE_MIN_SAMPLES,
+        limiter: Optional[LocalConcurrencyLimiter] = None,
+    ):
+        self.endpoint_repository = endpoint_repository
+        self.refresh_seconds = refresh_seconds
+        self.eject_failures = eject_failures
+        self.eject_seconds = eject_seconds
+        self.ewma_alpha = ewma_alpha
+        self.timeout_seconds = timeout_seconds
+        self.timeout_per_token_seconds = timeout_per_token_seconds
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate = slow_rate
+        self.min_calls = min_calls
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.limiter = limiter
+        self._endpoints: Dict[int, Tuple[float, List[ModelEndpoint]]] = {}
+        self._states: Dict[str, EndpointState] = {}
+
+    def state(self, endpoint: ModelEndpoint) -> EndpointState:
+        return self._states.setdefault(endpoint_key(endpoint), EndpointState())
+
+    def endpoints_for(self, model: Model) -> List[ModelEndpoint]:
+        """Returns the endpoints of a model (cached for refresh_seconds)."""
+        now = time.monotonic()
+        cached = self._endpoints.get(model.id)
+        if cached is None or now - cached[0] > self.refresh_seconds:
+            endpoints = self.endpoint_repository.list_by_model(model.id)
+            if not endpoints:
+                endpoints = [ModelEndpoint(
+                    model_id=model.id, kind=LLM_DEFAULT_BACKEND
+                )]
+            cached = (now, endpoints)
+            self._endpoints[model.id] = cached
+        return cached[1]
+
+    async def rank(self, endpoints: List[ModelEndpoint]) -> List[ModelEndpoint]:
+        """Orders endpoints by expected wait, best first, ejected ones out.
+
+        If every endpoint is ejected all of them are tried anyway (better a
+        slow answer than none).
+        """
+        now = time.monotonic()
+        healthy = []
+        for endpoint in endpoints:
+            state = self.state(endpoint)
+            if state.ejected_until and state.ejected_until <= now:
+                # Ejection over, probe once before trusting it again
+                if await check_endpoint(endpoint):
+                    state.ejected_until = 0.0
+                    state.failures = 0
+                    logging.info(f"Router: {endpoint_key(endpoint)} is back.")
+                else:
+                    state.ejected_until = now + self.eject_seconds
+            if not state.ejected_until:
+                healthy.append(endpoint)
+        candidates = healthy or list(endpoints)
+        known = [
+            self.state(e).latency for e in candidates
+            if self.state(e).latency is not None
+        ]
+        default_latency = min(known) if known else 1.0
+
+        def score(endpoint: ModelEndpoint) -> Tuple[float, float]:
+            state = self.state(endpoint)
+            latency = state.latency if state.latency is not None \
+                else default_latency
+            # Random tie breaker spreads load over idle endpoints
+            return ((state.outstanding + 1) * latency, random.random())
+
+        return sorted(candidates, key=score)
+
+    def _record(
+        self, endpoint: ModelEndpoint, ok: bool, seconds: float, tokens: int
+    ) -> None:
+        state = self.state(endpoint)
+        key = endpoint_key(endpoint)
+        state.window.append((ok, seconds))
+        if ok:
+            per_token = seconds / max(tokens, 1)
+            state.latency = per_token if state.latency is None else (
+                self.ewma_alpha * per_token
+                + (1 - self.ewma_alpha) * state.latency
+            )
+            state.failures = 0
+        else:
+            state.failures += 1
+            counters.incr(f"llm_errors:{key}")
+        if state.ejected_until:
+            return
+        reason = None
+        calls = len(state.window)
+        if state.failures >= self.eject_failures:
+            reason = f"{state.failures} failures in a row"
+        elif calls >= self.min_calls:
+            errors = sum(1 for call_ok, _ in state.window if not call_ok)
+            slow = sum(
+                1 for call_ok, took in state.window
+                if call_ok and took > self.slow_call_seconds
+            )
+            if errors / calls >= self.error_rate:
+                reason = f"{errors}/{calls} recent calls failed"
+            elif slow / calls >= self.slow_rate:
+                reason = f"{slow}/{calls} recent calls slower than " \
+                    f"{self.slow_call_seconds:.0f}s"
+        if reason:
+            state.ejected_until = time.monotonic() + self.eject_seconds
+            state.window.clear()
+            counters.incr(f"llm_ejections:{key}")
+            logging.warning(
+                f"Router: Ejected {key} for {self.eject_seconds:.0f}s: {reason}."
+            )
+
+    def _timeout(
+        self, endpoint: ModelEndpoint, max_tokens: Optional[int] = None
+    ) -> float:
+        """Call timeout, longer for calls allowed to generate more tokens."""
+        timeout = endpoint.timeout_seconds or self.timeout_seconds
+        return timeout + (max_tokens or 0) * self.timeout_per_token_seconds
+
+    async def _acquire(
+        self, queue: List[ModelEndpoint], wait: bool,
+        max_tokens: Optional[int] = None,
+    ) -> Optional[Tuple[ModelEndpoint, Optional[str]]]:
+        """Takes the best endpoint of `queue` with a free concurrency slot.
+
+        Returns:
+            The endpoint (removed from `queue`) and its limiter token, or
+            None if all are full and `wait` is False.
+        """
+        if self.limiter is None:
+            return queue.pop(0), None
+        deadline = time.monotonic() + self._timeout(queue[0])
+        while True:
+            for endpoint in queue:
+                # The slot is leased for the whole call
+                token = self.limiter.try_acquire(
+                    endpoint_key(endpoint),
+                    self._timeout(endpoint, max_tokens) + 30,
+                )
+                if token:
+                    queue.remove(endpoint)
+                    return endpoint, token
+            if not wait:
+                return None
+            if time.monotonic() > deadline:
+                raise TimeoutError(
+                    "All LLM endpoints are at their concurrency limit."
+                )
+            await asyncio.sleep(0.05)
+
+    async def _attempt(
+        self,
+        endpoint: ModelEndpoint,
+        token: Optional[str],
+        text: str,
+        max_tokens: Optional[int],
+        cancel_event: Optional[asyncio.Event],
+    ) -> dict:
+        """One call to an endpoint with its timeout and bookkeeping."""
+        state = self.state(endpoint)
+        timeout = self._timeout(endpoint, max_tokens)
+        state.outstanding += 1
+        started = time.monotonic()
+        # Limiter feedback: seconds per token, or failed
+        latency = None
+        failed = False
+        try:
+            result = await asyncio.wait_for(
+                call_endpoint(endpoint, text, max_tokens, cancel_event),
+                timeout,
+            )
+        except asyncio.CancelledError:
+            raise  # Lost a hedge race (or the job was cancelled)
+        except asyncio.TimeoutError:
+            failed = True
+            self._record(endpoint, False, time.monotonic() - started, 0)
+            raise TimeoutError(
+                f"{endpoint_key(endpoint)} timed out after {timeout:.0f}s"
+            )
+        except Exception:
+            failed = True
+            self._record(endpoint, False, time.monotonic() - started, 0)
+            raise
+        else:
+            seconds = time.monotonic() - started
+            tokens = result.get("output_tokens") or 0
+            latency = seconds / max(tokens, 1)
+            self._record(endpoint, True, seconds, tokens)
+            return result
+        finally:
+            state.outstanding -= 1
+            if token is not None:
+                self.limiter.release(
+                    endpoint_key(endpoint), token, latency, failed
+                )
+
+    def _hedge_delay(self, endpoint: ModelEndpoint) -> Optional[float]:
+        state = self.state(endpoint)
+        if sum(1 for ok, _ in state.window if ok) < self.hedge_min_samples:
+            return None
+        return state.p95()
+
+    async def predict(
+        self,
+        model: Model,
+        text: str,
+        max_tokens: Optional[int] = None,
+        cancel_event: Optional[asyncio.Event] = None,
+    ) -> dict:
+        queue = await self.rank(self.endpoints_for(model))
+        running: Dict[asyncio.Task, ModelEndpoint] = {}
+        last_error: Optional[Exception] = None
+        hedged = False
+
+        async def start_next(wait: bool) -> bool:
+            acquired = await self._acquire(queue, wait, max_tokens)
+            if acquired is None:
+                return False
+            endpoint, token = acquired
+            task = asyncio.ensure_future(self._attempt(
+                endpoint, token, text, max_tokens, cancel_event
+            ))
+            running[task] = endpoint
+            return True
+
+        try:
+            while queue or running:
+                if not running:
+                    if cancel_event is not None and cancel_event.is_set():
+                        break
+                    await start_next(wait=True)
+                delay = None
+                if self.hedge and not hedged and queue and len(running) == 1:
+                    delay = self._hedge_delay(next(iter(running.values())))
+                done, _ = await asyncio.wait(
+                    running, timeout=delay,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    # Slower than its p95: race a twin on the next endpoint
+                    # (only if one has a free slot, hedges never queue)
+                    hedged = True
+                    if await start_next(wait=False):
+                        counters.incr("llm_hedges")
+                        logging.info(
+                            f"Router: Hedged after {delay:.2f}s."
+                        )
+                    continue
+                for task in done:
+                    endpoint = running.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        if hedged:
+                            counters.incr(
+                                f"llm_hedge_wins:{endpoint_key(endpoint)}"
+                            )
+                        return task.result()
+                    logging.warning(
+                        f"Router: {endpoint_key(endpoint)} failed: {error}"
+                    )
+                    last_error = error
+        finally:
+            # The losing twin is cancelled, its tokens are never billed
+            for task in running:
+                task.cancel()
+        if last_error is not None:
+            raise last_error
+        # Cancelled before any endpoint was called
+        return {
+            "output_text": "",
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "finish_reason": "cancelled",
+        }
@@ -0,0 +1,263 @@
+# infra/llm/sidecar.py
+# Local inference sidecar: one long-lived process owns the local engines
+# (vllm, llama_cpp) and all worker processes send it requests over a Unix
+# socket, so the model is loaded once per box instead of once per Celery
+# child. Requests of all workers for the same vLLM model are batched into
+# one generate call.
+#
+# Protocol: one connection per request, newline-delimited JSON. The client
+# sends the request, optionally {"cancel": true} later (or just closes the
+# connection), and reads one {"result": ...} or {"error": ...} line.
+import asyncio
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from infra.llm.residency import BacklogPreloader, get_residency_manager
+
+# Socket of the sidecar; when set, workers send local engine calls to it
+LLM_SIDECAR_SOCKET = os.getenv("LLM_SIDECAR_SOCKET", "")
+# Time a batch waits for more requests, and its maximum size
+LLM_SIDECAR_BATCH_WINDOW_MS = float(
+    os.getenv("LLM_SIDECAR_BATCH_WINDOW_MS", "10")
+)
+LLM_SIDECAR_MAX_BATCH = int(os.getenv("LLM_SIDECAR_MAX_BATCH", "16"))
+
+# Engines served by the sidecar
+SIDECAR_KINDS = ("vllm", "llama_cpp")
+# Generated answers can be long, raise the asyncio line limit
+_LINE_LIMIT = 2 ** 24
+
+_CANCELLED = {
+    "output_text": "",
+    "input_tokens": 0,
+    "output_tokens": 0,
+    "finish_reason": "cancelled",
+}
+
+
+@dataclass
+class _Job:
+    """A request waiting in the sidecar."""
+    kind: str
+    model_name: Optional[str]
+    text: str
+    max_tokens: Optional[int]
+    future: asyncio.Future
+    cancel_event: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class InferenceSidecar:
+    """Serves local engine calls of all workers over a Unix socket."""
+
+    def __init__(
+        self,
+        socket_path: str,
+        batch_window_ms: float = LLM_SIDECAR_BATCH_WINDOW_MS,
+        max_batch: int = LLM_SIDECAR_MAX_BATCH,
+        preloader: Optional[BacklogPreloader] = None,
+    ):
+        self.socket_path = socket_path
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch = max_batch
+        self._pending: Dict[str, List[_Job]] = {}
+        self._runners: Dict[str, asyncio.Task] = {}
+        # Models kept loaded side by side, LRU evicted over the budget
+        self.residency = get_residency_manager()
+        self.preloader = preloader
+
+    def _submit(self, job: _Job) -> None:
+        if job.kind != "vllm":
+            # llama_cpp runs sequences concurrently on its context pool
+            asyncio.ensure_future(self._run_single(job))
+            return
+        key = job.model_name or ""
+        self._pending.setdefault(key, []).append(job)
+        if key not in self._runners:
+            self._runners[key] = asyncio.ensure_future(self._run_batches(key))
+
+    async def _run_single(self, job: _Job) -> None:
+        try:
+            if job.kind != "llama_cpp":
+                raise ValueError(f"Sidecar does not serve kind: {job.kind}")
+            from infra.llm.llama_cpp_llm import predict
+            async with self.residency.use(job.kind, job.model_name) as path:
+                result = await predict(
+                    job.text, max_tokens=job.max_tokens,
+                    cancel_event=job.cancel_event, model_name=path,
+                )
+            if not job.future.done():
+                job.future.set_result(result)
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+
+    async def _run_batches(self, key: str) -> None:
+        """Runs the waiting requests of one vLLM model, batch by batch.
+
+        Requests arriving while a batch generates form the next batch.
+        """
+        from infra.llm.vllm_gguf_llm import predict_batch
+        try:
+            while self._pending.get(key):
+                if len(self._pending[key]) < self.max_batch:
+                    # Let concurrent requests join the batch
+                    await asyncio.sleep(self.batch_window)
+                jobs = self._pending[key][:self.max_batch]
+                del self._pending[key][:self.max_batch]
+                live = []
+                for job in jobs:
+                    if job.cancel_event.is_set():
+                        job.future.set_result(dict(_CANCELLED))
+                    else:
+                        live.append(job)
+                if not live:
+                    continue
+                logging.info(f"Sidecar: Generating a batch of {len(live)}.")
+                try:
+                    async with self.residency.use("vllm", key or None) as path:
+                        results = await asyncio.to_thread(
+                            predict_batch,
+                            [job.text for job in live],
+                            [job.max_tokens for job in live],
+                            path,
+                        )
+                except Exception as e:
+                    for job in live:
+                        if not job.future.done():
+                            job.future.set_exception(e)
+                    continue
+                for job, result in zip(live, results):
+                    if not job.future.done():
+                        job.future.set_result(result)
+        finally:
+            del self._runners[key]
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        watcher = None
+        try:
+            request = json.loads(await reader.readline())
+            job = _Job(
+                kind=request["kind"],
+                model_name=request.get("model_name"),
+                text=request["text"],
+                max_tokens=request.get("max_tokens"),
+                future=asyncio.get_running_loop().create_future(),
+            )
+
+            async def watch() -> None:
+                # A cancel line or a closed connection stops the request
+                line = await reader.readline()
+                if not line or json.loads(line).get("cancel"):
+                    job.cancel_event.set()
+
+            watcher = asyncio.ensure_future(watch())
+            self._submit(job)
+            try:
+                reply = {"result": await job.future}
+            except Exception as e:
+                reply = {"error": str(e)}
+            writer.write((json.dumps(reply) + "\n").encode("utf-8"))
+            await writer.drain()
+        except Exception as e:
+            logging.warning(f"Sidecar: Request failed: {e}")
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            writer.close()
+
+    async def serve(self) -> None:
+        """Listens on the socket until cancelled."""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)  # Stale socket of a previous run
+        server = await asyncio.start_unix_server(
+            self._handle, path=self.socket_path, limit=_LINE_LIMIT
+        )
+        logging.info(f"Sidecar: Listening on {self.socket_path}")
+        if self.preloader is not None:
+            # Loads models of queued predictions and switchovers ahead
+            self.preloader.start()
+        async with server:
+            await server.serve_forever()
+
+
+async def predict_via_sidecar(
+    kind: str,
+    model_name: Optional[str],
+    text: str,
+    max_tokens: Optional[int] = None,
+    cancel_event: Optional[asyncio.Event] = None,
+    socket_path: str = LLM_SIDECAR_SOCKET,
+) -> dict:
+    """Runs a local engine call in the sidecar (worker side)."""
+    reader, writer = await asyncio.open_unix_connection(
+        socket_path, limit=_LINE_LIMIT
+    )
+    read = None
+    try:
+        request = {
+            "kind": kind,
+            "model_name": model_name,
+            "text": text,
+            "max_tokens": max_tokens,
+        }
+        writer.write((json.dumps(request) + "\n").encode("utf-8"))
+        await writer.drain()
+        read = asyncio.ensure_future(reader.readline())
+        if cancel_event is not None:
+            waiter = asyncio.ensure_future(cancel_event.wait())
+            try:
+                await asyncio.wait(
+                    {read, waiter}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not read.done():
+                    # Ask for the partial answer instead of dropping it
+                    writer.write(b'{"cancel": true}\n')
+                    await writer.drain()
+            finally:
+                waiter.cancel()
+        line = await read
+    finally:
+        if read is not None and not read.done():
+            read.cancel()
+        # Closing also cancels the request in the sidecar
+        writer.close()
+    if not line:
+        raise ConnectionError("Inference sidecar closed the connection.")
+    reply = json.loads(line)
+    if "error" in reply:
+        raise RuntimeError(f"Inference sidecar: {reply['error']}")
+    return reply["result"]
+
+
+def main() -> None:
+    """Starts the sidecar on LLM_SIDECAR_SOCKET."""
+    if not LLM_SIDECAR_SOCKET:
+        raise SystemExit("Set LLM_SIDECAR_SOCKET to the socket path to serve.")
+    from infra.db.model_endpoint_repository_impl import (
+        PostgreSQLModelEndpointRepository
+    )
+    from infra.db.model_repository_impl import PostgreSQLModelRepository
+    from infra.db.model_switchover_repository_impl import (
+        PostgreSQLModelSwitchoverRepository
+    )
+    from infra.db.prediction_repository_impl import (
+        PostgreSQLPredictionRepository
+    )
+    preloader = BacklogPreloader(
+        get_residency_manager(),
+        PostgreSQLPredictionRepository(),
+        PostgreSQLModelRepository(),
+        PostgreSQLModelEndpointRepository(),
+        PostgreSQLModelSwitchoverRepository(),
+    )
+    try:
+        asyncio.run(InferenceSidecar(
+            LLM_SIDECAR_SOCKET, preloader=preloader
+        ).serve())
+    except KeyboardInterrupt:
+        logging.info("Sidecar: Stopped by user (KeyboardInterrupt).")
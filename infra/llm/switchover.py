@@ -0,0 +1,52 @@
+# infra/llm/switchover.py
+# Operator command to change the active model without load stalls:
+#   python switch_model.py <model name> [--warm-timeout S] [--drain-timeout S]
+import argparse
+import logging
+import os
+
+from core.use_cases.model_switchover_use_cases import ModelSwitchoverUseCases
+from infra.db.model_repository_impl import PostgreSQLModelRepository
+from infra.db.model_switchover_repository_impl import (
+    PostgreSQLModelSwitchoverRepository
+)
+from infra.llm.residency import LLM_RESIDENCY_HEARTBEAT_SECONDS
+
+# Time the workers get to load and warm the new model
+MODEL_SWITCHOVER_WARM_TIMEOUT_SECONDS = float(
+    os.getenv("MODEL_SWITCHOVER_WARM_TIMEOUT_SECONDS", "600")
+)
+# Time the old model gets to finish its running requests
+MODEL_SWITCHOVER_DRAIN_TIMEOUT_SECONDS = float(
+    os.getenv("MODEL_SWITCHOVER_DRAIN_TIMEOUT_SECONDS", "600")
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Switch the active model.")
+    parser.add_argument("model", help="Name of the model to activate")
+    parser.add_argument(
+        "--warm-timeout", type=float,
+        default=MODEL_SWITCHOVER_WARM_TIMEOUT_SECONDS,
+    )
+    parser.add_argument(
+        "--drain-timeout", type=float,
+        default=MODEL_SWITCHOVER_DRAIN_TIMEOUT_SECONDS,
+    )
+    args = parser.parse_args()
+
+    model_repo = PostgreSQLModelRepository()
+    model = model_repo.get_by_name(args.model)
+    if model is None:
+        raise SystemExit(f"Model '{args.model}' not found.")
+    use_cases = ModelSwitchoverUseCases(
+        model_repository=model_repo,
+        switchover_repository=PostgreSQLModelSwitchoverRepository(),
+        heartbeat_seconds=LLM_RESIDENCY_HEARTBEAT_SECONDS,
+    )
+    switchover = use_cases.switch(
+        model.id, args.warm_timeout, args.drain_timeout
+    )
+    logging.info(f"Switchover {switchover.id}: {switchover.status}")
+    if switchover.status != 'completed':
+        raise SystemExit(1)
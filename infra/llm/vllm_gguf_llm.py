@@ -5,9 +5,13 @@ vLLM too bad for gguf's...
 Much consuming memory
 """
 
+import asyncio
 import os
+import threading
 from vllm import LLM, SamplingParams
 
+from config.settings import SYSTEM_PROMPT
+
 ## NOTE
 # qwen3 gguf NOT SUPPORTED in vllm 0.8.5.post1 =(
 # _MODEL_PATH =  "/workspace/model_weights/LLM/gguf/lmstudio-community/Qwen3-0.6B-GGUF/Qwen3-0.6B-Q4_K_M.gguf"  # os.getenv("LLM_MODEL_PATH", "path/to/qwen3_quant.gguf")
@@ -16,36 +20,160 @@ _MODEL_PATH = "/workspace/model_weights/LLM/gguf/lmstudio-community/Qwen2.5-1.5B
 
 
 _client = None
+# Loaded engines by model path
+_engines: dict = {}
+_engines_lock = threading.Lock()
+# One call at a time per engine, the offline vLLM engine is not thread-safe
+# (worker coroutines and the residency warm-up run in different threads)
+_engine_locks: dict = {}
+# Share of GPU memory one engine takes; lower it to keep several models
+VLLM_GPU_MEMORY_UTILIZATION = float(
+    os.getenv("VLLM_GPU_MEMORY_UTILIZATION", "0.9")
+)
+
+
+def resolve_path(model_name: str | None = None) -> str:
+    return model_name or _MODEL_PATH
+
+
+def load(model_path: str) -> None:
+    """Loads an engine (blocking), no-op if it is already loaded."""
+    if model_path in _engines:
+        return
+    with _engines_lock:  # Never two engines loading on one GPU at once
+        _engine_locks.setdefault(model_path, threading.Lock())
+        if model_path not in _engines:
+            _engines[model_path] = LLM(
+                model=model_path,
+                gpu_memory_utilization=VLLM_GPU_MEMORY_UTILIZATION,
+            )
+
+
+def unload(model_path: str) -> None:
+    """Frees an engine and its GPU memory (best effort)."""
+    # Waits for a running generation of the engine
+    with _engine_locks.get(model_path, threading.Lock()):
+        engine = _engines.pop(model_path, None)
+    if engine is None:
+        return
+    del engine
+    import gc
+    gc.collect()
+    try:
+        import torch
+        torch.cuda.empty_cache()
+    except Exception:
+        pass
+
+
+def _chat(model_path: str, conversations, params):
+    """Runs one chat call on a loaded engine (blocking, serialized)."""
+    with _engine_locks[model_path]:
+        return _engines[model_path].chat(conversations, params)
 
-async def predict(text: str) -> dict:
-    """Runs a Qwen3 quantized gguf model via vLLM."""
-    global _client
-    if _client is None:
-        _client = LLM(model=_MODEL_PATH)
-    params = SamplingParams()
+async def predict(
+    text: str,
+    max_tokens: int | None = None,
+    cancel_event: asyncio.Event | None = None,
+    model_name: str | None = None,
+) -> dict:
+    """Runs a Qwen3 quantized gguf model via vLLM.
+
+    Args:
+        max_tokens: Upper bound of generated tokens (None: vLLM default).
+        cancel_event: Checked before generation only, the offline vLLM
+            call cannot be aborted once started.
+        model_name: Path of the gguf weights (None: _MODEL_PATH).
+    """
+    if cancel_event is not None and cancel_event.is_set():
+        return {
+            "output_text": "",
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "finish_reason": "cancelled",
+        }
+    model_path = resolve_path(model_name)
+    load(model_path)
+    _client = _engines[model_path]
+    params = SamplingParams() if max_tokens is None else SamplingParams(
+        max_tokens=max_tokens
+    )
     conversation = [
     {
         "role": "system",
-        "content": "You are a helpful assistant"
+        "content": SYSTEM_PROMPT
     },
     {
         "role": "user",
         "content": text
     },
     ]
-    outputs = _client.chat(conversation, params)
+    # vLLM offline API is blocking, keep the event loop free
+    outputs = await asyncio.to_thread(_chat, model_path, conversation, params)
     _client.generate
     output_text = ""
+    finish_reason = None
+    input_tokens = 0
+    output_tokens = 0
     for output in outputs:
         # prompt = output.prompt
         generated_text = output.outputs[0].text
         output_text += generated_text
-    input_tokens = len(text.split())
-    output_tokens = len(output_text.split())
+        finish_reason = output.outputs[0].finish_reason
+        # Real token counts (billed and compared with max_tokens), as in
+        # predict_batch()
+        input_tokens += len(output.prompt_token_ids or [])
+        output_tokens += len(output.outputs[0].token_ids)
+    if not input_tokens:
+        input_tokens = len(text.split())
     # Generate response asynchronously
     return {
         "output_text": output_text,
         "input_tokens": input_tokens,
         "output_tokens": output_tokens,
+        "finish_reason": finish_reason,  # "length" if cut by max_tokens
     }
 
+
+
+def predict_batch(
+    texts: list,
+    max_tokens: list,
+    model_name: str | None = None,
+) -> list:
+    """Runs several prompts in one batched vLLM call (blocking).
+
+    Used by the inference sidecar to batch requests of all workers.
+
+    Args:
+        texts: User prompts.
+        max_tokens: Token cap per prompt (None entries: vLLM default).
+        model_name: Path of the gguf weights (None: _MODEL_PATH).
+
+    Returns:
+        list: One result dict per prompt, in order.
+    """
+    model_path = resolve_path(model_name)
+    load(model_path)
+    conversations = [
+        [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": text},
+        ]
+        for text in texts
+    ]
+    params = [
+        SamplingParams() if limit is None else SamplingParams(max_tokens=limit)
+        for limit in max_tokens
+    ]
+    outputs = _chat(model_path, conversations, params)
+    results = []
+    for text, output in zip(texts, outputs):
+        completion = output.outputs[0]
+        results.append({
+            "output_text": completion.text,
+            "input_tokens": len(output.prompt_token_ids or []) or len(text.split()),
+            "output_tokens": len(completion.token_ids),
+            "finish_reason": completion.finish_reason,
+        })
+    return results
@@ -0,0 +1,59 @@
+# infra/metrics/counters.py
+# Simple named counters shared by API, bot and workers.
+# Stored in a Redis hash when REDIS_URL is set (so all processes add up),
+# otherwise kept in this process only.
+import logging
+import threading
+from typing import Dict
+
+from config.settings import REDIS_URL
+
+try:
+    import redis
+except ImportError:  # Redis client is optional for single-node installs
+    redis = None
+
+METRICS_KEY = "sbllm:metrics"
+
+_lock = threading.Lock()
+_local: Dict[str, float] = {}
+_redis_client = None
+
+
+def _get_redis():
+    """Returns the shared Redis client, or None for in-process counters."""
+    global _redis_client
+    if _redis_client is None and REDIS_URL and redis is not None:
+        _redis_client = redis.Redis.from_url(REDIS_URL)
+    return _redis_client
+
+
+def incr(name: str, amount: float = 1) -> None:
+    """Adds `amount` to the counter `name`. Never raises."""
+    client = _get_redis()
+    if client is not None:
+        try:
+            client.hincrbyfloat(METRICS_KEY, name, amount)
+            return
+        except Exception as e:
+            logging.warning(f"Metrics: Redis unavailable ({e}), counting locally.")
+    with _lock:
+        _local[name] = _local.get(name, 0) + amount
+
+
+def snapshot() -> Dict[str, float]:
+    """Returns all counters (Redis ones merged with local fallbacks)."""
+    values: Dict[str, float] = {}
+    client = _get_redis()
+    if client is not None:
+        try:
+            values = {
+                k.decode(): float(v)
+                for k, v in client.hgetall(METRICS_KEY).items()
+            }
+        except Exception as e:
+            logging.warning(f"Metrics: Redis unavailable ({e}).")
+    with _lock:
+        for name, value in _local.items():
+            values[name] = values.get(name, 0) + value
+    return values
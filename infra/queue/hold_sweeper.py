@@ -0,0 +1,86 @@
+# infra/queue/hold_sweeper.py
+# Releases the holds of predictions whose job was lost: jobs of the
+# in-process queue pending at a restart, Celery messages lost without
+# fair-share, running jobs of a crashed worker nobody reclaimed. Every worker
+# sweeps every HOLD_SWEEP_SECONDS; the sweeps skip each other's rows.
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from config.settings import PREDICTION_LEASE_SECONDS
+from core.repositories.prediction_repository import PredictionRepository
+
+# How often each worker sweeps (0: never)
+HOLD_SWEEP_SECONDS = float(os.getenv("HOLD_SWEEP_SECONDS", "300"))
+# A running prediction is lost once its lease expired this long ago (the
+# Postgres queue reclaims it within a poll, Celery redelivers it)
+HOLD_SWEEP_LEASE_GRACE_SECONDS = float(os.getenv(
+    "HOLD_SWEEP_LEASE_GRACE_SECONDS", str(PREDICTION_LEASE_SECONDS)
+))
+# A pending prediction without deadline is lost after waiting this long
+# (empty: only the deadline ends it)
+HOLD_SWEEP_MAX_PENDING_SECONDS = (
+    float(os.getenv("HOLD_SWEEP_MAX_PENDING_SECONDS", "86400"))
+    if os.getenv("HOLD_SWEEP_MAX_PENDING_SECONDS", "86400") else None
+)
+# Predictions ended per transaction
+HOLD_SWEEP_BATCH_SIZE = int(os.getenv("HOLD_SWEEP_BATCH_SIZE", "500"))
+
+
+class HoldSweeper:
+    """Releases the holds of lost predictions periodically in a daemon
+    thread."""
+
+    def __init__(
+        self,
+        prediction_repository: PredictionRepository,
+        interval_seconds: float = HOLD_SWEEP_SECONDS,
+        lease_grace_seconds: float = HOLD_SWEEP_LEASE_GRACE_SECONDS,
+        max_pending_seconds: Optional[float] = HOLD_SWEEP_MAX_PENDING_SECONDS,
+        batch_size: int = HOLD_SWEEP_BATCH_SIZE,
+    ):
+        self.prediction_repository = prediction_repository
+        self.interval_seconds = interval_seconds
+        self.lease_grace_seconds = lease_grace_seconds
+        self.max_pending_seconds = max_pending_seconds
+        self.batch_size = batch_size
+        self._thread: Optional[threading.Thread] = None
+
+    def sweep(self) -> int:
+        """Ends every lost prediction, batch by batch.
+
+        Returns:
+            int: The number of predictions ended.
+        """
+        swept = 0
+        while True:
+            ended = self.prediction_repository.release_lost_holds(
+                self.lease_grace_seconds, self.max_pending_seconds,
+                self.batch_size,
+            )
+            swept += ended
+            if ended < self.batch_size:
+                return swept
+
+    def run_forever(self) -> None:
+        while True:
+            try:
+                swept = self.sweep()
+                if swept:
+                    logging.warning(
+                        f"Holds: Released the holds of {swept} lost "
+                        f"prediction(s)"
+                    )
+            except Exception as e:
+                # Retried next time, the holds only wait longer
+                logging.warning(f"Holds: Sweep failed: {e}")
+            time.sleep(self.interval_seconds)
+
+    def start(self) -> None:
+        """Starts the sweeper thread of this process (also after a fork)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self.run_forever, daemon=True)
+        self._thread.start()
@@ -0,0 +1,102 @@
+# filepath: infra/queue/inprocess_queue.py
+# In-process queue backend for single-node installs: the prediction pipeline
+# runs in background asyncio tasks of the submitting process (API or bot),
+# no Redis and no separate worker. The tasks run on an event loop of their
+# own in a daemon thread, so their blocking database and Redis calls never
+# stall the API's loop. Jobs still pending when the process stops are not
+# resumed.
+import asyncio
+import logging
+import os
+import threading
+
+from infra.queue.worker_use_cases import (
+    build_background_jobs,
+    build_llm_use_cases,
+)
+
+# Predictions processed at the same time inside this process
+INPROCESS_QUEUE_CONCURRENCY = int(
+    os.getenv("INPROCESS_QUEUE_CONCURRENCY", "2")
+)
+
+use_cases = build_llm_use_cases()
+background_jobs = build_background_jobs()
+
+_queue: asyncio.Queue | None = None
+_loop: asyncio.AbstractEventLoop | None = None
+_thread: threading.Thread | None = None
+_workers: list = []
+_start_lock = threading.Lock()
+
+
+async def _worker(worker_id: int) -> None:
+    """Takes jobs from the in-process queue one by one."""
+    while True:
+        prediction_id, user_id, input_text = await _queue.get()
+        try:
+            result = await use_cases.create_prediction(
+                prediction_id=prediction_id,
+                user_id=user_id,
+                input_text=input_text,
+            )
+            if result:
+                logging.info(
+                    f"In-process worker {worker_id}: "
+                    f"Completed prediction {result.id}"
+                )
+        except Exception as e:
+            # create_prediction already marked the prediction as failed
+            logging.exception(
+                "In-process worker Error: Failed prediction %s: %s",
+                prediction_id, e
+            )
+        finally:
+            _queue.task_done()
+
+
+def _run_loop(started: threading.Event) -> None:
+    """Runs the worker tasks on this thread's own event loop."""
+    global _queue, _loop, _workers
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    _loop = loop
+    _queue = asyncio.Queue()
+    _workers = [
+        loop.create_task(_worker(i))
+        for i in range(INPROCESS_QUEUE_CONCURRENCY)
+    ]
+    started.set()
+    loop.run_forever()
+
+
+def _ensure_started() -> None:
+    """Starts the worker thread (once per process, also after a fork)."""
+    global _thread
+    with _start_lock:
+        if _thread is not None and _thread.is_alive():
+            return
+        for job in background_jobs:
+            job.start()
+        started = threading.Event()
+        _thread = threading.Thread(
+            target=_run_loop, args=(started,), daemon=True
+        )
+        _thread.start()
+        started.wait()
+    logging.info(
+        f"In-process queue started with "
+        f"{INPROCESS_QUEUE_CONCURRENCY} worker(s)."
+    )
+
+
+def submit(prediction_id: int, user_id: int, input_text: str) -> None:
+    """Queues a prediction for background processing in this process.
+
+    Can be called from any thread or event loop (FastAPI endpoint, bot
+    handler), the job runs on the worker thread.
+    """
+    _ensure_started()
+    _loop.call_soon_threadsafe(
+        _queue.put_nowait, (prediction_id, user_id, input_text)
+    )
@@ -0,0 +1,73 @@
+# filepath: infra/queue/pg_queue.py
+# Postgres-native queue backend: workers claim pending predictions directly
+# from the predictions table with FOR UPDATE SKIP LOCKED (no Redis needed).
+import asyncio
+import logging
+import os
+
+from config.settings import PREDICTION_LEASE_SECONDS
+from infra.db.prediction_repository_impl import PostgreSQLPredictionRepository
+from infra.queue.worker_use_cases import (
+    build_background_jobs,
+    build_llm_use_cases,
+)
+
+# Predictions claimed (and processed concurrently) per round trip
+PG_QUEUE_BATCH_SIZE = int(os.getenv("PG_QUEUE_BATCH_SIZE", "4"))
+# A claimed job not finished within the lease is claimed again
+PG_QUEUE_LEASE_SECONDS = PREDICTION_LEASE_SECONDS
+# Sleep between polls when the queue is empty
+PG_QUEUE_POLL_SECONDS = float(os.getenv("PG_QUEUE_POLL_SECONDS", "1.0"))
+
+
+pred_repo = PostgreSQLPredictionRepository()
+use_cases = build_llm_use_cases()
+background_jobs = build_background_jobs()
+
+
+async def _process_claimed(prediction) -> None:
+    """Runs the prediction pipeline for one claimed prediction."""
+    try:
+        result = await use_cases.create_prediction(
+            prediction_id=prediction.id,
+            user_id=prediction.user_id,
+            input_text=prediction.input_text,
+            claim_token=prediction.claim_token,
+        )
+        if result is None:
+            return
+        logging.info(f"PG Worker: Completed prediction {prediction.id}")
+    except Exception as e:
+        # create_prediction already marked the prediction as failed
+        logging.exception(
+            "PG Worker Error: Failed prediction %s: %s", prediction.id, e
+        )
+
+
+async def run_worker(stop_event: asyncio.Event | None = None) -> None:
+    """Claims and processes batches of pending predictions until stopped."""
+    logging.info(
+        f"PG Worker: Started (batch={PG_QUEUE_BATCH_SIZE}, "
+        f"lease={PG_QUEUE_LEASE_SECONDS}s)"
+    )
+    # Model preloading (warms up models of the backlog before their jobs
+    # are claimed) and batched settlement
+    for job in background_jobs:
+        job.start()
+    while stop_event is None or not stop_event.is_set():
+        batch = pred_repo.claim_pending(
+            PG_QUEUE_BATCH_SIZE, PG_QUEUE_LEASE_SECONDS
+        )
+        if not batch:
+            await asyncio.sleep(PG_QUEUE_POLL_SECONDS)
+            continue
+        logging.info(f"PG Worker: Claimed {len(batch)} prediction(s)")
+        await asyncio.gather(*(_process_claimed(p) for p in batch))
+
+
+def main() -> None:
+    """Starts a Postgres queue worker in a fresh event loop."""
+    try:
+        asyncio.run(run_worker())
+    except KeyboardInterrupt:
+        logging.info("PG Worker: Stopped by user (KeyboardInterrupt).")
@@ -0,0 +1,140 @@
+# filepath: infra/queue/pg_queue_benchmark.py
+"""
+Throughput benchmark for the Postgres queue backend.
+
+Inserts synthetic pending predictions, then several worker threads claim them
+with `claim_pending` (FOR UPDATE SKIP LOCKED) and mark them completed without
+calling any LLM. Reports claimed jobs per second for each batch size.
+
+Usage:
+    python -m infra.queue.pg_queue_benchmark --jobs 5000 --workers 8 --batch 1 10 50
+"""
+import argparse
+import threading
+import time
+import uuid
+
+from psycopg2.extras import execute_values
+
+from infra.db.initialize_db import get_db_connection
+from infra.db.prediction_repository_impl import PostgreSQLPredictionRepository
+
+BENCH_PREFIX = "bench-"
+
+
+def _count_foreign_pending(cursor) -> int:
+    """Counts claimable predictions that are not ours."""
+    cursor.execute(
+        "SELECT COUNT(*) FROM predictions "
+        "WHERE status IN ('pending', 'processing') AND uuid NOT LIKE %s",
+        (BENCH_PREFIX + "%",)
+    )
+    return cursor.fetchone()[0]
+
+
+def _insert_jobs(jobs: int) -> None:
+    """Inserts `jobs` synthetic pending predictions."""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM users ORDER BY id LIMIT 1")
+        user_id = cursor.fetchone()[0]
+        cursor.execute("SELECT id FROM models ORDER BY id LIMIT 1")
+        model_id = cursor.fetchone()[0]
+        execute_values(
+            cursor,
+            "INSERT INTO predictions (uuid, user_id, model_id, input_text, "
+            "status) VALUES %s",
+            [
+                (f"{BENCH_PREFIX}{uuid.uuid4()}", user_id, model_id,
+                 "benchmark", "pending")
+                for _ in range(jobs)
+            ],
+            page_size=1000,
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _cleanup() -> None:
+    """Deletes all synthetic predictions."""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "DELETE FROM predictions WHERE uuid LIKE %s",
+            (BENCH_PREFIX + "%",)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _worker(repo, batch: int, lease: int, done: list) -> None:
+    """Claims and completes jobs until the queue is drained."""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        while True:
+            claimed = repo.claim_pending(batch, lease)
+            if not claimed:
+                return
+            cursor.execute(
+                "UPDATE predictions SET status = 'completed', "
+                "completed_at = NOW() WHERE id = ANY(%s)",
+                ([p.id for p in claimed],)
+            )
+            conn.commit()
+            done.append(len(claimed))
+    finally:
+        conn.close()
+
+
+def run(jobs: int, workers: int, batch: int, lease: int = 60) -> float:
+    """Runs one benchmark round and returns claimed jobs per second."""
+    _insert_jobs(jobs)
+    repo = PostgreSQLPredictionRepository()
+    done: list = []
+    threads = [
+        threading.Thread(target=_worker, args=(repo, batch, lease, done))
+        for _ in range(workers)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    _cleanup()
+    return sum(done) / elapsed if elapsed > 0 else 0.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 10, 50])
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    try:
+        foreign = _count_foreign_pending(conn.cursor())
+    finally:
+        conn.close()
+    if foreign:
+        # Claiming is not filtered, real jobs would be "completed" by us
+        print(
+            f"Refusing to run: {foreign} real pending/processing "
+            f"prediction(s) in the database."
+        )
+        return
+
+    print(f"jobs={args.jobs} workers={args.workers}")
+    for batch in args.batch:
+        rate = run(args.jobs, args.workers, batch)
+        print(f"batch={batch:<4} {rate:10.1f} jobs/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# infra/queue/settlement.py
+# Batched balance settlement (BALANCE_SETTLEMENT=batched): workers buffer
+# charges in Redis and a flusher thread in every worker process settles
+# them every SETTLEMENT_FLUSH_SECONDS, one balance update per user per
+# batch. Flushers of different processes take turns on a Postgres row lock.
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from config.settings import REDIS_URL
+from core.use_cases.settlement_use_cases import SettlementUseCases
+from infra.cache.charge_buffer import RedisChargeBuffer
+from infra.db.settlement_repository_impl import PostgreSQLSettlementRepository
+
+# "immediate" (one update per prediction) or "batched"
+BALANCE_SETTLEMENT = os.getenv("BALANCE_SETTLEMENT", "immediate")
+# Settlement lag bound: buffered charges are settled at least this often
+SETTLEMENT_FLUSH_SECONDS = float(os.getenv("SETTLEMENT_FLUSH_SECONDS", "2"))
+# Charges settled per Postgres transaction
+SETTLEMENT_BATCH_SIZE = int(os.getenv("SETTLEMENT_BATCH_SIZE", "1000"))
+
+
+def build_settlement_use_cases() -> Optional[SettlementUseCases]:
+    """Batched settlement if configured, None for immediate settlement."""
+    if BALANCE_SETTLEMENT != "batched":
+        return None
+    if not REDIS_URL:
+        logging.warning(
+            "Settlement: BALANCE_SETTLEMENT=batched needs REDIS_URL, "
+            "settling immediately."
+        )
+        return None
+    return SettlementUseCases(
+        RedisChargeBuffer(REDIS_URL),
+        PostgreSQLSettlementRepository(),
+        batch_size=SETTLEMENT_BATCH_SIZE,
+    )
+
+
+class SettlementFlusher:
+    """Flushes buffered charges periodically in a daemon thread."""
+
+    def __init__(
+        self,
+        use_cases: SettlementUseCases,
+        interval_seconds: float = SETTLEMENT_FLUSH_SECONDS,
+    ):
+        self.use_cases = use_cases
+        self.interval_seconds = interval_seconds
+        self._thread: Optional[threading.Thread] = None
+
+    def run_forever(self) -> None:
+        while True:
+            try:
+                self.use_cases.flush()
+            except Exception as e:
+                # Unsettled charges stay buffered and are retried
+                logging.warning(f"Settlement: Flush failed: {e}")
+            time.sleep(self.interval_seconds)
+
+    def start(self) -> None:
+        """Starts the flusher thread of this process (also after a fork)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self.run_forever, daemon=True)
+        self._thread.start()
@@ -2,35 +2,115 @@
 # Defines Celery tasks for processing predictions asynchronously
 import asyncio
 import logging
+import os
+from celery.signals import worker_process_init
+from config.settings import PREDICTION_LEASE_SECONDS
 from infra.queue.celery_app import app
-from core.use_cases.llm_use_cases import LLMUseCases
-# Update imports to use PostgreSQL repositories
-from infra.db.user_repository_impl import PostgreSQLUserRepository
-from infra.db.model_repository_impl import PostgreSQLModelRepository
-from infra.db.prediction_repository_impl import PostgreSQLPredictionRepository
-from infra.db.transaction_repository_impl import (
-    PostgreSQLTransactionRepository
+from core.use_cases.queue_use_cases import QueueUseCases
+from infra.queue.worker_use_cases import (
+    build_background_jobs,
+    build_llm_use_cases,
+)
+from infra.db.queue_repository_impl import PostgreSQLQueueRepository
+
+# Queue backend: "celery" (Redis broker), "postgres" (see pg_queue.py)
+# or "inprocess" (see inprocess_queue.py)
+QUEUE_BACKEND = os.getenv("QUEUE_BACKEND", "celery")
+# Fair-share dispatch through the queue_items table (set to 0 for plain FIFO)
+QUEUE_FAIR_SHARE = os.getenv("QUEUE_FAIR_SHARE", "1") == "1"
+# Jobs allowed in the Celery queue at once, keep ~ total worker concurrency
+QUEUE_MAX_IN_FLIGHT = int(os.getenv("QUEUE_MAX_IN_FLIGHT", "8"))
+QUEUE_AGING_SECONDS = float(os.getenv("QUEUE_AGING_SECONDS", "30"))
+# Dispatched items without a live job after this long are queued again
+QUEUE_STALE_SECONDS = float(
+    os.getenv("QUEUE_STALE_SECONDS", str(PREDICTION_LEASE_SECONDS))
 )
 
 
 # Instantiate repositories and use cases with PostgreSQL versions
-user_repo = PostgreSQLUserRepository()
-model_repo = PostgreSQLModelRepository()
-pred_repo = PostgreSQLPredictionRepository()
-trans_repo = PostgreSQLTransactionRepository()
-use_cases = LLMUseCases(
-    user_repository=user_repo,
-    model_repository=model_repo,
-    prediction_repository=pred_repo,
-    transaction_repository=trans_repo,
+use_cases = build_llm_use_cases()
+background_jobs = build_background_jobs()
+queue_use_cases = QueueUseCases(
+    queue_repository=PostgreSQLQueueRepository(),
+    max_in_flight=QUEUE_MAX_IN_FLIGHT,
+    aging_seconds=QUEUE_AGING_SECONDS,
+    stale_seconds=QUEUE_STALE_SECONDS,
 )
 
 
 def process_prediction(prediction_id: int, user_id: int, input_text: str):
     """
     Enqueue a prediction job into Celery queue.
+    With fair-share enabled the job waits in the queue table first.
+    With the postgres backend the committed 'pending' row is the job itself.
+    With the inprocess backend the job runs in a background task right here.
+    """
+    if QUEUE_BACKEND == "inprocess":
+        from infra.queue.inprocess_queue import submit
+        submit(prediction_id, user_id, input_text)
+        return
+    if QUEUE_BACKEND == "postgres":
+        logging.info(
+            f"Queue: Prediction {prediction_id} left for Postgres workers."
+        )
+        return
+    if not QUEUE_FAIR_SHARE:
+        _send_job(prediction_id, user_id, input_text)
+        return
+    queue_use_cases.submit(prediction_id, user_id)
+    dispatch_queue()
+
+
+def dispatch_queue() -> int:
+    """
+    Sends waiting queue items into free Celery slots (fair-share order).
+    Called on every submission and after every finished job.
     """
-    _process_prediction_job.delay(prediction_id, user_id, input_text)
+    return queue_use_cases.dispatch(
+        lambda item: _send_job(item.prediction_id, item.user_id, None)
+    )
+
+
+def _task_id(prediction_id: int) -> str:
+    """Celery task id of a prediction job, known in advance for revoke."""
+    return f"prediction-{prediction_id}"
+
+
+def _send_job(prediction_id: int, user_id: int, input_text: str | None):
+    _process_prediction_job.apply_async(
+        (prediction_id, user_id, input_text),
+        task_id=_task_id(prediction_id),
+    )
+
+
+def revoke_prediction(prediction_id: int) -> None:
+    """
+    Drops the queued job of a cancelled prediction.
+    Best effort: a job that still reaches a worker sees the 'cancelled'
+    status and is skipped there.
+    """
+    if QUEUE_BACKEND != "celery":
+        # postgres workers only claim 'pending' rows, in-process workers
+        # skip cancelled predictions
+        return
+    if QUEUE_FAIR_SHARE:
+        # A dispatched job is left to the worker: a revoked task would never
+        # free its fair-share slot
+        queue_use_cases.cancel(prediction_id)
+        return
+    try:
+        app.control.revoke(_task_id(prediction_id))
+    except Exception as e:
+        logging.warning(f"Queue: Failed to revoke prediction {prediction_id}: {e}")
+
+
+@worker_process_init.connect
+def _start_background_jobs(**kwargs):
+    """Starts the model preloader and the settlement flusher in every Celery
+    child process, so idle workers also warm up models (e.g. for a
+    switchover) and settle charges."""
+    for job in background_jobs:
+        job.start()
 
 
 @app.task(name='infra.queue.tasks._process_prediction_job')
@@ -39,6 +119,9 @@ def _process_prediction_job(prediction_id: int, user_id: int, input_text: str):
     Worker function to process a pending prediction.
     """
     logging.info(f"Worker: Starting processing prediction_id={prediction_id}")
+    for job in background_jobs:
+        job.start()  # Solo pool: no worker_process_init
+    queue_status = 'completed'
     try:
         # Run async use case in fresh event loop
         result = asyncio.run(
@@ -49,10 +132,20 @@ def _process_prediction_job(prediction_id: int, user_id: int, input_text: str):
             )  # Corrected indentation
             # Old: create_prediction(user_id=user_id, input_text=input_text)
         )
+        if result is None:
+            # Another worker holds it and frees the slot when done
+            queue_status = None
+            return None
         logging.info(f"Worker: Completed prediction {result.id}")
         return result.id
     except Exception as e:
         logging.exception(
             "Worker Error: Failed prediction %s: %s", prediction_id, e
         )
+        queue_status = 'failed'
         raise
+    finally:
+        if QUEUE_FAIR_SHARE and queue_status:
+            # Free the slot and pull the next fair-share item
+            queue_use_cases.complete(prediction_id, queue_status)
+            dispatch_queue()
@@ -0,0 +1,113 @@
+# filepath: infra/queue/worker_use_cases.py
+# Builds the LLMUseCases used by every queue backend (Celery, Postgres,
+# in-process), so they all process predictions the same way.
+import os
+
+from config.settings import LLM_MAX_OUTPUT_TOKENS
+from core.use_cases.llm_use_cases import LLMUseCases
+from infra.cache.response_cache import (
+    RESPONSE_CACHE_BILLING,
+    get_response_cache,
+)
+from infra.cache.single_flight import get_single_flight
+from infra.db.user_repository_impl import PostgreSQLUserRepository
+from infra.db.model_repository_impl import PostgreSQLModelRepository
+from infra.db.prediction_repository_impl import PostgreSQLPredictionRepository
+from infra.db.transaction_repository_impl import (
+    PostgreSQLTransactionRepository
+)
+from infra.db.model_endpoint_repository_impl import (
+    PostgreSQLModelEndpointRepository
+)
+from infra.db.model_switchover_repository_impl import (
+    PostgreSQLModelSwitchoverRepository
+)
+from infra.db.partitions import (
+    PARTITION_MAINTENANCE_SECONDS,
+    PartitionMaintainer,
+)
+from infra.llm.concurrency_limiter import get_concurrency_limiter
+from infra.llm.residency import BacklogPreloader, get_residency_manager
+from infra.llm.router import LLMRouter
+from infra.llm.sidecar import LLM_SIDECAR_SOCKET
+from infra.metrics import counters
+from infra.queue.hold_sweeper import HOLD_SWEEP_SECONDS, HoldSweeper
+from infra.queue.settlement import (
+    SettlementFlusher,
+    build_settlement_use_cases,
+)
+
+# How often a running generation checks for a cancel request
+CANCEL_POLL_SECONDS = float(os.getenv("CANCEL_POLL_SECONDS", "2"))
+
+
+def build_llm_use_cases() -> LLMUseCases:
+    """Instantiates repositories and LLM use cases with PostgreSQL versions."""
+    return LLMUseCases(
+        user_repository=PostgreSQLUserRepository(),
+        model_repository=PostgreSQLModelRepository(),
+        prediction_repository=PostgreSQLPredictionRepository(),
+        transaction_repository=PostgreSQLTransactionRepository(),
+        response_cache=get_response_cache(),
+        cache_hit_billing=RESPONSE_CACHE_BILLING,
+        single_flight=get_single_flight(),
+        max_output_tokens=LLM_MAX_OUTPUT_TOKENS,
+        cancel_poll_seconds=CANCEL_POLL_SECONDS,
+        metrics=counters.incr,
+        llm_backend=LLMRouter(
+            PostgreSQLModelEndpointRepository(),
+            limiter=get_concurrency_limiter(),
+        ),
+        settlement=build_settlement_use_cases(),
+    )
+
+
+def build_backlog_preloader() -> BacklogPreloader | None:
+    """Keeps the local models of queued predictions and switchovers loaded
+    in this worker (start() it in the worker process).
+
+    None when a sidecar owns the local models (it preloads them itself).
+    """
+    if LLM_SIDECAR_SOCKET:
+        return None
+    return BacklogPreloader(
+        get_residency_manager(),
+        PostgreSQLPredictionRepository(),
+        PostgreSQLModelRepository(),
+        PostgreSQLModelEndpointRepository(),
+        PostgreSQLModelSwitchoverRepository(),
+    )
+
+
+def build_settlement_flusher() -> SettlementFlusher | None:
+    """Flusher of batched settlement (start() it in the worker process),
+    None with immediate settlement."""
+    use_cases = build_settlement_use_cases()
+    return SettlementFlusher(use_cases) if use_cases else None
+
+
+def build_partition_maintainer() -> PartitionMaintainer | None:
+    """Creates the upcoming monthly partitions (start() it in the worker
+    process), None if PARTITION_MAINTENANCE_SECONDS is 0."""
+    if PARTITION_MAINTENANCE_SECONDS <= 0:
+        return None
+    return PartitionMaintainer()
+
+
+def build_hold_sweeper() -> HoldSweeper | None:
+    """Releases the holds of lost predictions (start() it in the worker
+    process), None if HOLD_SWEEP_SECONDS is 0."""
+    if HOLD_SWEEP_SECONDS <= 0:
+        return None
+    return HoldSweeper(PostgreSQLPredictionRepository())
+
+
+def build_background_jobs() -> list:
+    """Daemon jobs every worker process runs next to the predictions."""
+    jobs = [
+        build_backlog_preloader(),
+        build_settlement_flusher(),
+        build_partition_maintainer(),
+        build_hold_sweeper(),
+    ]
+    return [job for job in jobs if job is not None]
@@ -15,14 +15,23 @@ project_root = os.path.dirname(
 sys.path.insert(0, project_root)
 
 # Project-specific imports
+from config.settings import (
+    ESTIMATED_OUTPUT_TOKENS,
+    PREDICTION_MAX_QUEUE_SECONDS,
+)
 from core.entities.prediction import Prediction as PredictionEntity
+from core.use_cases.billing_use_cases import BillingUseCases
+from core.use_cases.prediction_use_cases import (
+    PredictionUseCases,
+    queue_deadline,
+)
 from core.use_cases.user_use_cases import UserUseCases
 from infra.db.model_repository_impl import PostgreSQLModelRepository  # Renamed
 from infra.db.prediction_repository_impl import (  # Renamed
     PostgreSQLPredictionRepository,
 )
 from infra.db.user_repository_impl import PostgreSQLUserRepository  # Renamed
-from infra.queue.tasks import process_prediction
+from infra.queue.tasks import process_prediction, revoke_prediction
 
 
 # Configure logging
@@ -57,6 +66,8 @@ user_repo = PostgreSQLUserRepository()  # Renamed
 user_use_cases = UserUseCases(user_repo)
 pred_repo = PostgreSQLPredictionRepository()  # Renamed
 model_repo = PostgreSQLModelRepository()  # Renamed
+billing_use_cases = BillingUseCases(user_repo, ESTIMATED_OUTPUT_TOKENS)
+prediction_use_cases = PredictionUseCases(pred_repo, user_repo)
 
 
 # --- Handlers ---
@@ -143,14 +154,30 @@ async def predict_command(message: types.Message):
     if not active_model:
         await message.answer("No active model available.")
         return
+    # Hold the estimated cost, reject work the user cannot afford
+    reserved_cost = billing_use_cases.reserve_for_prediction(
+        user, active_model, prompt
+    )
+    if reserved_cost is None:
+        await message.answer(
+            "Insufficient balance for the estimated prediction cost."
+        )
+        return
     # Create prediction entity
     pred = PredictionEntity(
         user_id=user.id,
         model_id=active_model.id,
         input_text=prompt,
         status="pending",
+        reserved_cost=reserved_cost,
+        # Chat users give up too, drop the job if it waits too long
+        deadline_at=queue_deadline(PREDICTION_MAX_QUEUE_SECONDS),
     )
-    prediction_id = pred_repo.add(pred)
+    try:
+        prediction_id = pred_repo.add(pred)
+    except Exception:
+        billing_use_cases.release(user.id, reserved_cost)
+        raise
     logging.info(
         f"Prediction ID {prediction_id} for user {user_id} sent to queue."
     )  # Used prediction_id and shortened line
@@ -179,6 +206,33 @@ async def status_command(message: types.Message):
         await message.answer(f"Result for {uuid}:\n{pred.output_text}")
 
 
+@dp.message(Command("cancel"))
+async def cancel_command(message: types.Message):
+    """
+    Handles the /cancel command to stop a queued or running prediction.
+    """
+    uuid = message.text.partition(" ")[2].strip()
+    if not uuid:
+        await message.answer("Usage: /cancel <prediction_uuid>")
+        return
+    user = user_use_cases.get_user_by_telegram_id(str(message.from_user.id))
+    pred = pred_repo.get_by_uuid(uuid)
+    if not user or not pred or pred.user_id != user.id:
+        await message.answer(f"Prediction {uuid} not found.")
+        return
+    status = prediction_use_cases.cancel(pred)
+    if status is None:
+        await message.answer(f"Prediction already finished: {pred.status}")
+    elif status == "cancelled":
+        revoke_prediction(pred.id)
+        await message.answer("Prediction cancelled, nothing was charged.")
+    else:
+        await message.answer(
+            "Stopping the prediction, you pay only for the tokens "
+            "generated so far."
+        )
+
+
 # --- Main Function to Start Polling ---
 
 def main() -> None:
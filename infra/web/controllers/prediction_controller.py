@@ -1,10 +1,22 @@
 # infra/web/controllers/prediction_controller.py
 import logging
+from datetime import datetime
+from typing import Optional
 
 from fastapi import APIRouter, HTTPException, Depends, Body, Header
 from pydantic import BaseModel, Field
 
+from config.settings import (
+    ESTIMATED_OUTPUT_TOKENS,
+    IDEMPOTENCY_KEY_TTL_SECONDS,
+    PREDICTION_MAX_QUEUE_SECONDS,
+)
 from core.entities.prediction import Prediction as PredictionEntity
+from core.use_cases.billing_use_cases import BillingUseCases
+from core.use_cases.prediction_use_cases import (
+    PredictionUseCases,
+    queue_deadline,
+)
 # Import repository implementations to instantiate use cases
 from infra.db.user_repository_impl import PostgreSQLUserRepository
 from infra.db.model_repository_impl import PostgreSQLModelRepository
@@ -18,11 +30,30 @@ class PredictionCreateRequest(BaseModel):
     """Request model for creating a new prediction."""
     user_id: int = Field(..., description="The internal ID of the user requesting the prediction.")
     input_text: str = Field(..., description="The input text/prompt for the LLM.")
+    model: Optional[str] = Field(
+        None, description="Name of an active model (default: the first one)."
+    )
+    max_queue_seconds: Optional[float] = Field(
+        PREDICTION_MAX_QUEUE_SECONDS, gt=0,
+        description="Drop the prediction if no worker starts it in time."
+    )
+    deadline_at: Optional[datetime] = Field(
+        None, description="Absolute deadline for the prediction to start."
+    )
 
 # Use the core Prediction entity for the response
 class PredictionResponse(PredictionEntity):
     """Response model for prediction details."""
-    pass
+    # Lease secret of the worker running it, never sent to clients
+    claim_token: Optional[str] = Field(None, exclude=True)
+
+class ModelResponse(BaseModel):
+    """Response model for an available LLM model."""
+    id: int
+    name: str
+    description: Optional[str] = None
+    input_token_price: float
+    output_token_price: float
 
 # --- Router Setup ---
 router = APIRouter()
@@ -33,6 +64,8 @@ user_repo = PostgreSQLUserRepository()
 model_repo = PostgreSQLModelRepository()
 prediction_repo = PostgreSQLPredictionRepository()
 transaction_repo = PostgreSQLTransactionRepository()
+billing_use_cases = BillingUseCases(user_repo, ESTIMATED_OUTPUT_TOKENS)
+prediction_use_cases = PredictionUseCases(prediction_repo, user_repo)
 
 # --- API Endpoints ---
 
@@ -44,10 +77,13 @@ transaction_repo = PostgreSQLTransactionRepository()
 async def create_prediction_endpoint(
     request: PredictionCreateRequest,
     x_api_key: str = Header(..., alias="X-API-KEY"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
 ) -> PredictionResponse:
     """
     Enqueues a prediction request and returns its initial pending details.
     Protected by API key in 'X-API-KEY' header.
+    Retries sent with the same 'Idempotency-Key' header return the original
+    prediction instead of creating (and billing) a new one.
     """
     logging.info("API: Received prediction request, validating API key.")
     # Validate API key and get user
@@ -57,34 +93,102 @@ async def create_prediction_endpoint(
     # Ensure the API key matches the requested user_id
     if api_user.id != request.user_id:
         raise HTTPException(status_code=403, detail="API key does not match user")
+    if idempotency_key is not None:
+        if not 0 < len(idempotency_key) <= 255:
+            raise HTTPException(
+                status_code=400, detail="Invalid Idempotency-Key header."
+            )
+        existing = prediction_repo.get_by_idempotency_key(
+            api_user.id, idempotency_key
+        )
+        if existing:
+            return _check_idempotent_retry(existing, request)
     # Check user balance
     if api_user.balance <= 0:
         raise HTTPException(status_code=402, detail="Insufficient balance to enqueue prediction.")
-    # Get active model
-    model = model_repo.get_active_model()
+    # Get the requested or the default active model
+    if request.model:
+        model = model_repo.get_by_name(request.model)
+        if not model or not model.is_active:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Model '{request.model}' is not available."
+            )
+    else:
+        model = model_repo.get_active_model()
     if not model:
         raise HTTPException(status_code=503, detail="No active model available.")
+    # Hold the estimated cost, reject work the user cannot afford
+    reserved_cost = billing_use_cases.reserve_for_prediction(
+        api_user, model, request.input_text
+    )
+    if reserved_cost is None:
+        raise HTTPException(
+            status_code=402,
+            detail="Insufficient balance for the estimated prediction cost."
+        )
     # Create prediction record with status 'pending'
     pred = PredictionEntity(
         user_id=api_user.id,
         model_id=model.id,
         input_text=request.input_text,
         status="pending",
+        reserved_cost=reserved_cost,
+        deadline_at=queue_deadline(
+            request.max_queue_seconds, request.deadline_at
+        ),
     )
-    pred = prediction_repo.add(pred)
+    try:
+        if idempotency_key is None:
+            pred = prediction_repo.add(pred)
+        else:
+            pred, created = prediction_repo.add_idempotent(
+                pred, idempotency_key, IDEMPOTENCY_KEY_TTL_SECONDS
+            )
+            if not created:
+                # A concurrent retry won the race
+                billing_use_cases.release(api_user.id, reserved_cost)
+                return _check_idempotent_retry(pred, request)
+    except Exception:
+        billing_use_cases.release(api_user.id, reserved_cost)
+        raise
     # Enqueue async processing task
     from infra.queue.tasks import process_prediction
     process_prediction(pred.id, api_user.id, request.input_text)
     return pred
 
+def _check_idempotent_retry(
+    prediction: PredictionEntity, request: PredictionCreateRequest
+) -> PredictionEntity:
+    """Returns the original prediction of a retried request."""
+    if prediction.input_text != request.input_text:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used for a different request."
+        )
+    logging.info(
+        f"API: Idempotent retry, returning prediction {prediction.uuid}"
+    )
+    return prediction
+
+@router.get("/models", response_model=list[ModelResponse])
+async def list_models_endpoint():
+    """Lists the active models a prediction may request, with prices."""
+    return [ModelResponse(**vars(m)) for m in model_repo.list_active()]
+
+
 @router.get(
     "/predictions/user/{user_id}",
     response_model=list[PredictionResponse]
 )
 async def get_user_predictions_endpoint(
-    user_id: int, x_api_key: str = Header(..., alias="X-API-KEY")
+    user_id: int,
+    x_api_key: str = Header(..., alias="X-API-KEY"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
 ):
-    """Gets all predictions for a specific user."""
+    """Gets the predictions of a user, optionally only those created in
+    [since, until) (reads only the partitions of those months)."""
     logging.info(
         f"API: Received request for predictions for user_id={user_id}"
     )
@@ -101,7 +205,7 @@ async def get_user_predictions_endpoint(
         )
 
     try:
-        predictions = prediction_repo.list_by_user(user_id)
+        predictions = prediction_repo.list_by_user(user_id, since, until)
         if predictions:
             return predictions
         else:
@@ -143,3 +247,34 @@ async def get_prediction_status_endpoint(uuid: str):
             status_code=500,
             detail="Internal server error retrieving prediction status."
         )
+
+
+@router.post("/predictions/{uuid}/cancel", response_model=PredictionResponse)
+async def cancel_prediction_endpoint(
+    uuid: str, x_api_key: str = Header(..., alias="X-API-KEY")
+):
+    """
+    Cancels a pending or processing prediction.
+    A queued prediction is dropped and costs nothing; a running one is
+    stopped by the worker and charged only for the tokens produced so far
+    (status 'cancelling' until then).
+    """
+    logging.info(f"API: Received cancel request for prediction uuid={uuid}")
+    api_user = user_repo.get_by_api_key(x_api_key)
+    if not api_user:
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    prediction = prediction_repo.get_by_uuid(uuid)
+    if not prediction or prediction.user_id != api_user.id:
+        raise HTTPException(
+            status_code=404, detail=f"Prediction with UUID {uuid} not found."
+        )
+    status = prediction_use_cases.cancel(prediction)
+    if status is None:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Prediction already finished ({prediction.status})."
+        )
+    if status == "cancelled":
+        from infra.queue.tasks import revoke_prediction
+        revoke_prediction(prediction.id)
+    return prediction_repo.get_by_uuid(uuid)
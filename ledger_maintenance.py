@@ -0,0 +1,17 @@
+#
+"""
+Balance ledger maintenance
+This script advances the per-user balance checkpoints (run it periodically,
+e.g. from cron or with --every), audits a user's balance against the ledger
+and reconciles all balances and predictions with it (e.g. nightly).
+Usage: python ledger_maintenance.py checkpoint|audit <user id>|reconcile
+"""
+
+if __name__ == "__main__":
+    import logging
+    logging.basicConfig(level=logging.INFO)
+    import sys, os
+    sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+    from infra.db.ledger_maintenance import main
+    main()
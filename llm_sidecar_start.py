@@ -0,0 +1,17 @@
+#
+"""
+Local inference sidecar starter
+This script starts the process that owns the local LLM engines (vllm,
+llama_cpp). Workers started with the same LLM_SIDECAR_SOCKET send their
+local engine calls to it instead of loading the model themselves.
+"""
+
+if __name__ == "__main__":
+    import logging
+    logging.basicConfig(level=logging.INFO)
+    logging.info("Starting local inference sidecar...")
+    import sys, os
+    sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+    from infra.llm.sidecar import main
+    main()
@@ -4,6 +4,7 @@ from fastapi import FastAPI
 from infra.web.controllers.user_controller import router as user_router
 from infra.web.controllers.prediction_controller import router as prediction_router
 from infra.web.controllers.auth_controller import router as auth_router
+from infra.metrics import counters
 
 app = FastAPI(
     debug=True,
@@ -23,6 +24,16 @@ def version():
     return app.version
 
 
+@app.get("/metrics")
+def metrics():
+    """Returns service counters (shared across processes when Redis is set)."""
+    values = counters.snapshot()
+    hits = values.get("response_cache_hits", 0)
+    lookups = hits + values.get("response_cache_misses", 0)
+    values["response_cache_hit_rate"] = hits / lookups if lookups else 0.0
+    return values
+
+
 app.include_router(user_router, prefix="/api/v1", tags=["Users"])
 app.include_router(auth_router, prefix="/api/v1", tags=["Auth"])
 app.include_router(prediction_router, prefix="/api/v1", tags=["Predictions"])
@@ -0,0 +1,17 @@
+#
+"""
+Partition maintenance
+This script creates the upcoming monthly partitions of predictions and
+transactions (workers also do it) and detaches or drops the partitions of
+old months without locking the current ones.
+Usage: python partition_maintenance.py create|detach --before YYYY-MM [--drop]
+"""
+
+if __name__ == "__main__":
+    import logging
+    logging.basicConfig(level=logging.INFO)
+    import sys, os
+    sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+    from infra.db.partitions import main
+    main()
@@ -0,0 +1,16 @@
+#
+"""
+Postgres queue worker starter
+This script starts a worker for QUEUE_BACKEND=postgres: it claims pending
+predictions straight from the database, no Redis/Celery required.
+"""
+
+if __name__ == "__main__":
+    import logging
+    logging.basicConfig(level=logging.INFO)
+    logging.info("Starting Postgres queue worker for prediction processing...")
+    import sys, os
+    sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+    from infra.queue.pg_queue import main
+    main()
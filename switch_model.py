@@ -0,0 +1,16 @@
+#
+"""
+Active model switch
+This script makes another model the active one: workers load and warm it in
+the background, traffic moves over in one step, then the old model is
+drained and unloaded. Usage: python switch_model.py <model name>
+"""
+
+if __name__ == "__main__":
+    import logging
+    logging.basicConfig(level=logging.INFO)
+    import sys, os
+    sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+    from infra.llm.switchover import main
+    main()
@@ -0,0 +1,64 @@
+# tests/test_billing_use_cases.py
+# Output token budgets and the most a prediction can cost (pure logic).
+import pytest
+
+pytest.importorskip("pydantic")
+
+from core.entities.model import Model
+from core.use_cases.billing_use_cases import (
+    bucket_token_budget,
+    estimate_tokens,
+    max_prediction_cost,
+    output_token_budget,
+)
+
+# 8 characters: 2 tokens
+PROMPT = "abcdefgh"
+MODEL = Model(input_token_price=0.5, output_token_price=0.25)
+
+
+def test_estimate_tokens_rounds_up():
+    assert estimate_tokens("") == 1
+    assert estimate_tokens(PROMPT) == 2
+    assert estimate_tokens(PROMPT + "x") == 3
+
+
+def test_budget_is_what_is_left_after_the_input():
+    assert output_token_budget(26.0, MODEL, PROMPT) == 100
+
+
+def test_budget_is_capped():
+    assert output_token_budget(100.0, MODEL, PROMPT, 64) == 64
+
+
+def test_budget_is_zero_when_the_input_is_unaffordable():
+    assert output_token_budget(0.5, MODEL, PROMPT) == 0
+
+
+def test_free_output_is_only_capped():
+    free = Model(input_token_price=0.5, output_token_price=0.0)
+    assert output_token_budget(0.0, free, PROMPT) is None
+    assert output_token_budget(0.0, free, PROMPT, 64) == 64
+
+
+def test_max_cost_matches_the_capped_budget():
+    assert max_prediction_cost(MODEL, PROMPT, 100) == 26.0
+    assert output_token_budget(
+        max_prediction_cost(MODEL, PROMPT, 100), MODEL, PROMPT, 100
+    ) == 100
+
+
+def test_max_cost_is_unbounded_without_a_cap():
+    assert max_prediction_cost(MODEL, PROMPT) is None
+    free = Model(input_token_price=0.5, output_token_price=0.0)
+    assert max_prediction_cost(free, PROMPT) == 1.0
+
+
+def test_budgets_are_bucketed_below_the_cap():
+    assert bucket_token_budget(100, 2048) == 64
+    assert bucket_token_budget(127, 2048) == 64
+    assert bucket_token_budget(128, 2048) == 128
+    assert bucket_token_budget(2048, 2048) == 2048
+    assert bucket_token_budget(1500, 1500) == 1500
+    assert bucket_token_budget(0, 2048) == 0
+    assert bucket_token_budget(None, None) is None
@@ -0,0 +1,58 @@
+# tests/test_concurrency_limiter.py
+# AIMD limits of the process-local concurrency limiter.
+import pytest
+
+from infra.llm.concurrency_limiter import LocalConcurrencyLimiter
+
+
+def test_slots_are_bounded_by_the_limit():
+    limiter = LocalConcurrencyLimiter(initial=2)
+
+    first = limiter.try_acquire("e", 60)
+    second = limiter.try_acquire("e", 60)
+
+    assert first and second
+    assert limiter.try_acquire("e", 60) is None
+    limiter.release("e", first)
+    assert limiter.try_acquire("e", 60)
+
+
+def test_success_grows_the_limit_additively():
+    limiter = LocalConcurrencyLimiter(initial=4)
+
+    for _ in range(4):
+        limiter.release("e", limiter.try_acquire("e", 60), latency=0.1)
+
+    # +1/limit per call: about one more slot after `limit` calls
+    assert 4.9 < limiter.limit("e") < 5.0
+
+
+def test_failure_cuts_the_limit_multiplicatively():
+    limiter = LocalConcurrencyLimiter(initial=10, backoff=0.5, min_limit=3)
+
+    assert limiter.release("e", "t", failed=True) == 5
+    assert limiter.release("e", "t", failed=True) == 3
+
+
+def test_latency_spike_counts_as_overload():
+    limiter = LocalConcurrencyLimiter(initial=10, backoff=0.5, tolerance=2)
+
+    limiter.release("e", "t", latency=0.1)
+    assert limiter.release("e", "t", latency=0.5) == pytest.approx(
+        (10 + 1 / 10) * 0.5
+    )
+
+
+def test_cancelled_calls_give_no_feedback():
+    limiter = LocalConcurrencyLimiter(initial=10)
+
+    assert limiter.release("e", "t") == 10
+
+
+def test_limit_stays_within_bounds():
+    limiter = LocalConcurrencyLimiter(initial=2, max_limit=2.5)
+
+    for _ in range(10):
+        limiter.release("e", "t", latency=0.1)
+
+    assert limiter.limit("e") == 2.5
@@ -0,0 +1,45 @@
+# tests/test_initialize_db.py
+# Smoke check of the schema: runs the init SQL against a real PostgreSQL.
+# It DROPs every table, so it only runs with DB_SMOKE_TEST=1 and the DB_*
+# variables pointing at a throwaway database:
+#   DB_SMOKE_TEST=1 DB_PORT=5433 python -m pytest tests
+import os
+
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+if os.getenv("DB_SMOKE_TEST") != "1":
+    pytest.skip("DB_SMOKE_TEST=1 not set", allow_module_level=True)
+
+from infra.db.initialize_db import get_db_connection, initialize_database
+
+
+@pytest.fixture(scope="module")
+def conn():
+    initialize_database()
+    conn = get_db_connection()
+    yield conn
+    conn.close()
+
+
+def test_admin_seeded_with_opening_balance(conn):
+    cursor = conn.cursor()
+    cursor.execute(
+        """SELECT b.balance, t.amount, t.description
+           FROM users u
+           JOIN balances b ON b.user_id = u.id
+           JOIN transactions t ON t.user_id = u.id
+           WHERE u.name = 'admin'"""
+    )
+    assert cursor.fetchall() == [(1000.0, 1000.0, 'Opening balance')]
+
+
+def test_partitions_created(conn):
+    cursor = conn.cursor()
+    cursor.execute(
+        """SELECT COUNT(*) FROM pg_inherits
+           WHERE inhparent IN ('predictions'::regclass,
+                               'transactions'::regclass)"""
+    )
+    assert cursor.fetchone()[0] > 0
@@ -0,0 +1,219 @@
+# tests/test_llm_use_cases.py
+# Worker side of a prediction against in-memory repositories.
+import asyncio
+
+import pytest
+
+pytest.importorskip("pydantic")
+
+from config.settings import LLM_MAX_OUTPUT_TOKENS
+from core.entities.job_context import JobContext
+from core.entities.model import Model
+from core.entities.prediction import Prediction
+from core.entities.user import User
+from core.use_cases.llm_use_cases import LLMUseCases, prompt_cache_key
+from infra.cache.single_flight import LocalSingleFlight
+
+
+class MemoryUsers:
+    def __init__(self, user: User):
+        self.user = user
+
+    def reserve_up_to(self, user_id, amount):
+        granted = min(
+            amount, max(self.user.balance - self.user.reserved_balance, 0)
+        )
+        self.user.reserved_balance += granted
+        return granted
+
+    def release_funds(self, user_id, amount):
+        self.user.reserved_balance -= amount
+        return True
+
+    def settle_charge(self, user_id, cost, reserved):
+        self.user.reserved_balance -= reserved
+        self.user.balance -= cost
+        return cost, self.user.balance
+
+
+class MemoryPredictions:
+    def __init__(self, users: MemoryUsers, model: Model):
+        self.users = users
+        self.model = model
+        self.predictions = {}
+
+    def add(self, prediction: Prediction) -> Prediction:
+        prediction.id = len(self.predictions) + 1
+        self.predictions[prediction.id] = prediction
+        return prediction
+
+    def start_processing(self, prediction_id, claim_token, lease_seconds):
+        prediction = self.predictions[prediction_id]
+        prediction.status = 'processing'
+        return JobContext(
+            prediction=prediction, user=self.users.user, model=self.model,
+            claimed=True,
+        )
+
+    def update_changed(self, prediction):
+        prediction.mark_clean()
+        return True
+
+    def get_status(self, prediction_id):
+        return self.predictions[prediction_id].status
+
+
+class MemoryTransactions:
+    def __init__(self):
+        self.transactions = []
+
+    def add(self, transaction):
+        self.transactions.append(transaction)
+        return transaction
+
+
+class RecordingBackend:
+    """Answers every prompt once both predictions are generating."""
+
+    def __init__(self, expected_calls: int):
+        self.budgets = []
+        self.expected_calls = expected_calls
+        self.all_started = asyncio.Event()
+
+    async def predict(self, model, input_text, max_tokens=None,
+                      cancel_event=None):
+        self.budgets.append(max_tokens)
+        if len(self.budgets) == self.expected_calls:
+            self.all_started.set()
+        await asyncio.wait_for(self.all_started.wait(), 1)
+        return {
+            'output_text': 'ok', 'input_tokens': 1, 'output_tokens': 1,
+            'finish_reason': 'stop',
+        }
+
+
+def test_parallel_predictions_of_a_user_are_both_admitted():
+    # 1 token in, up to the default cap out
+    model = Model(id=1, name='m', input_token_price=0.001,
+                  output_token_price=0.001)
+    max_cost = 0.001 + LLM_MAX_OUTPUT_TOKENS * 0.001
+    users = MemoryUsers(User(id=1, balance=10 * max_cost))
+    predictions = MemoryPredictions(users, model)
+    backend = RecordingBackend(expected_calls=2)
+    use_cases = LLMUseCases(
+        users, None, predictions, MemoryTransactions(), llm_backend=backend,
+    )
+    first, second = (
+        predictions.add(Prediction(user_id=1, input_text=text))
+        for text in ('one', 'two')
+    )
+
+    async def run_both():
+        return await asyncio.gather(
+            use_cases.create_prediction(first.id, 1, None),
+            use_cases.create_prediction(second.id, 1, None),
+        )
+
+    results = asyncio.run(run_both())
+
+    assert [p.status for p in results] == ['completed', 'completed']
+    # Each held only its own capped cost and got the full budget
+    assert backend.budgets == [LLM_MAX_OUTPUT_TOKENS] * 2
+    assert [p.reserved_cost for p in results] == pytest.approx([max_cost] * 2)
+    assert users.user.reserved_balance == pytest.approx(0)
+    assert users.user.balance == pytest.approx(10 * max_cost - 2 * 0.002)
+
+
+class BlockingBackend:
+    """Generates one answer per call once `release` is set."""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def predict(self, model, input_text, max_tokens=None,
+                      cancel_event=None):
+        self.calls += 1
+        await self.release.wait()
+        return {
+            'output_text': 'ok', 'input_tokens': 1, 'output_tokens': 5,
+            'finish_reason': 'stop',
+        }
+
+
+def test_cancelled_follower_stops_waiting_without_the_leader():
+    model = Model(id=1, name='m', input_token_price=0.001,
+                  output_token_price=0.001)
+    users = MemoryUsers(User(id=1, balance=100.0))
+    predictions = MemoryPredictions(users, model)
+    backend = BlockingBackend()
+    use_cases = LLMUseCases(
+        users, None, predictions, MemoryTransactions(),
+        single_flight=LocalSingleFlight(), max_output_tokens=100,
+        cancel_poll_seconds=0.01, llm_backend=backend,
+    )
+    leader, follower = (
+        predictions.add(Prediction(user_id=1, input_text='same prompt'))
+        for _ in range(2)
+    )
+
+    async def run_both():
+        leading = asyncio.create_task(
+            use_cases.create_prediction(leader.id, 1, None)
+        )
+        following = asyncio.create_task(
+            use_cases.create_prediction(follower.id, 1, None)
+        )
+        await asyncio.sleep(0.05)
+        follower.status = 'cancelling'
+        cancelled = await asyncio.wait_for(following, 1)
+        assert not leading.done()
+        backend.release.set()
+        return await leading, cancelled
+
+    led, cancelled = asyncio.run(run_both())
+
+    assert backend.calls == 1
+    assert (led.status, led.output_tokens) == ('completed', 5)
+    assert (cancelled.status, cancelled.output_tokens) == ('cancelled', 0)
+    assert cancelled.total_cost == 0
+
+
+class LongInputBackend:
+    """Counts far more input tokens than the prompt length suggests."""
+
+    async def predict(self, model, input_text, max_tokens=None,
+                      cancel_event=None):
+        return {
+            'output_text': 'ok', 'input_tokens': 1000, 'output_tokens': 1,
+            'finish_reason': 'stop',
+        }
+
+
+def test_cost_is_capped_at_the_hold():
+    model = Model(id=1, name='m', input_token_price=0.001,
+                  output_token_price=0.001)
+    users = MemoryUsers(User(id=1, balance=100.0))
+    predictions = MemoryPredictions(users, model)
+    use_cases = LLMUseCases(
+        users, None, predictions, MemoryTransactions(), max_output_tokens=100,
+        llm_backend=LongInputBackend(),
+    )
+    prediction = predictions.add(Prediction(user_id=1, input_text='one'))
+
+    result = asyncio.run(use_cases.create_prediction(prediction.id, 1, None))
+
+    # 1 estimated input token and 100 output tokens held, 1.001 spent
+    assert result.reserved_cost == pytest.approx(0.101)
+    assert result.total_cost == pytest.approx(0.101)
+    assert users.user.balance == pytest.approx(100.0 - 0.101)
+    assert users.user.reserved_balance == pytest.approx(0)
+
+
+def test_prompt_cache_key_normalises_whitespace_only():
+    key = prompt_cache_key(1, "system", "Hello  world")
+
+    assert key == prompt_cache_key(1, "system", " Hello\n\tworld ")
+    assert key != prompt_cache_key(1, "system", "hello world")
+    assert key != prompt_cache_key(2, "system", "Hello world")
+    assert key != prompt_cache_key(1, "other system", "Hello world")
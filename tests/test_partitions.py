@@ -0,0 +1,26 @@
+# tests/test_partitions.py
+# Month arithmetic and names of the monthly partitions.
+from datetime import date
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+from infra.db.partitions import add_months, partition_name
+
+
+@pytest.mark.parametrize("month, months, expected", [
+    (date(2025, 1, 1), 0, date(2025, 1, 1)),
+    (date(2025, 1, 1), 1, date(2025, 2, 1)),
+    (date(2025, 11, 1), 2, date(2026, 1, 1)),
+    (date(2025, 12, 1), 13, date(2027, 1, 1)),
+    (date(2025, 1, 1), -1, date(2024, 12, 1)),
+    (date(2025, 3, 1), -15, date(2023, 12, 1)),
+])
+def test_add_months(month, months, expected):
+    assert add_months(month, months) == expected
+
+
+def test_partition_name_is_zero_padded():
+    assert partition_name("predictions", date(2025, 3, 1)) == \
+        "predictions_2025_03"
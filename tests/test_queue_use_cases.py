@@ -0,0 +1,70 @@
+# tests/test_queue_use_cases.py
+# Deficit round-robin of the fair-share dispatcher (pure logic).
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from core.entities.queue_item import QueueItem
+from core.use_cases.queue_use_cases import QueueUseCases
+
+
+def items(user_id, count, priority=0, waited_seconds=0):
+    queued_at = datetime.now(timezone.utc) - timedelta(seconds=waited_seconds)
+    return [
+        QueueItem(id=user_id * 1000 + n, user_id=user_id, priority=priority,
+                  queued_at=queued_at)
+        for n in range(count)
+    ]
+
+
+def test_heavy_user_does_not_starve_the_others():
+    queue = QueueUseCases(None)
+    waiting = items(1, 100) + items(2, 2) + items(3, 2)
+
+    selected = queue.select_fair(waiting, in_flight={}, slots=6)
+
+    assert Counter(i.user_id for i in selected) == {1: 2, 2: 2, 3: 2}
+
+
+def test_in_flight_jobs_count_against_the_user():
+    queue = QueueUseCases(None)
+    waiting = items(1, 10) + items(2, 10)
+
+    selected = queue.select_fair(waiting, in_flight={1: 4}, slots=4)
+
+    assert Counter(i.user_id for i in selected) == {2: 4}
+
+
+def test_static_priority_buys_a_larger_share():
+    queue = QueueUseCases(None)
+    waiting = items(1, 10, priority=1) + items(2, 10)
+
+    selected = queue.select_fair(waiting, in_flight={}, slots=6)
+
+    assert Counter(i.user_id for i in selected) == {1: 4, 2: 2}
+
+
+def test_aging_reorders_but_adds_no_share():
+    queue = QueueUseCases(None, aging_seconds=30)
+    waiting = items(1, 10) + items(2, 10, waited_seconds=300)
+
+    selected = queue.select_fair(waiting, in_flight={}, slots=4)
+
+    # The long waiting user goes first, both get the same share
+    assert selected[0].user_id == 2
+    assert Counter(i.user_id for i in selected) == {1: 2, 2: 2}
+
+
+def test_never_selects_more_than_the_free_slots():
+    queue = QueueUseCases(None, quantum=5)
+
+    selected = queue.select_fair(items(1, 10), in_flight={}, slots=3)
+
+    assert len(selected) == 3
+
+
+@pytest.mark.parametrize("quantum", [0, -1])
+def test_non_positive_quantum_is_rejected(quantum):
+    with pytest.raises(ValueError):
+        QueueUseCases(None, quantum=quantum)
@@ -0,0 +1,87 @@
+# tests/test_residency.py
+# LRU eviction of local models under the residency memory budget.
+import pytest
+
+pytest.importorskip("pydantic")
+
+from infra.llm import residency
+from infra.llm.residency import ModelResidencyManager
+
+
+class FakeEngine:
+    def __init__(self):
+        self.loaded = []
+        self.unloaded = []
+
+    def resolve_path(self, model_name):
+        return model_name
+
+    def load(self, path):
+        self.loaded.append(path)
+
+    def unload(self, path):
+        self.unloaded.append(path)
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = FakeEngine()
+    monkeypatch.setattr(residency, '_engine', lambda kind: engine)
+    return engine
+
+
+def manager() -> ModelResidencyManager:
+    # Unknown files count as default_mb each: room for two models
+    return ModelResidencyManager(budget_mb=200, overhead=1, default_mb=100)
+
+
+def use(models: ModelResidencyManager, path: str) -> None:
+    models.release(models.acquire("vllm", path))
+
+
+def test_least_recently_used_idle_model_is_evicted(engine):
+    models = manager()
+    use(models, "a")
+    use(models, "b")
+    use(models, "a")  # b is now the least recently used
+
+    use(models, "c")
+
+    assert engine.unloaded == ["b"]
+    assert models.resident() == [("vllm", "a"), ("vllm", "c")]
+
+
+def test_models_in_use_are_never_evicted(engine):
+    models = manager()
+    busy = models.acquire("vllm", "a")
+    use(models, "b")
+
+    use(models, "c")
+
+    assert engine.unloaded == ["b"]
+    models.release(busy)
+
+
+def test_resident_model_is_not_loaded_again(engine):
+    models = manager()
+    use(models, "a")
+    use(models, "a")
+
+    assert engine.loaded == ["a"]
+
+
+def test_preload_only_uses_free_budget(engine):
+    models = manager()
+    use(models, "a")
+    use(models, "b")
+
+    assert models.acquire("vllm", "c", evict=False) is None
+    assert engine.unloaded == []
+
+
+def test_no_budget_means_no_eviction(engine):
+    models = ModelResidencyManager(budget_mb=0, default_mb=100)
+    for path in ("a", "b", "c"):
+        use(models, path)
+
+    assert engine.unloaded == []
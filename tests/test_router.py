@@ -0,0 +1,185 @@
+# tests/test_router.py
+# Circuit breaker and hedged requests of the LLM router, with fake endpoints.
+import asyncio
+import time
+
+import pytest
+
+from core.entities.model import Model
+from core.entities.model_endpoint import ModelEndpoint
+from infra.llm import router as router_module
+from infra.llm.router import LLMRouter
+
+FAST = ModelEndpoint(id=1, model_id=1, kind='openai')
+SLOW = ModelEndpoint(id=2, model_id=1, kind='openai')
+
+
+class FakeEndpoints:
+    def __init__(self, endpoints):
+        self.endpoints = endpoints
+
+    def list_by_model(self, model_id):
+        return self.endpoints
+
+
+def build_router(**kwargs) -> LLMRouter:
+    return LLMRouter(FakeEndpoints([FAST, SLOW]), **kwargs)
+
+
+@pytest.fixture
+def healthy(monkeypatch):
+    """Health checks of ejected endpoints, True unless changed."""
+    result = {'ok': True}
+
+    async def check_endpoint(endpoint):
+        return result['ok']
+
+    monkeypatch.setattr(router_module, 'check_endpoint', check_endpoint)
+    return result
+
+
+def test_consecutive_failures_eject_an_endpoint(healthy):
+    router = build_router(eject_failures=3)
+
+    for _ in range(3):
+        router._record(FAST, False, 1.0, 0)
+
+    assert router.state(FAST).ejected_until > time.monotonic()
+    assert asyncio.run(router.rank([FAST, SLOW])) == [SLOW]
+
+
+def test_success_resets_the_failure_streak(healthy):
+    router = build_router(eject_failures=3, min_calls=100)
+
+    for ok in (False, False, True, False, False):
+        router._record(FAST, ok, 1.0, 10)
+
+    assert not router.state(FAST).ejected_until
+
+
+def test_error_rate_trips_the_breaker(healthy):
+    router = build_router(eject_failures=100, min_calls=4, error_rate=0.5)
+
+    for ok in (True, False, True, False):
+        router._record(FAST, ok, 1.0, 10)
+
+    assert router.state(FAST).ejected_until
+
+
+def test_slow_calls_trip_the_breaker(healthy):
+    router = build_router(min_calls=4, slow_call_seconds=10, slow_rate=0.75)
+
+    for seconds in (1.0, 20.0, 20.0, 20.0):
+        router._record(FAST, True, seconds, 10)
+
+    assert router.state(FAST).ejected_until
+
+
+def test_ejected_endpoint_comes_back_after_a_health_check(healthy):
+    router = build_router(eject_seconds=30)
+    router.state(FAST).ejected_until = time.monotonic() - 1
+
+    healthy['ok'] = False
+    assert FAST not in asyncio.run(router.rank([FAST, SLOW]))
+    assert router.state(FAST).ejected_until > time.monotonic()
+
+    router.state(FAST).ejected_until = time.monotonic() - 1
+    healthy['ok'] = True
+    assert FAST in asyncio.run(router.rank([FAST, SLOW]))
+
+
+def test_all_ejected_endpoints_are_still_tried(healthy):
+    router = build_router()
+    for endpoint in (FAST, SLOW):
+        router.state(endpoint).ejected_until = time.monotonic() + 30
+
+    assert len(asyncio.run(router.rank([FAST, SLOW]))) == 2
+
+
+def answer(endpoint):
+    return {
+        'output_text': f"from {endpoint.id}", 'input_tokens': 1,
+        'output_tokens': 1, 'finish_reason': 'stop',
+    }
+
+
+def test_slow_call_is_hedged_on_the_next_endpoint(healthy, monkeypatch):
+    cancelled = []
+
+    async def call_endpoint(endpoint, text, max_tokens, cancel_event):
+        if endpoint is FAST:
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(endpoint.id)
+                raise
+        return answer(endpoint)
+
+    monkeypatch.setattr(router_module, 'call_endpoint', call_endpoint)
+    router = build_router(hedge=True, hedge_min_samples=2)
+    # FAST is ranked first and answers within 10 ms as a rule
+    for _ in range(2):
+        router._record(FAST, True, 0.01, 1)
+    router.state(SLOW).latency = 1.0
+
+    result = asyncio.run(router.predict(Model(id=1), "hi"))
+
+    assert result['output_text'] == "from 2"
+    assert cancelled == [1]  # The losing twin is never billed
+
+
+def test_no_hedge_without_enough_history(healthy, monkeypatch):
+    calls = []
+
+    async def call_endpoint(endpoint, text, max_tokens, cancel_event):
+        calls.append(endpoint.id)
+        await asyncio.sleep(0.05)
+        return answer(endpoint)
+
+    monkeypatch.setattr(router_module, 'call_endpoint', call_endpoint)
+    router = build_router(hedge=True, hedge_min_samples=20)
+    router.state(FAST).latency = 0.01
+    router.state(SLOW).latency = 1.0
+
+    result = asyncio.run(router.predict(Model(id=1), "hi"))
+
+    assert result['output_text'] == "from 1"
+    assert calls == [1]
+
+
+def test_failed_call_is_retried_on_the_next_endpoint(healthy, monkeypatch):
+    async def call_endpoint(endpoint, text, max_tokens, cancel_event):
+        if endpoint is FAST:
+            raise ConnectionError("down")
+        return answer(endpoint)
+
+    monkeypatch.setattr(router_module, 'call_endpoint', call_endpoint)
+    router = build_router()
+    router.state(FAST).latency = 0.01
+    router.state(SLOW).latency = 1.0
+
+    result = asyncio.run(router.predict(Model(id=1), "hi"))
+
+    assert result['output_text'] == "from 2"
+    assert router.state(FAST).failures == 1
+
+
+def test_timeout_grows_with_the_token_budget(healthy, monkeypatch):
+    async def call_endpoint(endpoint, text, max_tokens, cancel_event):
+        await asyncio.sleep(0.2)
+        return answer(endpoint)
+
+    monkeypatch.setattr(router_module, 'call_endpoint', call_endpoint)
+    router = LLMRouter(
+        FakeEndpoints([FAST]), timeout_seconds=0.05,
+        timeout_per_token_seconds=0.01,
+    )
+
+    # 0.05 s + 100 tokens * 0.01 s leaves room for the answer
+    result = asyncio.run(router.predict(Model(id=1), "hi", max_tokens=100))
+    assert result['output_text'] == "from 1"
+    assert router.state(FAST).failures == 0
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(router.predict(Model(id=1), "hi", max_tokens=1))
+    assert router.state(FAST).failures == 1